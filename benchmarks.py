@@ -0,0 +1,441 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import index
+
+# ========================================================
+# LIFE SYSTEM - Benchmarks
+# ========================================================
+# Run with: python benchmarks.py run            (time every hot path)
+#           python benchmarks.py run --save     (store the numbers as the baseline)
+#           python benchmarks.py run --check    (fail if anything got slower than the baseline allows)
+#           python benchmarks.py memory         (bytes per in-memory Player)
+#           python benchmarks.py memory --check (fail if the compact layout saves less than it should)
+#           python benchmarks.py metrics        (simulation slowdown with instrumentation on)
+# Numbers are printed as JSON so they can be compared between commits.
+#
+# benchmarks_baseline.json is committed, recorded with `run --save --min-time 1`. Machines differ,
+# so --check first scales the baseline by the median of (ops/sec here / ops/sec in the baseline)
+# over every benchmark, then fails on any that fell more than its tolerance below that: a hot
+# path getting slower next to the rest, which is what a code change does and a faster or slower
+# machine doesn't. Re-save the whole suite and commit the file when a change is meant to slow
+# a path down, or adds a benchmark.
+# ========================================================
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+
+# A benchmark may lose this fraction of its scaled baseline ops/sec before --check fails. Runs on
+# a shared machine scatter by up to about 30% around the median, hence the headroom.
+DEFAULT_THRESHOLD = 0.4
+# ...and these, which wait on the disk, scatter with it rather than with the code
+IO_THRESHOLD = 0.6
+IO_BENCHMARKS = frozenset(("save_progress_json", "load_progress_json", "save_progress_sqlite",
+                           "load_progress_sqlite", "save_progress_binary", "load_progress_binary"))
+
+# Most the simulation may slow down with index.METRICS enabled before `metrics --check` fails
+METRICS_OVERHEAD_LIMIT = 0.05
+
+# Least the compact Player layout must save over the old dict layout for `memory --check`
+TARGET_REDUCTION = 5.0
+
+# ======================
+# Fixtures
+# ======================
+
+def fresh_player():
+    player = index.Player("bench")
+    player.energy = player.max_energy = 10 ** 9  # Never runs dry however long the timing loop is
+    return player
+
+def veteran_player():
+    # Adversarial state: very high levels, a huge inventory, every achievement and every quest underway
+    player = fresh_player()
+    for key in index.ALL_STAT_KEYS:
+        player.gain_xp(player.find_stat(key), 10 ** 12)
+    for item in index.SHOP_ITEMS:
+        player.inventory.add(item, 10 ** 6)
+    for quest in index.QUESTS:
+        index.start_quest(player, quest)
+    return player
+
+# ======================
+# Benchmarks
+# ======================
+# Each benchmark does its setup and returns the operation to time (a zero-argument callable).
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark("perform_task")
+def bench_perform_task():
+    player, rng = fresh_player(), random.Random(0)
+    return lambda: index.perform_task(player, "running", rng)
+
+@benchmark("perform_task_veteran")
+def bench_perform_task_veteran():
+    player, rng = veteran_player(), random.Random(0)
+    return lambda: index.perform_task(player, "coding challenge", rng)
+
+@benchmark("add_xp_small")
+def bench_add_xp_small():
+    stat = index.Stat("Strength")
+    return lambda: stat.add_xp(1)
+
+@benchmark("add_xp_huge_grant")
+def bench_add_xp_huge_grant():
+    stat = index.Stat("Strength")
+    return lambda: stat.add_xp(10 ** 15)
+
+@benchmark("check_achievements_changed_stat")
+def bench_check_achievements_changed_stat():
+    player = veteran_player()
+    return lambda: player.check_achievements("stat", "Strength")
+
+@benchmark("check_achievements_all")
+def bench_check_achievements_all():
+    player = veteran_player()
+    return lambda: player.check_achievements()
+
+@benchmark("check_quests_progress")
+def bench_check_quests_progress():
+    player = veteran_player()
+    def op():
+        player.begin_quest("coder journey")
+        player.check_quests("app development")
+    return op
+
+@benchmark("check_quests_unrelated_task")
+def bench_check_quests_unrelated_task():
+    player = veteran_player()
+    return lambda: player.check_quests("yoga")
+
+@benchmark("use_item")
+def bench_use_item():
+    player = veteran_player()
+    def op():
+        player.inventory.add("xp boost book")  # Restock so the loop never runs out
+        index.consume_item(player, "xp boost book")
+    return op
+
+@benchmark("use_item_bulk_1000")
+def bench_use_item_bulk():
+    player = veteran_player()
+    def op():
+        player.inventory.add("strength elixir", 1000)
+        index.consume_item(player, "strength elixir", 1000)
+    return op
+
+@benchmark("to_dict")
+def bench_to_dict():
+    player = veteran_player()
+    return player.to_dict
+
+@benchmark("from_dict")
+def bench_from_dict():
+    data = veteran_player().to_dict()
+    return lambda: index.Player.from_dict(data)
+
+@benchmark("save_progress_json")
+def bench_save_progress_json():
+    player = veteran_player()
+    storage = index.JsonFileStorage(os.path.join(tempfile.mkdtemp(), "data.json"))
+    return lambda: index.save_progress(player, storage)
+
+@benchmark("load_progress_json")
+def bench_load_progress_json():
+    storage = index.JsonFileStorage(os.path.join(tempfile.mkdtemp(), "data.json"))
+    index.save_progress(veteran_player(), storage)
+    return lambda: index.load_progress(storage=storage)
+
+@benchmark("save_progress_sqlite")
+def bench_save_progress_sqlite():
+    player = veteran_player()
+    storage = index.SQLiteStorage(os.path.join(tempfile.mkdtemp(), "life.db"))
+    def op():
+        player.gold += 1  # One dirty row per save
+        index.save_progress(player, storage)
+    return op
+
+@benchmark("load_progress_sqlite")
+def bench_load_progress_sqlite():
+    storage = index.SQLiteStorage(os.path.join(tempfile.mkdtemp(), "life.db"))
+    index.save_progress(veteran_player(), storage)
+    return lambda: index.load_progress(storage=storage, name="bench")
+
+@benchmark("save_progress_binary")
+def bench_save_progress_binary():
+    player = veteran_player()
+    storage = index.BinaryStorage(os.path.join(tempfile.mkdtemp(), "life.bin"))
+    return lambda: index.save_progress(player, storage)
+
+@benchmark("load_progress_binary")
+def bench_load_progress_binary():
+    storage = index.BinaryStorage(os.path.join(tempfile.mkdtemp(), "life.bin"))
+    index.save_progress(veteran_player(), storage)
+    return lambda: index.load_progress(storage=storage, name="bench")
+
+@benchmark("read_field_binary")
+def bench_read_field_binary():
+    storage = index.BinaryStorage(os.path.join(tempfile.mkdtemp(), "life.bin"))
+    index.save_progress(veteran_player(), storage)
+    return lambda: storage.read_field("bench", "Strength")
+
+@benchmark("plan_100_energy")
+def bench_plan_100_energy():
+    # Planned from scratch every time, with every quest underway (the most moves to weigh)
+    player = index.Player("bench")
+    for quest in index.QUESTS:
+        index.start_quest(player, quest)
+    def op():
+        index.PLAN_CACHE.clear()
+        index.plan_tasks(player, 100, "gold")
+    return op
+
+@benchmark("plan_100_energy_cached")
+def bench_plan_100_energy_cached():
+    player = index.Player("bench")
+    return lambda: index.plan_tasks(player, 100, "gold")
+
+@benchmark("leaderboard_1m_players")
+def bench_leaderboard_1m_players():
+    # One score change, one rank lookup and one top-10 page on a board of a million players
+    rng = random.Random(0)
+    board = index.Leaderboard((f"player-{i}", rng.randint(0, 10 ** 6)) for i in range(10 ** 6))
+    def op():
+        name = f"player-{rng.randrange(10 ** 6)}"
+        board.set(name, rng.randint(0, 10 ** 6))
+        board.rank(name)
+        board.top(10)
+    return op
+
+@benchmark("bulk_record_roundtrip")
+def bench_bulk_record_roundtrip():
+    # One profile through an export record and back, validation included (per-profile CPU of export/import)
+    data = veteran_player().to_dict()
+    return lambda: index.unflatten_profile(json.loads(json.dumps(index.flatten_profile(data))))
+
+@benchmark("view_stats")
+def bench_view_stats():
+    player = veteran_player()
+    return lambda: index.view_stats(player)
+
+# ======================
+# Runner
+# ======================
+
+def time_op(op, min_time=0.2, repeats=5):
+    # Best of `repeats` runs of a loop sized to take about `min_time`; returns ops/sec
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            op()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10:
+            break
+        loops *= 10
+    loops = max(1, int(loops * (min_time / max(elapsed, 1e-9))))
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            op()
+        best = min(best, time.perf_counter() - started)
+    return loops / best
+
+def allocations(op, calls=100):
+    # Peak bytes allocated during one call, and blocks still held per call afterwards (leaks/growth)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        op()
+        peak = tracemalloc.get_traced_memory()[1] - before
+        blocks = sys.getallocatedblocks()
+        for _ in range(calls):
+            op()
+        retained = (sys.getallocatedblocks() - blocks) / calls
+    finally:
+        tracemalloc.stop()
+    return peak, retained
+
+def run_benchmarks(names=None, min_time=0.2):
+    results = {}
+    index.SCREEN.discard = True  # save/load still announce themselves, view_stats draws a screen
+    try:
+        for name, setup in BENCHMARKS.items():
+            if names and not any(part in name for part in names):
+                continue
+            op = setup()
+            peak, retained = allocations(op)
+            results[name] = {
+                "ops_per_sec": round(time_op(op, min_time), 1),
+                "peak_bytes_per_call": peak,
+                "retained_blocks_per_call": round(retained, 2),
+            }
+    finally:
+        index.SCREEN.discard = False
+    return results
+
+def baseline_scale(results, baseline):
+    # How much faster this machine runs the suite than the baseline's did (see the top of the file)
+    ratios = [result["ops_per_sec"] / baseline[name]["ops_per_sec"] for name, result in results.items() if name in baseline]
+    return statistics.median(ratios) if ratios else 1.0
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, scale=1.0):
+    # Names of benchmarks that fell more than their tolerance below their scaled baseline ops/sec
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        allowed = max(threshold, IO_THRESHOLD) if name in IO_BENCHMARKS else threshold
+        if base and result["ops_per_sec"] < base["ops_per_sec"] * scale * (1 - allowed):
+            regressions.append(name)
+    return regressions
+
+# ======================
+# Memory
+# ======================
+
+class DictLayoutStat:
+    # Stat and Player as they were before the compact layout: attributes in a __dict__, 20 Stat
+    # objects and a list inventory. Only kept to measure what the compact layout is compared with.
+    def __init__(self, name, level=1, xp=0, needed=100):
+        self.name = name
+        self.level = level
+        self.xp = xp
+        self.needed = needed
+
+class DictLayoutPlayer:
+    def __init__(self, name):
+        self.name = name
+        self.stats = {stat: DictLayoutStat(stat) for stat in index.STAT_NAMES}
+        self.skills = {skill: DictLayoutStat(skill) for skill in index.SKILL_NAMES}
+        self.gold = 0
+        self.inventory = []
+        self.energy = 100
+        self.max_energy = 100
+        self.achievements = []
+        self.active_quests = {}
+        self.completed_quests = []
+
+def memory_per_player(count=10000, actions=0, seed=0, layout=index.Player):
+    # Average traced bytes held per Player in a population, optionally after each one has played a bit
+    rng = random.Random(seed)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        players = [layout(f"player-{i}") for i in range(count)]
+        for player in players:
+            for _ in range(actions):
+                action, arg = index.random_policy(player, rng)
+                index.apply_action(player, action, arg, rng)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return used / count
+
+def memory_benchmark(count=10000):
+    fresh = memory_per_player(count)
+    played = memory_per_player(count, actions=50)
+    dict_layout = memory_per_player(count, layout=DictLayoutPlayer)
+    return {
+        "players": count,
+        "bytes_per_player": round(fresh, 1),
+        "bytes_per_player_after_50_actions": round(played, 1),
+        "dict_layout_bytes_per_player": round(dict_layout, 1),
+        "reduction_vs_dict_layout": round(dict_layout / fresh, 2),
+        "target_reduction": TARGET_REDUCTION,
+    }
+
+# ======================
+# Instrumentation Overhead
+# ======================
+
+def metrics_overhead(rounds=20, players=50, turns=1000):
+    # Alternate plain and instrumented simulations and compare the best time of each, which
+    # cancels out most of the noise a single pair of runs would have
+    times = {False: [], True: []}
+    try:
+        for _ in range(rounds):
+            for enabled in (False, True):
+                index.METRICS.enabled = enabled
+                times[enabled].append(index.simulate(players, turns, seed=0)["seconds"])
+    finally:
+        index.METRICS.enabled = False
+        index.METRICS.reset()
+    off, on = min(times[False]), min(times[True])
+    return {"players": players, "turns": turns, "seconds_off": off, "seconds_on": on, "overhead": on / off - 1}
+
+# ======================
+# Command Line
+# ======================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LIFE SYSTEM benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="time the game's hot paths")
+    run.add_argument("names", nargs="*", help="only run benchmarks whose name contains one of these")
+    run.add_argument("--min-time", type=float, default=0.2, help="seconds per timing run")
+    run.add_argument("--baseline", default=BASELINE_FILE)
+    run.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    run.add_argument("--check", action="store_true", help="exit non-zero if a benchmark regressed past --threshold")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    memory = commands.add_parser("memory", help="bytes held per in-memory Player")
+    memory.add_argument("--players", type=int, default=10000)
+    memory.add_argument("--check", action="store_true", help=f"exit non-zero below a {TARGET_REDUCTION:g}x reduction")
+    metrics = commands.add_parser("metrics", help="simulation overhead of enabling index.METRICS")
+    metrics.add_argument("--rounds", type=int, default=20)
+    metrics.add_argument("--check", action="store_true", help=f"exit non-zero above {METRICS_OVERHEAD_LIMIT:.0%} overhead")
+    args = parser.parse_args(argv)
+
+    if args.command == "memory":
+        result = memory_benchmark(args.players)
+        print(json.dumps(result, indent=2))
+        if args.check and result["reduction_vs_dict_layout"] < TARGET_REDUCTION:
+            raise SystemExit(f"Players are only {result['reduction_vs_dict_layout']}x smaller than the dict layout, "
+                             f"not {TARGET_REDUCTION:g}x")
+        return
+    if args.command == "metrics":
+        result = metrics_overhead(args.rounds)
+        print(json.dumps(result, indent=2))
+        if args.check and result["overhead"] > METRICS_OVERHEAD_LIMIT:
+            raise SystemExit(f"Instrumentation overhead {result['overhead']:.1%} is over {METRICS_OVERHEAD_LIMIT:.0%}")
+        return
+
+    results = run_benchmarks(args.names, args.min_time)
+    print(json.dumps(results, indent=2))
+    if args.check:
+        if not os.path.exists(args.baseline):
+            raise SystemExit(f"No baseline at {args.baseline}; run with --save first")
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        scale = baseline_scale(results, baseline)
+        regressions = compare(results, baseline, args.threshold, scale)
+        for name in regressions:
+            print(f"REGRESSION {name}: {results[name]['ops_per_sec']} ops/sec vs baseline "
+                  f"{baseline[name]['ops_per_sec']} (x{scale:.2f} for this machine)", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+
+if __name__ == "__main__":
+    main()
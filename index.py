@@ -1,8 +1,26 @@
+import argparse
+import asyncio
+import bisect
+import csv
+import hashlib
 import json
+import marshal
+import math
+import mmap
 import os
 import random
+import re
+import sqlite3
+import struct
+import sys
 import datetime
+import functools
+import gc
+import threading
 import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict, defaultdict, namedtuple
 
 # ========================================================
 # LIFE SYSTEM - Expanded RPG-Like Personal Development Game
@@ -77,8 +95,8 @@ TASKS = {
     "parkour": {"type": "stat", "key": "Agility", "xp": 25, "gold": 8, "energy_cost": 20, "success_base": 0.6},
     "reading book": {"type": "stat", "key": "Intelligence", "xp": 15, "gold": 3, "energy_cost": 10, "success_base": 0.8},
     "research project": {"type": "stat", "key": "Intelligence", "xp": 25, "gold": 10, "energy_cost": 15, "success_base": 0.7},
-    "gambling": {"type": "stat", "key": "Luck", "xp": 10, "gold": random.randint(-10,20), "energy_cost": 5, "success_base": 0.5},
-    "treasure hunt": {"type": "stat", "key": "Luck", "xp": 15, "gold": random.randint(0,30), "energy_cost": 10, "success_base": 0.6},
+    "gambling": {"type": "stat", "key": "Luck", "xp": 10, "gold_range": (-10, 20), "energy_cost": 5, "success_base": 0.5},
+    "treasure hunt": {"type": "stat", "key": "Luck", "xp": 15, "gold_range": (0, 30), "energy_cost": 10, "success_base": 0.6},
     # Skills tasks
     "boxing practice": {"type": "skill", "key": "Combat", "xp": 20, "gold": 5, "energy_cost": 15, "success_base": 0.7},
     "martial arts training": {"type": "skill", "key": "Combat", "xp": 25, "gold": 7, "energy_cost": 20, "success_base": 0.65},
@@ -105,7 +123,7 @@ TASKS = {
     "cycling": {"type": "stat", "key": "Stamina", "xp": 18, "gold": 4, "energy_cost": 12, "success_base": 0.8},
     "dancing": {"type": "stat", "key": "Agility", "xp": 15, "gold": 3, "energy_cost": 10, "success_base": 0.85},
     "debate": {"type": "stat", "key": "Intelligence", "xp": 20, "gold": 7, "energy_cost": 15, "success_base": 0.7},
-    "lottery": {"type": "stat", "key": "Luck", "xp": 5, "gold": random.randint(-5,15), "energy_cost": 5, "success_base": 0.4},
+    "lottery": {"type": "stat", "key": "Luck", "xp": 5, "gold_range": (-5, 15), "energy_cost": 5, "success_base": 0.4},
     "fencing": {"type": "skill", "key": "Combat", "xp": 22, "gold": 6, "energy_cost": 16, "success_base": 0.7},
     "scripting": {"type": "skill", "key": "Programming", "xp": 15, "gold": 8, "energy_cost": 10, "success_base": 0.8},
     "grilling": {"type": "skill", "key": "Cooking", "xp": 12, "gold": 3, "energy_cost": 8, "success_base": 0.85},
@@ -125,11 +143,23 @@ TASKS = {
     "makeup tutorial": {"type": "stat", "key": "Looks", "xp": 10, "gold": 2, "energy_cost": 5, "success_base": 0.9},
     "obstacle course": {"type": "stat", "key": "Agility", "xp": 25, "gold": 8, "energy_cost": 20, "success_base": 0.6},
     "chess game": {"type": "stat", "key": "Intelligence", "xp": 20, "gold": 5, "energy_cost": 10, "success_base": 0.8},
-    "coin flip bet": {"type": "stat", "key": "Luck", "xp": 8, "gold": random.randint(-8,16), "energy_cost": 5, "success_base": 0.5},
+    "coin flip bet": {"type": "stat", "key": "Luck", "xp": 8, "gold_range": (-8, 16), "energy_cost": 5, "success_base": 0.5},
     "archery": {"type": "skill", "key": "Combat", "xp": 20, "gold": 5, "energy_cost": 15, "success_base": 0.7},
 }
 
+# Pre-rendered catalog listings (see Rendering). Whatever edits TASKS, SHOP_ITEMS, QUESTS or
+# ACHIEVEMENTS at runtime calls content_changed() so they get drawn again.
+CATALOG_CACHE = {}
+# Task plans (see Planner), which are only valid for the content they were planned with
+PLAN_CACHE = OrderedDict()  # (objective, stat block, quest progress, achievements) -> PlanTable, LRU order
+PLAN_LOCK = threading.Lock()  # The server plans on worker threads
+
+def content_changed():
+    CATALOG_CACHE.clear()
+    PLAN_CACHE.clear()
+
 # Shop items (expanded)
+# An item may also set "max_stack" to hold fewer than MAX_STACK of it
 SHOP_ITEMS = {
     "energy potion": {"price": 50, "effect": "restore_energy", "amount": 50, "desc": "Restores 50 energy"},
     "xp boost book": {"price": 100, "effect": "add_xp", "key": "Mind", "amount": 50, "desc": "Adds 50 XP to Mind"},
@@ -181,6 +211,19 @@ ACHIEVEMENTS = {
     "negotiation_negotiator": {"req": {"type": "skill", "key": "Negotiation", "level": 5}, "reward_gold": 100, "desc": "Negotiation level 5"},
 }
 
+def build_achievement_index(achievements):
+    # (type, key) -> [(level, achievement key), ...] sorted by level, so a level change only
+    # has to look at the achievements for that one stat/skill and can stop at the first one out of reach
+    index = {}
+    for ach_key, ach in achievements.items():
+        req = ach["req"]
+        index.setdefault((req["type"], req["key"]), []).append((req["level"], ach_key))
+    for entries in index.values():
+        entries.sort()
+    return index
+
+ACHIEVEMENT_INDEX = build_achievement_index(ACHIEVEMENTS)
+
 # Quests (chained tasks)
 QUESTS = {
     "beginner quest": {"tasks": ["workout schedule", "coding challenge", "meditation"], "reward_gold": 50, "reward_xp": {"Mind": 20}},
@@ -191,28 +234,300 @@ QUESTS = {
     "traveler tale": {"tasks": ["road trip", "language lesson", "treasure hunt"], "reward_gold": 120, "reward_xp": {"Driving": 60}},
 }
 
+def build_quest_index(quests):
+    # task -> quests that include it, and per quest a bit for each distinct task,
+    # so progress is one int of still-missing tasks and completion is "mask == 0"
+    task_index = {}
+    task_bits = {}
+    for quest_name, quest in quests.items():
+        bits = {}
+        for task in quest["tasks"]:
+            if task not in bits:
+                bits[task] = 1 << len(bits)
+                task_index.setdefault(task, []).append(quest_name)
+        task_bits[quest_name] = bits
+    return task_index, task_bits
+
+QUEST_INDEX, QUEST_TASK_BITS = build_quest_index(QUESTS)
+
+MAX_STACK = 9999  # Most of any one item a player can hold (or buy or use at once)
+STACK_LIMITS = {item: info["max_stack"] for item, info in SHOP_ITEMS.items() if "max_stack" in info}
+
+# Fixed layout of a player's StatBlock: every stat then every skill, 3 slots (level, xp, needed) each
+ALL_STAT_KEYS = STAT_NAMES + SKILL_NAMES
+STAT_SLOTS = {key: 3 * i for i, key in enumerate(ALL_STAT_KEYS)}
+STAT_SET = frozenset(STAT_NAMES)
+SKILL_SET = frozenset(SKILL_NAMES)
+DEFAULT_STAT_VALUES = [1, 0, 100] * len(ALL_STAT_KEYS)
+
+# ======================
+# Metrics
+# ======================
+# Counters and latency histograms for the engine, saves and loads. Off by default; every hook is
+# guarded by METRICS.enabled, so a disabled registry costs one attribute check per call.
+# Flip METRICS.enabled at any time (or pass --metrics FILE) and export with prometheus(), to_dict() or dump().
+
+# Upper bounds in seconds of the latency buckets; one more bucket catches everything slower
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Metric name -> (type, help text, label name). Every metric has exactly one label, so a series is
+# keyed by the bare label value and the hot paths never build a tuple.
+METRIC_DEFS = {
+    "life_task_attempts_total": ("counter", "Tasks attempted", "task"),
+    "life_task_successes_total": ("counter", "Tasks that succeeded", "task"),
+    "life_task_failures_total": ("counter", "Tasks that failed", "task"),
+    "life_task_rejected_total": ("counter", "Task attempts refused before the roll", "reason"),
+    "life_items_bought_total": ("counter", "Items bought", "item"),
+    "life_items_used_total": ("counter", "Items used", "item"),
+    "life_quests_started_total": ("counter", "Quests started", "quest"),
+    "life_quests_completed_total": ("counter", "Quests completed", "quest"),
+    "life_level_ups_total": ("counter", "Levels gained", "stat"),
+    "life_achievements_total": ("counter", "Achievements unlocked", "achievement"),
+    "life_random_events_total": ("counter", "Random events triggered", "event"),
+    "life_save_bytes_total": ("counter", "Bytes written by saves", "storage"),
+    "life_load_bytes_total": ("counter", "Bytes read by loads", "storage"),
+    "life_action_seconds": ("histogram", "Command latency", "action"),
+    "life_save_seconds": ("histogram", "Save latency", "storage"),
+    "life_load_seconds": ("histogram", "Load latency", "storage"),
+}
+
+# Counters that aren't counted themselves but reported as the sum of others (one increment per task, not two)
+METRIC_SUMS = {"life_task_attempts_total": ("life_task_successes_total", "life_task_failures_total")}
+
+# Player.notify kind -> (counter, label field, amount field or None for one)
+NOTIFY_METRICS = {
+    "level_up": ("life_level_ups_total", "stat", "gained"),
+    "achievement": ("life_achievements_total", "key", None),
+    "quest_completed": ("life_quests_completed_total", "quest", None),
+    "random_event": ("life_random_events_total", "event", None),
+}
+
+class Metrics:
+    # counters: metric name -> {label value: count}, one defaultdict per counter so hot paths can
+    # do METRICS.counters[name][label] += 1 directly. histograms: metric name -> {label value:
+    # per-bucket counts (not cumulative) followed by the running sum}.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def count(self, name, label, amount=1):
+        self.counters[name][label] += amount
+
+    def observe(self, name, value, label):
+        series = self.histograms[name].get(label)
+        if series is None:
+            series = self.histograms[name][label] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        series[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        series[-1] += value
+
+    def reset(self):
+        self.counters = {name: defaultdict(int) for name, (kind, _, _) in METRIC_DEFS.items()
+                         if kind == "counter" and name not in METRIC_SUMS}
+        self.histograms = {name: {} for name, (kind, _, _) in METRIC_DEFS.items() if kind == "histogram"}
+
+    def take(self):
+        # Hand over everything collected so far and start again; see merge()
+        taken = (self.counters, self.histograms)
+        self.reset()
+        return taken
+
+    def merge(self, taken):
+        # Fold in what another registry (e.g. a simulation worker process) collected
+        counters, histograms = taken
+        for name, values in counters.items():
+            for label, value in values.items():
+                self.counters[name][label] += value
+        for name, values in histograms.items():
+            for label, series in values.items():
+                mine = self.histograms[name].get(label)
+                if mine is None:
+                    self.histograms[name][label] = list(series)
+                else:
+                    for i, value in enumerate(series):
+                        mine[i] += value
+
+    def counter(self, name):
+        # {label value: count} for one counter, summing the parts of a METRIC_SUMS one
+        if name not in METRIC_SUMS:
+            return dict(self.counters[name])
+        total = defaultdict(int)
+        for part in METRIC_SUMS[name]:
+            for label, value in self.counters[part].items():
+                total[label] += value
+        return dict(total)
+
+    def to_dict(self):
+        result = {"counters": {}, "histograms": {}}
+        for name, (kind, _, label_name) in METRIC_DEFS.items():
+            if kind == "counter":
+                values = self.counter(name)
+                if values:
+                    result["counters"][name] = {"label": label_name, "values": dict(sorted(values.items()))}
+                continue
+            values = {}
+            for label, series in sorted(self.histograms[name].items()):
+                values[label] = {
+                    "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], series[:-1])),
+                    "count": sum(series[:-1]),
+                    "sum": series[-1],
+                }
+            if values:
+                result["histograms"][name] = {"label": label_name, "values": values}
+        return result
+
+    def prometheus(self):
+        # Text exposition format: HELP/TYPE once per metric, cumulative le buckets for histograms
+        lines = []
+        for name, (kind, help_text, label_name) in METRIC_DEFS.items():
+            values = self.counter(name) if kind == "counter" else self.histograms[name]
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label, data in sorted(values.items()):
+                label = f'{label_name}="{prometheus_escape(label)}"'
+                if kind == "counter":
+                    lines.append(f"{name}{{{label}}} {data}")
+                    continue
+                total = 0
+                for bound, count in zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], data[:-1]):
+                    total += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+                lines.append(f"{name}_sum{{{label}}} {data[-1]}")
+                lines.append(f"{name}_count{{{label}}} {total}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # .prom/.txt get the Prometheus text format, anything else JSON
+        with open(path, "w") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+
+def prometheus_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def timed(histogram, label):
+    # Decorator: observe the call's duration into histogram{label} while metrics are enabled.
+    # The wrapper is a whole extra call, so it's for saves and loads; the engine functions only
+    # bump counters inline and their latency is taken where commands come in (run_command).
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_call(*args, **kwargs):
+            if not METRICS.enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICS.observe(histogram, time.perf_counter() - started, label)
+        return timed_call
+    return wrap
+
+METRICS = Metrics()
+
 # ======================
 # Classes
 # ======================
 
+class LevelUp(namedtuple("LevelUp", "name old_level new_level levels_gained")):
+    # What Stat.add_xp did; truthy only when at least one level was gained
+    __slots__ = ()
+
+    def __bool__(self):
+        return self.levels_gained > 0
+
+
+class StatBlock:
+    # level, xp, needed of several stats packed into one int16 array (3 slots per stat), which
+    # fits a fresh or casual player. A value that doesn't fit widens the array to int32, then
+    # int64, and past that to plain Python ints.
+    __slots__ = ("values",)
+
+    WIDER = {"h": "i", "i": "q"}
+
+    def __init__(self, values):
+        for typecode in "hiq":
+            try:
+                self.values = array(typecode, values)
+                return
+            except OverflowError:
+                pass
+        self.values = list(values)
+
+    def set(self, pos, value):
+        try:
+            self.values[pos] = value
+        except OverflowError:
+            wider = self.WIDER.get(self.values.typecode)
+            self.values = array(wider, self.values) if wider else list(self.values)
+            self.set(pos, value)
+
+
 class Stat:
-    def __init__(self, name, level=1, xp=0, needed=100):
+    # A named view onto three slots of a StatBlock. Players hand these out on access
+    # (player.stats["Strength"]); a Stat built on its own gets a block of its own.
+    __slots__ = ("name", "block", "pos")
+
+    def __init__(self, name, level=1, xp=0, needed=100, block=None, pos=0):
         self.name = name
-        self.level = level
-        self.xp = xp
-        self.needed = needed
+        self.block = block if block is not None else StatBlock((level, xp, needed))
+        self.pos = pos
+
+    @property
+    def level(self):
+        return self.block.values[self.pos]
+
+    @level.setter
+    def level(self, value):
+        self.block.set(self.pos, value)
+
+    @property
+    def xp(self):
+        return self.block.values[self.pos + 1]
+
+    @xp.setter
+    def xp(self, value):
+        self.block.set(self.pos + 1, value)
+
+    @property
+    def needed(self):
+        return self.block.values[self.pos + 2]
+
+    @needed.setter
+    def needed(self, value):
+        self.block.set(self.pos + 2, value)
 
     def add_xp(self, amount):
-        self.xp += amount
-        leveled_up = False
-        while self.xp >= self.needed:
-            self.level += 1
-            self.xp -= self.needed
-            self.needed = 100 * self.level  # Exponential growth
-            leveled_up = True
-            print(LEVEL_UP_ASCII)
-            print(f"Congratulations! Your {self.name} has reached level {self.level}!")
-        return leveled_up
+        # Closed form instead of levelling one step at a time: after the current level is paid off,
+        # reaching level a+k from level a costs 100*(a + (a+1) + ... + (a+k-1)) = 50*(k*k + (2a-1)*k),
+        # so the number of extra levels is the integer root of that quadratic. O(1) for any amount.
+        values, pos = self.block.values, self.pos
+        old_level = values[pos]
+        xp = values[pos + 1] + amount
+        needed = values[pos + 2]
+        if xp < needed:
+            self.block.set(pos + 1, xp)
+            return LevelUp(self.name, old_level, old_level, 0)
+        # The current requirement may be off-curve (old saves, permanent boosts), so pay it first
+        xp -= needed
+        level = old_level + 1
+        b = 2 * level - 1
+        q = xp // 50
+        k = (math.isqrt(b * b + 4 * q) - b) // 2
+        while (k + 1) * (k + 1 + b) <= q:
+            k += 1
+        while k * (k + b) > q:
+            k -= 1
+        xp -= 50 * k * (k + b)
+        level += k
+        block = self.block
+        block.set(pos, level)
+        block.set(pos + 1, xp)
+        block.set(pos + 2, 100 * level)  # Exponential growth
+        return LevelUp(self.name, old_level, level, level - old_level)
 
     def to_dict(self):
         return {
@@ -229,300 +544,3662 @@ class Stat:
         return f"{self.name}: Level {self.level} (XP: {self.xp}/{self.needed})"
 
 
+class StatGroup:
+    # Dict-like window onto a player's stats or skills: player.stats["Strength"], .items(), "Luck" in ...
+    __slots__ = ("block", "names", "name_set")
+
+    def __init__(self, block, names, name_set):
+        self.block = block
+        self.names = names
+        self.name_set = name_set
+
+    def __getitem__(self, key):
+        if key not in self.name_set:
+            raise KeyError(key)
+        return Stat(key, block=self.block, pos=STAT_SLOTS[key])
+
+    def get(self, key, default=None):
+        if key not in self.name_set:
+            return default
+        return Stat(key, block=self.block, pos=STAT_SLOTS[key])
+
+    def __contains__(self, key):
+        return key in self.name_set
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def values(self):
+        return [Stat(key, block=self.block, pos=STAT_SLOTS[key]) for key in self.names]
+
+    def items(self):
+        return [(key, Stat(key, block=self.block, pos=STAT_SLOTS[key])) for key in self.names]
+
+
+class Inventory(dict):
+    # Item name -> quantity. Adding and consuming are O(1) however many of an item you hold,
+    # and it saves as a compact {item: count} dict instead of one list entry per unit.
+    __slots__ = ("limits",)
+
+    def __init__(self, counts=None, limits=None):
+        super().__init__(counts or ())
+        self.limits = limits if limits is not None else STACK_LIMITS
+
+    def room_for(self, item):
+        return max(0, self.limits.get(item, MAX_STACK) - self.get(item, 0))
+
+    def add(self, item, quantity=1):
+        # Returns how many were actually added (stack limits can cut it short)
+        quantity = min(quantity, self.room_for(item))
+        if quantity > 0:
+            self[item] = self.get(item, 0) + quantity
+        return max(quantity, 0)
+
+    def remove(self, item, quantity=1):
+        have = self.get(item, 0)
+        if quantity < 1 or have < quantity:
+            return False
+        if have == quantity:
+            del self[item]
+        else:
+            self[item] = have - quantity
+        return True
+
+    def count(self, item):
+        return self.get(item, 0)
+
+    def total(self):
+        return sum(self.values())
+
+    def to_dict(self):
+        return dict(self)
+
+    @classmethod
+    def from_data(cls, data):
+        # Old saves stored one list entry per unit
+        if isinstance(data, list):
+            counts = {}
+            for item in data:
+                counts[item] = counts.get(item, 0) + 1
+            return cls(counts)
+        return cls(data)
+
+    def __str__(self):
+        if not self:
+            return "Empty"
+        return ", ".join(f"{item} x{count}" for item, count in self.items())
+
+
 class Player:
+    # __slots__, one packed StatBlock instead of 20 Stat objects and containers made on first use
+    # keep a fresh player under 0.5 KB (see `benchmarks.py memory`), which matters for the
+    # populations kept by the simulator and leaderboards
+    __slots__ = ("name", "stat_block", "gold", "inventory_value", "energy_value", "energy_time", "max_energy",
+                 "achievements_value", "active_quests_value", "quest_progress_value", "completed_quests_value",
+                 "events", "journal")
+
     def __init__(self, name):
         self.name = name
-        self.stats = {stat: Stat(stat) for stat in STAT_NAMES}
-        self.skills = {skill: Stat(skill) for skill in SKILL_NAMES}
+        self.stat_block = StatBlock(DEFAULT_STAT_VALUES)
         self.gold = 0
-        self.inventory = []
-        self.energy = 100
+        # Energy regenerates lazily: energy_value as of energy_time (an ENERGY_CLOCK reading, or
+        # None while regen is stopped), and the energy property adds whatever accrued since
+        self.energy_value = 100
+        self.energy_time = ENERGY_CLOCK()
         self.max_energy = 100
-        self.achievements = []  # List of achieved keys
-        self.active_quests = {}  # Quest name: completed tasks list
-        self.completed_quests = []
+        # The containers below are made on first use (see the properties): most of a simulated or
+        # cached population never touches most of them, and even an empty dict or list costs
+        # 56-72 bytes. Until then their slots hold None.
+        self.inventory_value = None
+        self.achievements_value = None  # Achieved keys in unlock order (a dict, so membership is O(1))
+        self.active_quests_value = None  # Quest name: completed tasks list
+        self.quest_progress_value = None  # Quest name: bitmask of tasks still to do (see QUEST_TASK_BITS)
+        self.completed_quests_value = None
+        # Things that happened during the last action (level ups, achievements, quests...).
+        # Off (None) by default; a front-end that shows them sets a list here and drains it.
+        self.events = None
+        self.journal = None  # Journal that state changes are appended to, if any
+
+    @property
+    def energy(self):
+        value = self.energy_value
+        if self.energy_time is None or value >= self.max_energy:
+            return value  # The common case in simulations, so it's checked first
+        points = int((ENERGY_CLOCK() - self.energy_time) * ENERGY_REGEN_PER_SECOND)
+        return min(self.max_energy, value + points)
+
+    @energy.setter
+    def energy(self, value):
+        if self.energy_time is not None:
+            self.settle_energy()  # So the regen clock restarts from the right place
+        self.energy_value = value
+
+    def settle_energy(self):
+        # Fold the whole points regenerated since energy_time into energy_value (journaled like
+        # any other change) and move energy_time on, keeping the progress towards the next point
+        if self.energy_time is None:
+            return 0
+        now = ENERGY_CLOCK()
+        if self.energy_value >= self.max_energy:
+            self.energy_time = now  # Nothing accrues while full; regen starts when energy drops
+            return 0
+        points = int((now - self.energy_time) * ENERGY_REGEN_PER_SECOND)
+        if points <= 0:
+            return 0
+        gained = min(points, self.max_energy - self.energy_value)
+        self.energy_value += gained
+        if self.energy_value >= self.max_energy:
+            self.energy_time = now
+        else:
+            self.energy_time += points / ENERGY_REGEN_PER_SECOND
+        record(self, "energy", gained)
+        return gained
+
+    def stop_regen(self):
+        # Freeze energy so only actions change it (simulations, journal replay)
+        if self.energy_time is not None:
+            self.settle_energy()
+            self.energy_time = None
+
+    def start_regen(self):
+        if self.energy_time is None:
+            self.energy_time = ENERGY_CLOCK()
+
+    def energy_full_in(self):
+        # Seconds until energy is back at max_energy: 0 if it already is, None while regen is stopped
+        if self.energy_time is None:
+            return None
+        missing = self.max_energy - self.energy_value
+        if missing <= 0:
+            return 0.0
+        return max(0.0, self.energy_time + missing / ENERGY_REGEN_PER_SECOND - ENERGY_CLOCK())
+
+    @property
+    def inventory(self):
+        if self.inventory_value is None:
+            self.inventory_value = Inventory()
+        return self.inventory_value
+
+    @inventory.setter
+    def inventory(self, value):
+        self.inventory_value = value
+
+    @property
+    def achievements(self):
+        if self.achievements_value is None:
+            self.achievements_value = {}
+        return self.achievements_value
+
+    @achievements.setter
+    def achievements(self, value):
+        self.achievements_value = value
+
+    @property
+    def active_quests(self):
+        if self.active_quests_value is None:
+            self.active_quests_value = {}
+        return self.active_quests_value
+
+    @active_quests.setter
+    def active_quests(self, value):
+        self.active_quests_value = value
+
+    @property
+    def quest_progress(self):
+        if self.quest_progress_value is None:
+            self.quest_progress_value = {}
+        return self.quest_progress_value
+
+    @quest_progress.setter
+    def quest_progress(self, value):
+        self.quest_progress_value = value
+
+    @property
+    def completed_quests(self):
+        if self.completed_quests_value is None:
+            self.completed_quests_value = []
+        return self.completed_quests_value
+
+    @completed_quests.setter
+    def completed_quests(self, value):
+        self.completed_quests_value = value
+
+    @property
+    def stats(self):
+        return StatGroup(self.stat_block, STAT_NAMES, STAT_SET)
+
+    @property
+    def skills(self):
+        return StatGroup(self.stat_block, SKILL_NAMES, SKILL_SET)
 
     def to_dict(self):
+        values = self.stat_block.values
         return {
             "name": self.name,
-            "stats": {k: v.to_dict() for k, v in self.stats.items()},
-            "skills": {k: v.to_dict() for k, v in self.skills.items()},
+            "stats": {k: {"level": values[STAT_SLOTS[k]], "xp": values[STAT_SLOTS[k] + 1], "needed": values[STAT_SLOTS[k] + 2]}
+                      for k in STAT_NAMES},
+            "skills": {k: {"level": values[STAT_SLOTS[k]], "xp": values[STAT_SLOTS[k] + 1], "needed": values[STAT_SLOTS[k] + 2]}
+                       for k in SKILL_NAMES},
             "gold": self.gold,
-            "inventory": self.inventory,
+            "inventory": self.inventory.to_dict(),
             "energy": self.energy,
             "max_energy": self.max_energy,
-            "achievements": self.achievements,
-            "active_quests": self.active_quests,
-            "completed_quests": self.completed_quests
+            "achievements": list(self.achievements),
+            "active_quests": {k: list(v) for k, v in self.active_quests.items()},
+            "completed_quests": list(self.completed_quests)
         }
 
     @classmethod
     def from_dict(cls, data):
         player = cls(data["name"])
-        player.stats = {k: Stat.from_dict(k, v) for k, v in data["stats"].items()}
-        player.skills = {k: Stat.from_dict(k, v) for k, v in data["skills"].items()}
+        values = list(DEFAULT_STAT_VALUES)
+        for group in ("stats", "skills"):
+            for k, v in data[group].items():
+                pos = STAT_SLOTS.get(k)
+                if pos is not None:  # Stats no longer in STAT_NAMES/SKILL_NAMES are dropped
+                    values[pos:pos + 3] = v["level"], v["xp"], v["needed"]
+        player.stat_block = StatBlock(values)
         player.gold = data["gold"]
-        player.inventory = data["inventory"]
+        # Items, achievements and quests a content pack has removed since the save are dropped too,
+        # and stacks over their limit (which no storage format has to hold) are cut back to it
+        # Empty ones are left for the player to make on first use
+        inventory = {item: min(count, STACK_LIMITS.get(item, MAX_STACK))
+                     for item, count in Inventory.from_data(data["inventory"]).items() if item in SHOP_ITEMS and count > 0}
+        if inventory:
+            player.inventory = Inventory(inventory)
         player.energy = data["energy"]
         player.max_energy = data["max_energy"]
-        player.achievements = data["achievements"]
-        player.active_quests = data["active_quests"]
-        player.completed_quests = data["completed_quests"]
+        achievements = dict.fromkeys(key for key in data["achievements"] if key in ACHIEVEMENTS)
+        if achievements:
+            player.achievements = achievements
+        for quest_name, completed in data["active_quests"].items():
+            if quest_name in QUESTS:
+                player.begin_quest(quest_name, completed)
+        completed_quests = [quest for quest in data["completed_quests"] if quest in QUESTS]
+        if completed_quests:
+            player.completed_quests = completed_quests
         return player
 
+    def notify(self, kind, **info):
+        if METRICS.enabled and kind in NOTIFY_METRICS:
+            name, label, amount = NOTIFY_METRICS[kind]
+            METRICS.counters[name][info[label]] += info[amount] if amount else 1
+        if self.events is not None:
+            info["type"] = kind
+            self.events.append(info)
+
     def get_stat_or_skill(self, type_, key):
         if type_ == "stat":
-            return self.stats[key]
+            names = STAT_SET
         elif type_ == "skill":
-            return self.skills[key]
+            names = SKILL_SET
+        else:
+            return None
+        if key not in names:
+            raise KeyError(key)
+        return Stat(key, block=self.stat_block, pos=STAT_SLOTS[key])
+
+    def find_stat(self, key):
+        # Item and quest rewards only name the key, which is unique across stats and skills
+        pos = STAT_SLOTS.get(key)
+        if pos is None:
+            return None
+        return Stat(key, block=self.stat_block, pos=pos)
+
+    def stat_type(self, stat):
+        return "stat" if stat.name in STAT_SET else "skill"
+
+    def gain_xp(self, stat, amount):
+        result = stat.add_xp(amount)
+        if result.levels_gained:
+            self.notify("level_up", stat=stat.name, level=stat.level, gained=result.levels_gained)
+            self.check_achievements(self.stat_type(stat), stat.name)
+        return result
 
-    def check_achievements(self):
-        for ach_key, ach in ACHIEVEMENTS.items():
+    def check_achievements(self, type_=None, key=None):
+        # Only the stat/skill that changed is looked at; with no arguments everything is (e.g. after loading)
+        if type_ is None:
+            for type_, key in ACHIEVEMENT_INDEX:
+                self.check_achievements(type_, key)
+            return
+        entries = ACHIEVEMENT_INDEX.get((type_, key))
+        if not entries:
+            return
+        level = self.get_stat_or_skill(type_, key).level
+        for required, ach_key in entries:
+            if required > level:
+                break
             if ach_key not in self.achievements:
-                req = ach["req"]
-                stat = self.get_stat_or_skill(req["type"], req["key"])
-                if stat.level >= req["level"]:
-                    self.achievements.append(ach_key)
-                    self.gold += ach["reward_gold"]
-                    print(f"Achievement unlocked: {ach['desc']}!")
-                    print(f"Reward: {ach['reward_gold']} gold")
+                ach = ACHIEVEMENTS[ach_key]
+                self.achievements[ach_key] = None
+                self.gold += ach["reward_gold"]
+                self.notify("achievement", key=ach_key, desc=ach["desc"], reward_gold=ach["reward_gold"])
+
+    def begin_quest(self, quest_name, completed=()):
+        bits = QUEST_TASK_BITS.get(quest_name, {})
+        remaining = 0
+        for bit in bits.values():
+            remaining |= bit
+        done = []
+        for task in completed:
+            bit = bits.get(task, 0)
+            if remaining & bit:
+                remaining ^= bit
+                done.append(task)
+        self.active_quests[quest_name] = done
+        self.quest_progress[quest_name] = remaining
 
     def check_quests(self, completed_task):
-        for quest_name, completed in list(self.active_quests.items()):
-            if completed_task in QUESTS[quest_name]["tasks"]:
-                if completed_task not in completed:
-                    completed.append(completed_task)
-                if set(completed) == set(QUESTS[quest_name]["tasks"]):
+        # Only quests that contain this task are touched, via the reverse index
+        progress = self.quest_progress_value  # Not the property: with no quests started there's nothing to make
+        if not progress:
+            return
+        for quest_name in QUEST_INDEX.get(completed_task, ()):
+            remaining = progress.get(quest_name)
+            if remaining is None:
+                continue  # Not started (or already done)
+            bit = QUEST_TASK_BITS[quest_name][completed_task]
+            if remaining & bit:
+                remaining ^= bit
+                self.active_quests[quest_name].append(completed_task)
+                progress[quest_name] = remaining
+                if not remaining:
                     # Complete quest
                     reward_gold = QUESTS[quest_name]["reward_gold"]
                     self.gold += reward_gold
                     reward_xp = QUESTS[quest_name].get("reward_xp", {})
                     for key, amount in reward_xp.items():
-                        # Assume key is stat or skill, for simplicity assume stat if in stats else skill
-                        if key in self.stats:
-                            self.stats[key].add_xp(amount)
-                        elif key in self.skills:
-                            self.skills[key].add_xp(amount)
-                    print(f"Quest completed: {quest_name}!")
-                    print(f"Reward: {reward_gold} gold and extra XP!")
+                        stat = self.find_stat(key)
+                        if stat is not None:
+                            self.gain_xp(stat, amount)
+                    self.notify("quest_completed", quest=quest_name, reward_gold=reward_gold)
                     self.completed_quests.append(quest_name)
                     del self.active_quests[quest_name]
+                    del progress[quest_name]
 
     def regenerate_energy(self, last_save_str):
-        if last_save_str:
-            last_save = datetime.datetime.fromisoformat(last_save_str)
-            time_passed_hours = (datetime.datetime.now() - last_save).total_seconds() / 3600
-            regen = int(time_passed_hours * 10)  # 10 energy per hour
-            self.energy = min(self.max_energy, self.energy + regen)
-            print(f"Energy regenerated: +{regen} (now {self.energy}/{self.max_energy})")
+        # Catch up on the time spent saved: wind the regen clock back by it and settle. Within a
+        # process regen needs no help (see energy); only a restart has to go by the wall clock.
+        if last_save_str and self.energy_time is not None:
+            offline = (datetime.datetime.now() - datetime.datetime.fromisoformat(last_save_str)).total_seconds()
+            if offline > 0 and self.energy_value < self.max_energy:
+                self.energy_time -= offline
+            return self.settle_energy()
+        return 0
 
 # ======================
-# Functions
+# Game Engine (headless)
+# ======================
+# Everything below applies game rules to a Player and returns a result dict instead of printing,
+# so the console menus, the simulator and any other front-end share the exact same logic.
+# Every engine call takes an optional rng (anything with random()/randint()/choice()) for reproducible runs.
+
+ENERGY_REGEN_PER_HOUR = 10
+ENERGY_REGEN_PER_SECOND = ENERGY_REGEN_PER_HOUR / 3600
+
+# Clock that lazy energy regen runs on; monotonic, so wall-clock jumps can't add or take energy
+ENERGY_CLOCK = time.monotonic
+
+def perform_task(player, task_name, rng=random):
+    info = TASKS.get(task_name)
+    if info is None:
+        if METRICS.enabled:
+            METRICS.counters["life_task_rejected_total"]["invalid_task"] += 1
+        return {"ok": False, "error": "invalid_task", "task": task_name}
+    if player.energy < info["energy_cost"]:
+        if METRICS.enabled:
+            METRICS.counters["life_task_rejected_total"]["no_energy"] += 1
+        return {"ok": False, "error": "no_energy", "task": task_name}
+    stat = Stat(info["key"], block=player.stat_block, pos=info["slot"])
+    success_prob = info["success_base"] + 0.05 * stat.level  # Improves with level
+    success_prob = min(success_prob, 0.95)  # Cap at 95%
+    if rng.random() < success_prob:
+        xp = info["xp"]
+        gold_range = info.get("gold_range")
+        gold = rng.randint(*gold_range) if gold_range else info.get("gold", 0)  # Ranges pay a fresh roll each time
+        success = True
+    else:
+        xp = info["xp"] // 2  # Failed... but you learn from mistakes
+        gold = 0
+        success = False
+    apply_task_result(player, task_name, success, xp, gold, stat)
+    if METRICS.enabled:
+        METRICS.counters["life_task_successes_total" if success else "life_task_failures_total"][task_name] += 1
+    return {"ok": True, "task": task_name, "success": success, "xp": xp, "gold": gold}
+
+def apply_task_result(player, task_name, success, xp, gold, stat=None):
+    # The deterministic half of a task, shared with journal replay
+    info = TASKS[task_name]
+    if stat is None:
+        stat = Stat(info["key"], block=player.stat_block, pos=info["slot"])
+    player.gain_xp(stat, xp)
+    player.gold += gold
+    player.energy -= info["energy_cost"]
+    player.check_quests(task_name)
+    record(player, "task", task_name, success, xp, gold)
+
+def buy_item(player, item, quantity=1):
+    info = SHOP_ITEMS.get(item)
+    if info is None:
+        return {"ok": False, "error": "invalid_item", "item": item}
+    if not 1 <= quantity <= MAX_STACK:
+        return {"ok": False, "error": "invalid_quantity", "item": item, "quantity": quantity}
+    if player.inventory.room_for(item) < quantity:
+        return {"ok": False, "error": "no_room", "item": item}
+    cost = info["price"] * quantity
+    if player.gold < cost:
+        return {"ok": False, "error": "no_gold", "item": item}
+    player.gold -= cost
+    player.inventory.add(item, quantity)
+    record(player, "buy", item, quantity)
+    if METRICS.enabled:
+        METRICS.counters["life_items_bought_total"][item] += quantity
+    return {"ok": True, "item": item, "quantity": quantity, "price": cost}
+
+def consume_item(player, item, quantity=1):
+    # Using N units applies the effect once with N times the amount
+    info = SHOP_ITEMS.get(item)
+    if info is None:
+        return {"ok": False, "error": "invalid_item", "item": item}  # Checked first, so nothing is lost
+    if not 1 <= quantity <= MAX_STACK:
+        return {"ok": False, "error": "invalid_quantity", "item": item, "quantity": quantity}
+    if not player.inventory.remove(item, quantity):
+        return {"ok": False, "error": "not_in_inventory", "item": item}
+    effect = info["effect"]
+    amount = info["amount"] * quantity
+    if effect == "restore_energy":
+        player.energy = min(player.max_energy, player.energy + amount)
+    elif effect == "add_xp":
+        stat = player.find_stat(info["key"])
+        if stat is not None:
+            player.gain_xp(stat, amount)
+    elif effect == "permanent_boost":
+        stat = player.find_stat(info["key"])
+        if stat is not None:
+            stat.level += amount
+            player.check_achievements(player.stat_type(stat), stat.name)
+    elif effect == "add_gold":
+        player.gold += amount
+    record(player, "use", item, quantity)
+    if METRICS.enabled:
+        METRICS.counters["life_items_used_total"][item] += quantity
+    return {"ok": True, "item": item, "quantity": quantity, "effect": effect, "key": info.get("key"), "amount": amount}
+
+def start_quest(player, quest):
+    if quest not in QUESTS or quest in player.active_quests or quest in player.completed_quests:
+        return {"ok": False, "error": "invalid_quest", "quest": quest}
+    player.begin_quest(quest)
+    record(player, "quest", quest)
+    if METRICS.enabled:
+        METRICS.counters["life_quests_started_total"][quest] += 1
+    return {"ok": True, "quest": quest}
+
+def rest(player, hours=1):
+    before = player.energy
+    after = min(player.max_energy, before + ENERGY_REGEN_PER_HOUR * hours)
+    player.energy = after
+    record(player, "energy", after - before)
+    return {"ok": True, "energy": after - before}
+
+def random_event(player, rng=random):
+    # Random event every few actions (10% chance)
+    if rng.random() < 0.1:
+        event_type = rng.choice(["bonus", "penalty", "gift"])
+        if event_type == "bonus":
+            apply_random_event(player, event_type, rng.randint(10, 50))
+        elif event_type == "penalty":
+            apply_random_event(player, event_type, rng.randint(5, 20))
+        elif event_type == "gift":
+            random_stat = rng.choice(ALL_STAT_KEYS)
+            apply_random_event(player, event_type, rng.randint(10, 30), random_stat)
+        return event_type
+    return None
+
+def apply_random_event(player, event_type, amount, stat=None):
+    if event_type == "bonus":
+        player.gold += amount
+        player.notify("random_event", event=event_type, gold=amount)
+    elif event_type == "penalty":
+        player.energy = max(0, player.energy - amount)
+        player.notify("random_event", event=event_type, energy=amount)
+    elif event_type == "gift":
+        player.gain_xp(player.find_stat(stat), amount)
+        player.notify("random_event", event=event_type, stat=stat, xp=amount)
+    record(player, "event", event_type, amount, stat)
+
+# Action name -> engine function, for policies and anything else that drives the game by name
+ACTIONS = {
+    "task": perform_task,
+    "buy": buy_item,
+    "use": consume_item,
+    "quest": start_quest,
+}
+
+def apply_action(player, action, arg=None, rng=random):
+    if action == "task":
+        return perform_task(player, arg, rng)
+    if action == "rest":
+        return rest(player, arg or 1)
+    if action in ACTIONS:
+        return ACTIONS[action](player, arg)
+    return {"ok": False, "error": "invalid_action", "action": action}
+
+# Verbs run_command understands; anything else is timed as "invalid"
+COMMAND_VERBS = frozenset(("task", "buy", "use", "quest", "plan"))
+# The ones that act on the player; only these get the random event roll the console menu makes
+# before each action, so plans, queries and typos leave the player as they were
+ACTION_VERBS = COMMAND_VERBS - {"plan"}
+
+def is_action(command):
+    return command.strip().lower().partition(" ")[0] in ACTION_VERBS
+
+def run_command(player, command, rng=random):
+    # One text command, as typed by a person or read from a script:
+    #   task <name> | buy [count] <item> | use [count] <item> | quest [start] <name>
+    #   plan [xp|gold] [energy]
+    # Energy only comes back with time (or items), so resting is left to simulator policies.
+    verb, _, arg = command.strip().lower().partition(" ")
+    if not METRICS.enabled:
+        return dispatch_command(player, command, verb, arg.strip(), rng)
+    started = time.perf_counter()
+    result = dispatch_command(player, command, verb, arg.strip(), rng)
+    METRICS.observe("life_action_seconds", time.perf_counter() - started,
+                    verb if verb in COMMAND_VERBS else "invalid")
+    return result
+
+def dispatch_command(player, command, verb, arg, rng=random):
+    if verb == "task":
+        return perform_task(player, arg, rng)
+    if verb in ("buy", "use"):
+        quantity, item = split_quantity(arg)
+        return (buy_item if verb == "buy" else consume_item)(player, item, quantity)
+    if verb == "quest":
+        if arg.startswith("start "):
+            arg = arg[len("start "):].strip()
+        return start_quest(player, arg)
+    if verb == "plan":
+        objective, _, energy = arg.partition(" ")
+        if objective.isdigit() and not energy:
+            objective, energy = "xp", objective  # Just a budget
+        energy = energy.strip()
+        return plan_tasks(player, int(energy) if energy.isdigit() else None, objective or "xp")
+    return {"ok": False, "error": "invalid_command", "command": command}
+
+QUANTITY_DIGITS = len(str(MAX_STACK))
+
+def split_quantity(text):
+    # "3 energy potion" -> (3, "energy potion"); no leading number means one. A count longer
+    # than MAX_STACK comes back as MAX_STACK + 1 (rejected all the same) without parsing it.
+    count, _, rest = text.partition(" ")
+    if count.isdecimal() and rest:
+        return int(count) if len(count) <= QUANTITY_DIGITS else MAX_STACK + 1, rest.strip()
+    return 1, text.strip()
+
+# ======================
+# Planner
+# ======================
+# Which tasks to spend the current energy on for the most expected XP or gold. A DP over the energy
+# budget: the best plan for budget e is some move plus the best plan for e - its cost. Each budget
+# also keeps the state its plan ends in (levels, quest progress, achievements), so the next task is
+# valued at the level it would be done at and quest/achievement rewards are counted once, when the
+# plan earns them. Expected values: success_prob * (xp, gold) + (1 - success_prob) * (xp // 2, 0).
+#
+# Tables are cached on everything they were planned from: every level, xp and requirement, quest
+# progress and the set of achievements held. Asking again is a lookup until the player acts, and
+# players who stand at the same point share a table. content_changed() drops them all; the cache
+# itself lives next to CATALOG_CACHE for that reason.
+
+PLAN_OBJECTIVES = ("xp", "gold")
+PLAN_CACHE_SIZE = 256
+
+PlanTable = namedtuple("PlanTable", "energy value xp gold moves prev")
+
+def plan_tasks(player, energy=None, objective="xp"):
+    # Best expected plan for `energy` points (default: what the player has now); changes nothing.
+    # The budget is capped at max_energy: the DP costs time and memory in proportion to it, and
+    # no plan can spend more than a full bar anyway.
+    if objective not in PLAN_OBJECTIVES:
+        return {"ok": False, "error": "invalid_objective", "objective": objective}
+    if energy is None:
+        energy = player.energy
+    energy = min(max(0, int(energy)), player.max_energy)
+    values = player.stat_block.values
+    key = (objective, tuple(values), tuple(sorted(player.quest_progress.items())), frozenset(player.achievements))
+    with PLAN_LOCK:
+        table = PLAN_CACHE.get(key)
+        if table is not None and table.energy >= energy:
+            PLAN_CACHE.move_to_end(key)
+    if table is None or table.energy < energy:
+        table = build_plan(player, energy, objective)
+        with PLAN_LOCK:
+            PLAN_CACHE[key] = table
+            if len(PLAN_CACHE) > PLAN_CACHE_SIZE:
+                PLAN_CACHE.popitem(last=False)
+    moves = []
+    budget = energy
+    while budget > 0:
+        if table.moves[budget] is not None:
+            moves.append(table.moves[budget])
+        budget = table.prev[budget]
+    tasks = [task for move in reversed(moves) for task in move]
+    used = sum(TASKS[task]["energy_cost"] for task in tasks)
+    return {"ok": True, "objective": objective, "energy": energy, "energy_used": used, "tasks": tasks,
+            "xp": round(table.xp[energy], 2), "gold": round(table.gold[energy], 2)}
+
+def build_plan(player, energy, objective):
+    values = player.stat_block.values
+    want_xp = objective == "xp"
+    # Moves: every task on its own, and for each quest underway all its remaining tasks in a row.
+    # A quest's reward only comes with its last task, so one task at a time the DP would never
+    # pay for the first ones; the bundle lets it weigh the whole quest against other tasks.
+    # Per task: name, cost, stat index, xp, failed xp, gold, success_base
+    tasks = [(name, info["energy_cost"], info["slot"] // 3, info["xp"], info["xp"] // 2,
+              info["expected_gold"], info["success_base"]) for name, info in TASKS.items()]
+    bundles = []
+    for quest_name, remaining in player.quest_progress.items():
+        names = tuple(task for task, bit in QUEST_TASK_BITS[quest_name].items() if remaining & bit)
+        if len(names) > 1 and all(task in TASKS for task in names):
+            bundles.append((quest_name, remaining, names, sum(TASKS[task]["energy_cost"] for task in names)))
+    # Path state per budget: levels and xp of the 20 stats/skills, open quests and achievements.
+    # xp is shifted by 100*level - needed so "xp >= 100*level" is the level-up test even when a
+    # stat's current requirement is off-curve (old saves, permanent boosts)
+    levels = [list(values[0::3])] + [None] * energy
+    xps = [[float(values[pos + 1] + 100 * values[pos] - values[pos + 2]) for pos in range(0, len(values), 3)]]
+    xps += [None] * energy
+    quests = [dict(player.quest_progress)] + [None] * energy
+    achieved = [set(player.achievements)] + [None] * energy
+    finishing = [quest_finishers(quests[0])] + [None] * energy  # Tasks that would complete an open quest
+    value = [0.0] * (energy + 1)
+    total_xp = [0.0] * (energy + 1)
+    total_gold = [0.0] * (energy + 1)
+    moves = [None] * (energy + 1)
+    prev = [0] * (energy + 1)
+    for e in range(1, energy + 1):
+        # Leaving a point unspent is always allowed, so value never drops as the budget grows
+        best, best_move, best_prev = value[e - 1], None, e - 1
+        for name, cost, index, xp, failed_xp, gold, base in tasks:
+            if cost > e:
+                continue
+            at = e - cost
+            level = levels[at][index]
+            prob = min(base + 0.05 * level, 0.95)
+            gained_xp = prob * xp + (1 - prob) * failed_xp
+            if name in finishing[at] or xps[at][index] + gained_xp >= 100 * level:
+                # A quest reward or a level-up (maybe an achievement) on the way: the rare case
+                gained_xp, gained_gold = plan_moves((name,), levels[at], xps[at], quests[at], achieved[at])
+            else:
+                gained_gold = prob * gold
+            candidate = value[at] + (gained_xp if want_xp else gained_gold)
+            if candidate > best:
+                best, best_move, best_prev = candidate, (name,), at
+        for quest_name, remaining, names, cost in bundles:
+            at = e - cost
+            if at < 0 or quests[at].get(quest_name) != remaining:
+                continue
+            gained_xp, gained_gold = plan_moves(names, levels[at], xps[at], quests[at], achieved[at])
+            candidate = value[at] + (gained_xp if want_xp else gained_gold)
+            if candidate > best:
+                best, best_move, best_prev = candidate, names, at
+        value[e], prev[e], moves[e] = best, best_prev, best_move
+        if best_move is None:
+            levels[e], xps[e], quests[e], achieved[e] = levels[e - 1], xps[e - 1], quests[e - 1], achieved[e - 1]
+            finishing[e] = finishing[e - 1]
+            total_xp[e], total_gold[e] = total_xp[e - 1], total_gold[e - 1]
+            continue
+        levels[e], xps[e] = list(levels[best_prev]), list(xps[best_prev])
+        quests[e], achieved[e] = dict(quests[best_prev]), set(achieved[best_prev])
+        gained_xp, gained_gold = plan_moves(best_move, levels[e], xps[e], quests[e], achieved[e], copy=False)
+        finishing[e] = quest_finishers(quests[e]) if quests[e] != quests[best_prev] else finishing[best_prev]
+        total_xp[e] = total_xp[best_prev] + gained_xp
+        total_gold[e] = total_gold[best_prev] + gained_gold
+    return PlanTable(energy, value, total_xp, total_gold, moves, prev)
+
+def quest_finishers(progress):
+    # The last missing task of each open quest that is down to one
+    return frozenset(task for quest_name, remaining in progress.items()
+                     for task, bit in QUEST_TASK_BITS[quest_name].items() if remaining == bit)
+
+def plan_moves(names, levels, xps, quests, achieved, copy=True):
+    # Expected (xp, gold) of doing these tasks in order on top of a path state, quest and
+    # achievement rewards included. With copy=False the state is updated in place.
+    if copy:
+        levels, xps, quests, achieved = list(levels), list(xps), dict(quests), set(achieved)
+    total_xp = total_gold = 0.0
+    for task_name in names:
+        info = TASKS[task_name]
+        slot = info["slot"]
+        prob = min(info["success_base"] + 0.05 * levels[slot // 3], 0.95)
+        gained_xp = prob * info["xp"] + (1 - prob) * (info["xp"] // 2)
+        total_xp += gained_xp
+        total_gold += prob * info["expected_gold"]
+        grants = [(slot, gained_xp)]
+        for quest_name in QUEST_INDEX.get(task_name, ()):
+            remaining = quests.get(quest_name)
+            bit = QUEST_TASK_BITS[quest_name][task_name]
+            if remaining is None or not remaining & bit:
+                continue
+            remaining ^= bit
+            quests[quest_name] = remaining
+            if not remaining:
+                del quests[quest_name]
+                total_gold += QUESTS[quest_name]["reward_gold"]
+                for key, amount in QUESTS[quest_name].get("reward_xp", {}).items():
+                    if key in STAT_SLOTS:
+                        total_xp += amount
+                        grants.append((STAT_SLOTS[key], amount))
+        for pos, amount in grants:
+            index = pos // 3
+            level, xp = levels[index], xps[index] + amount
+            old_level = level
+            while xp >= 100 * level:
+                xp -= 100 * level
+                level += 1
+            levels[index], xps[index] = level, xp
+            if level > old_level:
+                key = ALL_STAT_KEYS[index]
+                for required, ach_key in ACHIEVEMENT_INDEX.get(("stat" if key in STAT_SET else "skill", key), ()):
+                    if required > level:
+                        break
+                    if ach_key not in achieved:
+                        achieved.add(ach_key)
+                        total_gold += ACHIEVEMENTS[ach_key]["reward_gold"]
+    return total_xp, total_gold
+
+# ======================
+# Simulation
+# ======================
+# Batch runner for balancing TASKS / SHOP_ITEMS without hand-playing.
+# A policy is a function (player, rng) -> (action, arg) picking the next move.
+
+# Tasks ordered by energy cost so a policy can find the affordable ones with one bisect
+TASKS_BY_COST = sorted(TASKS, key=lambda t: TASKS[t]["energy_cost"])
+TASK_COSTS = [TASKS[t]["energy_cost"] for t in TASKS_BY_COST]
+
+def random_policy(player, rng):
+    affordable = bisect.bisect_right(TASK_COSTS, player.energy)
+    if not affordable:
+        return "rest", 1
+    return "task", TASKS_BY_COST[int(rng.random() * affordable)]
+
+def greedy_policy(player, rng):
+    # Best expected XP per energy point for the player's current levels, potions when broke on energy
+    energy = player.energy
+    if energy < TASK_COSTS[0]:
+        if "energy potion" in player.inventory:
+            return "use", "energy potion"
+        if player.gold >= SHOP_ITEMS["energy potion"]["price"]:
+            return "buy", "energy potion"
+        return "rest", 1
+    best, best_value = None, -1.0
+    values = player.stat_block.values
+    for task in TASKS_BY_COST[:bisect.bisect_right(TASK_COSTS, energy)]:
+        info = TASKS[task]
+        prob = min(info["success_base"] + 0.05 * values[info["slot"]], 0.95)
+        value = (prob * info["xp"] + (1 - prob) * (info["xp"] // 2)) / info["energy_cost"]
+        if value > best_value:
+            best, best_value = task, value
+    return "task", best
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+}
+
+def total_level(player):
+    return sum(player.stat_block.values[0::3])
+
+def player_rng(seed, index):
+    # Every simulated player gets its own stream derived from the master seed, so a player's game
+    # doesn't depend on which process runs it or what ran before it
+    return random.Random(f"{seed}/{index}")
+
+def simulate_players(start, stop, turns, policy_name, seed, quests=True, events=True):
+    # Plays players [start, stop) and returns their raw results; the unit of work for one shard
+    policy = POLICIES[policy_name]
+    attempts = successes = 0
+    gold, levels, achievements, completed = [], [], [], []
+    for i in range(start, stop):
+        rng = player_rng(seed, i)
+        player = Player(f"sim-{i}")
+        player.stop_regen()  # Only rest restores energy, so results don't depend on how long the run takes
+        if quests:
+            for quest in QUESTS:
+                start_quest(player, quest)
+        for _ in range(turns):
+            if events:
+                random_event(player, rng)
+            action, arg = policy(player, rng)
+            result = apply_action(player, action, arg, rng)
+            if action == "task" and result["ok"]:
+                attempts += 1
+                successes += result["success"]
+        gold.append(player.gold)
+        levels.append(total_level(player))
+        achievements.append(len(player.achievements))
+        completed.append(len(player.completed_quests))
+    return {"attempts": attempts, "successes": successes, "gold": gold, "total_level": levels,
+            "achievements": achievements, "quests_completed": completed}
+
+def init_shard_worker(metrics=False, packs=()):
+    # Worker processes start with the built-in content; load the parent's packs (from the
+    # catalog cache, normally)
+    if packs:
+        load_content(packs)
+    METRICS.enabled = metrics
+
+def run_shard(*args):
+    # simulate_players in a worker process, handing back the metrics it collected for the parent to merge
+    result = simulate_players(*args)
+    if METRICS.enabled:
+        result["metrics"] = METRICS.take()
+    return result
+
+def simulate(players=100, turns=1000, policy="random", seed=None, quests=True, events=True, workers=1, shard_size=1000):
+    # Runs every player for `turns` policy moves (with the usual random event roll before each one)
+    # and returns aggregate statistics. Players are split into fixed-size shards that run in a
+    # process pool when workers > 1; shards are merged in order, so the same seed gives the same
+    # numbers whatever the worker count.
+    if callable(policy):
+        policy = next(name for name, fn in POLICIES.items() if fn is policy)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    shards = [(start, min(start + shard_size, players)) for start in range(0, players, shard_size)]
+    started = time.perf_counter()
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(workers, initializer=init_shard_worker,
+                                 initargs=(METRICS.enabled, list(CONTENT_PACKS))) as pool:
+            futures = [pool.submit(run_shard, start, stop, turns, policy, seed, quests, events)
+                       for start, stop in shards]
+            results = [future.result() for future in futures]
+        for result in results:
+            if "metrics" in result:
+                METRICS.merge(result["metrics"])
+    else:
+        results = [simulate_players(start, stop, turns, policy, seed, quests, events) for start, stop in shards]
+    elapsed = time.perf_counter() - started
+    attempts = sum(r["attempts"] for r in results)
+    successes = sum(r["successes"] for r in results)
+    merged = {key: [value for r in results for value in r[key]]
+              for key in ("gold", "total_level", "achievements", "quests_completed")}
+    return {
+        "players": players,
+        "turns": turns,
+        "seed": seed,
+        "task_attempts": attempts,
+        "success_rate": successes / attempts if attempts else 0.0,
+        "gold": summarize(merged["gold"]),
+        "total_level": summarize(merged["total_level"]),
+        "achievements": summarize(merged["achievements"]),
+        "quests_completed": summarize(merged["quests_completed"]),
+        "seconds": elapsed,
+        "tasks_per_second": attempts / elapsed if elapsed else 0.0,
+    }
+
+def summarize(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "mean": sum(ordered) / n,
+        "min": ordered[0],
+        "p50": ordered[n // 2],
+        "p90": ordered[min(n - 1, (n * 9) // 10)],
+        "max": ordered[-1],
+    }
+
+# ======================
+# Vectorized Simulation
+# ======================
+# The same rules as simulate() with the random policy, but for a whole population at once:
+# stats, energy and gold are NumPy arrays (one row per player) and every turn is a handful of
+# array operations. Quests are not modelled. NumPy is only needed for this section.
+
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("The vectorized simulator needs NumPy (pip install numpy)") from None
+    return numpy
+
+def add_xp_vectorized(np, level, xp, needed, amount):
+    # Stat.add_xp's closed form over arrays; returns new (level, xp, needed) and the mask of rows that levelled
+    level = level.astype(np.int64)
+    xp = xp.astype(np.int64) + amount
+    needed = needed.astype(np.int64)
+    up = xp >= needed
+    if up.any():
+        rest = xp[up] - needed[up]
+        start = level[up] + 1
+        b = 2 * start - 1
+        q = rest // 50
+        k = ((np.sqrt((b * b + 4 * q).astype(np.float64)) - b) // 2).astype(np.int64)
+        # The float root can be one off either way
+        k += (k + 1) * (k + 1 + b) <= q
+        k -= k * (k + b) > q
+        level[up] = start + k
+        xp[up] = rest - 50 * k * (k + b)
+        needed[up] = 100 * level[up]
+    return level, xp, needed, up
+
+def simulate_vectorized(players=100000, turns=100, seed=None, events=True, percentiles=(10, 50, 90), report_every=1):
+    np = require_numpy()
+    rng = np.random.default_rng(seed)
+    n_stats = len(ALL_STAT_KEYS)
+    rows = np.arange(players)
+
+    # Task table as arrays, in the same cost order random_policy draws from
+    task_stat = np.array([STAT_SLOTS[TASKS[t]["key"]] // 3 for t in TASKS_BY_COST])
+    task_xp = np.array([TASKS[t]["xp"] for t in TASKS_BY_COST])
+    task_gold = np.array([TASKS[t]["expected_gold"] for t in TASKS_BY_COST])  # Ranges pay their mean
+    task_cost = np.array(TASK_COSTS)
+    task_base = np.array([TASKS[t]["success_base"] for t in TASKS_BY_COST])
+    ach_col = np.array([STAT_SLOTS[a["req"]["key"]] // 3 for a in ACHIEVEMENTS.values()])
+    ach_level = np.array([a["req"]["level"] for a in ACHIEVEMENTS.values()])
+    ach_gold = np.array([a["reward_gold"] for a in ACHIEVEMENTS.values()])
+
+    # Stats are stored flat (player * n_stats + stat) so gathers and scatters are 1-D
+    level = np.ones(players * n_stats, dtype=np.int32)
+    xp = np.zeros(players * n_stats, dtype=np.int32)
+    needed = np.full(players * n_stats, 100, dtype=np.int32)
+    achieved = np.zeros((players, len(ach_col)), dtype=bool)
+    energy = np.full(players, 100, dtype=np.int64)
+    max_energy = 100
+    gold = np.zeros(players, dtype=np.float64)
+
+    def grant(who, col, amount):
+        at = who * n_stats + col
+        lv, x, nd, up = add_xp_vectorized(np, level[at], xp[at], needed[at], amount)
+        level[at], xp[at], needed[at] = lv, x, nd
+        # Achievements only change on a level up, so only those players are checked
+        who, col, lv = who[up], col[up], lv[up]
+        for a in range(len(ach_col)):
+            hit = (col == ach_col[a]) & (lv >= ach_level[a])
+            if hit.any():
+                p = who[hit]
+                new = ~achieved[p, a]
+                gold[p[new]] += ach_gold[a]
+                achieved[p, a] = True
+
+    attempts = successes = 0
+    report = {"turn": [], "total_level": [], "gold": []}
+    started = time.perf_counter()
+    for turn in range(1, turns + 1):
+        if events:
+            # 10% of players get an event: bonus gold, an energy penalty, or a gift of XP
+            hit = np.nonzero(rng.random(players) < 0.1)[0]
+            kind = rng.integers(0, 3, hit.size)
+            bonus = hit[kind == 0]
+            gold[bonus] += rng.integers(10, 51, bonus.size)
+            penalty = hit[kind == 1]
+            energy[penalty] = np.maximum(0, energy[penalty] - rng.integers(5, 21, penalty.size))
+            gift = hit[kind == 2]
+            grant(gift, rng.integers(0, n_stats, gift.size), rng.integers(10, 31, gift.size))
+
+        # Random policy: uniform over affordable tasks, rest when none is
+        affordable = np.searchsorted(task_cost, energy, side="right")
+        resting = affordable == 0
+        energy[resting] = np.minimum(max_energy, energy[resting] + ENERGY_REGEN_PER_HOUR)
+        doing = rows[~resting]
+        task = (rng.random(doing.size) * affordable[doing]).astype(np.int64)
+        col = task_stat[task]
+        prob = np.minimum(task_base[task] + 0.05 * level[doing * n_stats + col], 0.95)
+        success = rng.random(doing.size) < prob
+        grant(doing, col, np.where(success, task_xp[task], task_xp[task] // 2))
+        gold[doing] += np.where(success, task_gold[task], 0)
+        energy[doing] -= task_cost[task]
+        attempts += doing.size
+        successes += int(success.sum())
+
+        if turn % report_every == 0 or turn == turns:
+            report["turn"].append(turn)
+            report["total_level"].append(np.percentile(level.reshape(players, n_stats).sum(axis=1), percentiles).tolist())
+            report["gold"].append(np.percentile(gold, percentiles).tolist())
+    elapsed = time.perf_counter() - started
+    totals = level.reshape(players, n_stats).sum(axis=1)
+    return {
+        "players": players,
+        "turns": turns,
+        "task_attempts": attempts,
+        "success_rate": successes / attempts if attempts else 0.0,
+        "percentiles": list(percentiles),
+        "per_turn": report,
+        "gold": {"mean": float(gold.mean()), "min": int(gold.min()), "max": int(gold.max())},
+        "total_level": {"mean": float(totals.mean()), "min": int(totals.min()), "max": int(totals.max())},
+        "achievements": {"mean": float(achieved.sum(axis=1).mean())},
+        "seconds": elapsed,
+        "tasks_per_second": attempts / elapsed if elapsed else 0.0,
+    }
+
+def check_vectorized(players=2000, turns=200, seed=0, tolerance=0.03):
+    # Run the scalar and vectorized simulators on the same setup and compare their means.
+    # Returns (ok, details); used by `simulate --vectorized --check` as a regression gate.
+    scalar = simulate(players, turns, "random", seed, quests=False)
+    vector = simulate_vectorized(players, turns, seed, report_every=turns)
+    details = {}
+    ok = True
+    for key in ("total_level", "gold"):
+        a, b = scalar[key]["mean"], vector[key]["mean"]
+        diff = abs(a - b) / max(abs(a), 1e-9)
+        details[key] = {"scalar": a, "vectorized": b, "relative_difference": diff}
+        ok = ok and diff <= tolerance
+    a, b = scalar["success_rate"], vector["success_rate"]
+    details["success_rate"] = {"scalar": a, "vectorized": b, "difference": abs(a - b)}
+    ok = ok and abs(a - b) <= tolerance
+    return ok, details
+
+# ======================
+# Content Packs
+# ======================
+# TASKS, SHOP_ITEMS, ACHIEVEMENTS and QUESTS above are the built-in content. Pack files are JSON
+# objects with any of "tasks", "shop_items", "achievements" and "quests", shaped like those tables,
+# laid over the built-ins in order: a new name adds an entry, an existing one replaces it and null
+# removes it. The result is validated and compiled into a catalog: every entry gets an integer
+# "id", stat/skill references are resolved to StatBlock slots ("slot") and quest tasks to task ids
+# ("task_ids"), every task gets the gold it pays on average ("expected_gold", the mean of a
+# "gold_range", which perform_task rolls afresh on every success), and the lookup indexes are prebuilt.
+# Catalogs are cached in CONTENT_CACHE_DIR under a hash of everything they were built from, so
+# unchanged packs cost one read and one marshal load at startup.
+
+PACK_DIR = "packs"
+CONTENT_CACHE_DIR = ".life_cache"
+CATALOG_FORMAT = 2  # Bump whenever compile_content's output changes shape
+CONTENT_TABLES = {"tasks": TASKS, "shop_items": SHOP_ITEMS, "achievements": ACHIEVEMENTS, "quests": QUESTS}
+ITEM_EFFECTS = ("restore_energy", "add_xp", "permanent_boost", "add_gold")
+BUILTIN_CONTENT = {table: {name: dict(entry) for name, entry in entries.items()}
+                   for table, entries in CONTENT_TABLES.items()}
+BUILTIN_DIGEST = hashlib.blake2b(repr((CATALOG_FORMAT, marshal.version, sys.version_info[:2], ALL_STAT_KEYS,
+                                       BUILTIN_CONTENT)).encode(), digest_size=16).digest()
+CONTENT_PACKS = []  # Packs behind the installed catalog, so worker processes can load the same
+
+class ContentError(ValueError):
+    # Everything wrong with a set of packs at once, rather than one problem per run
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("Invalid content:\n" + "\n".join(f"- {problem}" for problem in problems))
+
+def default_packs():
+    # Every .json file in PACK_DIR, in name order
+    if not os.path.isdir(PACK_DIR):
+        return []
+    return sorted(os.path.join(PACK_DIR, name) for name in os.listdir(PACK_DIR) if name.endswith(".json"))
+
+def load_content(paths=(), cache_dir=CONTENT_CACHE_DIR):
+    # Install the built-in content with these packs over it; returns the catalog
+    sources = []
+    for path in paths:
+        with open(path, "rb") as f:
+            sources.append((path, f.read()))
+    digest = hashlib.blake2b(BUILTIN_DIGEST, digest_size=16)
+    for _, raw in sources:
+        digest.update(len(raw).to_bytes(8, "little"))
+        digest.update(raw)
+    cache_path = os.path.join(cache_dir, f"catalog-{digest.hexdigest()}.marshal") if cache_dir else None
+    catalog = read_cached_catalog(cache_path)
+    if catalog is None:
+        catalog = compile_content(merge_packs(sources))
+        write_cached_catalog(cache_path, catalog)
+    install_catalog(catalog)
+    CONTENT_PACKS[:] = paths
+    return catalog
+
+def merge_packs(sources):
+    # (path, raw bytes) of each pack -> validated content tables; raises ContentError
+    tables = {table: dict(entries) for table, entries in BUILTIN_CONTENT.items()}
+    origin = {}  # (table, name) -> pack it came from, for the error messages
+    problems = []
+    for path, raw in sources:
+        try:
+            pack = json.loads(raw)
+        except ValueError as e:
+            problems.append(f"{path}: not valid JSON ({e})")
+            continue
+        if not isinstance(pack, dict):
+            problems.append(f"{path}: expected an object of tables")
+            continue
+        for table, entries in pack.items():
+            if table not in tables or not isinstance(entries, dict):
+                problems.append(f"{path}: {table!r} is not one of {', '.join(tables)} or not an object")
+                continue
+            for name, entry in entries.items():
+                if entry is None:
+                    tables[table].pop(name, None)
+                else:
+                    tables[table][name] = entry
+                origin[table, name] = path
+    problems.extend(validate_content(tables, origin))
+    if problems:
+        raise ContentError(problems)
+    return tables
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def stat_problem(kind, key):
+    # Why (kind, key) doesn't name a stat or skill, or None if it does
+    if kind not in ("stat", "skill"):
+        return f"type must be 'stat' or 'skill', not {kind!r}"
+    if key not in (STAT_SET if kind == "stat" else SKILL_SET):
+        return f"no {kind} named {key!r}"
+    return None
+
+def name_problem(table, name):
+    # Task, item and quest names are typed as commands, which run_command lowercases and strips
+    if not name or name != name.strip().lower():
+        return "name must be lowercase without leading or trailing spaces, or no command can reach it"
+    if table == "shop_items" and split_quantity(name)[1] != name:
+        return "name can't start with a number, which buy and use would read as a count"
+    return None
+
+def validate_content(tables, origin=None):
+    # Problems with merged content tables, each prefixed with where the entry came from
+    origin = origin or {}
+    problems = []
+
+    def check(table, name, problem):
+        if problem:
+            problems.append(f"{origin.get((table, name), 'built-in')}: {table}[{name!r}]: {problem}")
+
+    tasks = tables["tasks"]
+    for name, task in tasks.items():
+        check("tasks", name, name_problem("tasks", name))
+        if not isinstance(task, dict):
+            check("tasks", name, "expected an object")
+            continue
+        check("tasks", name, stat_problem(task.get("type"), task.get("key")))
+        for field, low in (("xp", 0), ("energy_cost", 1)):
+            if not is_int(task.get(field)) or task[field] < low:
+                check("tasks", name, f"{field} must be an integer >= {low}")
+        base = task.get("success_base")
+        if not isinstance(base, (int, float)) or isinstance(base, bool) or not 0 <= base <= 1:
+            check("tasks", name, "success_base must be a number from 0 to 1")
+        if "gold_range" in task:
+            low_high = task["gold_range"]
+            if not (isinstance(low_high, (list, tuple)) and len(low_high) == 2 and all(map(is_int, low_high))
+                    and low_high[0] <= low_high[1]):
+                check("tasks", name, "gold_range must be [low, high] integers with low <= high")
+        elif not is_int(task.get("gold", 0)):
+            check("tasks", name, "gold must be an integer")
+
+    for name, item in tables["shop_items"].items():
+        check("shop_items", name, name_problem("shop_items", name))
+        if not isinstance(item, dict):
+            check("shop_items", name, "expected an object")
+            continue
+        if not is_int(item.get("price")) or item["price"] < 0:
+            check("shop_items", name, "price must be an integer >= 0")
+        if item.get("effect") not in ITEM_EFFECTS:
+            check("shop_items", name, f"effect must be one of {', '.join(ITEM_EFFECTS)}")
+        elif item["effect"] in ("add_xp", "permanent_boost") and item.get("key") not in STAT_SLOTS:
+            check("shop_items", name, f"no stat or skill named {item.get('key')!r}")
+        if not is_int(item.get("amount")):
+            check("shop_items", name, "amount must be an integer")
+        if not isinstance(item.get("desc"), str):
+            check("shop_items", name, "desc must be a string")
+        if "max_stack" in item and (not is_int(item["max_stack"]) or not 1 <= item["max_stack"] <= MAX_STACK):
+            check("shop_items", name, f"max_stack must be an integer from 1 to {MAX_STACK}")
+
+    for name, ach in tables["achievements"].items():
+        req = ach.get("req") if isinstance(ach, dict) else None
+        if not isinstance(req, dict):
+            check("achievements", name, "expected an object with a req object")
+            continue
+        check("achievements", name, stat_problem(req.get("type"), req.get("key")))
+        if not is_int(req.get("level")) or req["level"] < 1:
+            check("achievements", name, "req level must be an integer >= 1")
+        if not is_int(ach.get("reward_gold")):
+            check("achievements", name, "reward_gold must be an integer")
+        if not isinstance(ach.get("desc"), str):
+            check("achievements", name, "desc must be a string")
+
+    for name, quest in tables["quests"].items():
+        check("quests", name, name_problem("quests", name))
+        quest_tasks = quest.get("tasks") if isinstance(quest, dict) else None
+        if not isinstance(quest_tasks, list) or not quest_tasks:
+            check("quests", name, "expected an object with a non-empty tasks list")
+            continue
+        for task in quest_tasks:
+            if task not in tasks:
+                check("quests", name, f"no task named {task!r}")
+        if not is_int(quest.get("reward_gold")):
+            check("quests", name, "reward_gold must be an integer")
+        reward_xp = quest.get("reward_xp", {})
+        if not isinstance(reward_xp, dict):
+            check("quests", name, "reward_xp must be an object")
+            continue
+        for key, amount in reward_xp.items():
+            if key not in STAT_SLOTS or not is_int(amount):
+                check("quests", name, f"reward_xp needs a stat or skill and an integer, not {key!r}: {amount!r}")
+    return problems
+
+def compile_content(tables):
+    # Validated content tables -> catalog (see above); only builtin types, so it marshals
+    catalog = {}
+    for table, entries in tables.items():
+        compiled = catalog[table] = {}
+        for number, (name, entry) in enumerate(entries.items()):
+            entry = compiled[name] = dict(entry)
+            entry["id"] = number
+    tasks = catalog["tasks"]
+    for info in tasks.values():
+        info["slot"] = STAT_SLOTS[info["key"]]
+        if "gold_range" in info:
+            info["gold_range"] = tuple(info["gold_range"])
+            info.pop("gold", None)
+            info["expected_gold"] = sum(info["gold_range"]) / 2
+        else:
+            info["expected_gold"] = info.get("gold", 0)
+    for info in catalog["shop_items"].values():
+        if info.get("key") in STAT_SLOTS:
+            info["slot"] = STAT_SLOTS[info["key"]]
+    for ach in catalog["achievements"].values():
+        ach["slot"] = STAT_SLOTS[ach["req"]["key"]]
+    for quest in catalog["quests"].values():
+        quest["task_ids"] = [tasks[task]["id"] for task in quest["tasks"]]
+    catalog["achievement_index"] = build_achievement_index(catalog["achievements"])
+    catalog["quest_index"], catalog["quest_task_bits"] = build_quest_index(catalog["quests"])
+    catalog["tasks_by_cost"] = sorted(tasks, key=lambda task: tasks[task]["energy_cost"])
+    catalog["task_costs"] = [tasks[task]["energy_cost"] for task in catalog["tasks_by_cost"]]
+    return catalog
+
+def install_catalog(catalog):
+    # Swap the catalog into the module's tables in place, so every reference to them sees it
+    for table, target in CONTENT_TABLES.items():
+        target.clear()
+        target.update(catalog[table])
+    for target, key in ((ACHIEVEMENT_INDEX, "achievement_index"), (QUEST_INDEX, "quest_index"),
+                        (QUEST_TASK_BITS, "quest_task_bits")):
+        target.clear()
+        target.update(catalog[key])
+    STACK_LIMITS.clear()
+    STACK_LIMITS.update((item, info["max_stack"]) for item, info in SHOP_ITEMS.items() if "max_stack" in info)
+    TASKS_BY_COST[:] = catalog["tasks_by_cost"]
+    TASK_COSTS[:] = catalog["task_costs"]
+    content_changed()
+
+def read_cached_catalog(path):
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None  # Not cached yet
+    # The catalog is a few hundred thousand containers: pause the cyclic GC, which would run again
+    # and again while they're created (content has no cycles to collect anyway)
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        catalog = marshal.loads(raw)
+    except (EOFError, ValueError, TypeError):
+        return None  # Truncated or from another format: compile again
+    finally:
+        if collecting:
+            gc.enable()
+    return catalog
+
+def write_cached_catalog(path, catalog):
+    # Best effort: a read-only or full disk only costs the next startup a compile
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            marshal.dump(catalog, f)
+        os.replace(tmp, path)
+        for name in os.listdir(directory):
+            old = os.path.join(directory, name)
+            if name.startswith("catalog-") and name.endswith(".marshal") and old != path:
+                os.remove(old)
+    except OSError:
+        pass
+
+# The built-in content goes through the same compile as any pack, which validates it and gives it
+# ids and slots
+install_catalog(compile_content(merge_packs([])))
+
+# ======================
+# Storage
 # ======================
+# Where snapshots live. A storage turns a Player.to_dict() snapshot (plus "last_save"/"seq") into
+# something durable and back: write(data), write_many(datas) and read(name) -> data or None.
+# JsonFileStorage is the original single data.json; SQLiteStorage and BinaryStorage host any
+# number of profiles.
+
+def write_snapshot(data, path=DATA_FILE):
+    # Write to a temp file and rename over the old one, so a crash never leaves a half-written save
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+def read_snapshot(path=DATA_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class JsonFileStorage:
+    multi_profile = False
+
+    def __init__(self, path=None):
+        self.path = path or DATA_FILE
+
+    @timed("life_save_seconds", "json")
+    def write(self, data):
+        size = write_snapshot(data, self.path)
+        if METRICS.enabled:
+            METRICS.count("life_save_bytes_total", "json", size)
+
+    def write_many(self, datas):
+        for data in datas:
+            self.write(data)
+
+    @timed("life_load_seconds", "json")
+    def read(self, name=None):
+        # One file, one player: the name is only checked, not looked up
+        data = read_snapshot(self.path)
+        if data is not None and METRICS.enabled:
+            METRICS.count("life_load_bytes_total", "json", os.path.getsize(self.path))
+        if data is not None and name is not None and data.get("name") != name:
+            return None
+        return data
+
+    def scan(self, after=None):
+        # (cursor, snapshot) of every profile; see SQLiteStorage.scan
+        data = self.read()
+        if data is not None and after is None:
+            yield data["name"], data
+
+    def close(self):
+        pass
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    gold INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    max_energy INTEGER NOT NULL,
+    last_save TEXT,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_by_gold ON players (gold DESC, name);
+CREATE TABLE IF NOT EXISTS stats (
+    player TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    needed INTEGER NOT NULL,
+    PRIMARY KEY (player, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS stats_by_level ON stats (key, level);
+CREATE TABLE IF NOT EXISTS inventory (
+    player TEXT NOT NULL,
+    item TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (player, item)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS achievements (
+    player TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (player, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS quests (
+    player TEXT NOT NULL,
+    quest TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    done TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (player, quest)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scores (
+    player TEXT NOT NULL,
+    board TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    PRIMARY KEY (player, board)
+) WITHOUT ROWID;  -- Leaderboard totals; levels and gold are ranked from their own columns
+CREATE INDEX IF NOT EXISTS scores_by_board ON scores (board, score DESC, player);
+"""
+
+# Fills the scores of databases from before the scores table, all in SQL
+SQLITE_SCORES_BACKFILL = """
+INSERT OR IGNORE INTO scores SELECT player, 'total_level', SUM(level) FROM stats GROUP BY player;
+INSERT OR IGNORE INTO scores SELECT name, 'achievements',
+    (SELECT COUNT(*) FROM achievements WHERE player = name) FROM players;
+INSERT OR IGNORE INTO scores SELECT name, 'quests',
+    (SELECT COUNT(*) FROM quests WHERE player = name AND completed) FROM players;
+"""
+
+
+def row_bytes(rows):
+    # Rough payload size of SQLite rows for the byte counters: text by its UTF-8 length, numbers as 8
+    return sum(len(value.encode()) if isinstance(value, str) else 8 for row in rows for value in row)
+
+class SQLiteStorage:
+    # Every profile in one local SQLite file, one row per stat/item/achievement/quest.
+    # WAL mode lets other connections keep reading while a save is written. The rows last
+    # read or written for the `cache_size` most recent players are remembered, so a save only
+    # touches rows that changed; anyone else is diffed against a fresh read.
+    multi_profile = True
+
+    def __init__(self, path="life.db", cache_size=10000):
+        self.path = path
+        self.cache_size = cache_size
+        self.conn = sqlite3.connect(path, check_same_thread=False)  # Journal compaction saves from a worker thread
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+        if (self.conn.execute("SELECT 1 FROM players LIMIT 1").fetchone()
+                and not self.conn.execute("SELECT 1 FROM scores LIMIT 1").fetchone()):
+            with self.conn:
+                self.conn.executescript(SQLITE_SCORES_BACKFILL)
+        self.lock = threading.Lock()
+        self.saved = OrderedDict()  # Player name -> rows as last seen in the database, least recent first
+
+    @staticmethod
+    def rows(data):
+        name = data["name"]
+        stats = {}
+        for kind, group in (("stat", data["stats"]), ("skill", data["skills"])):
+            for key, stat in group.items():
+                stats[key] = (name, kind, key, stat["level"], stat["xp"], stat["needed"])
+        quests = {}
+        for position, (quest, done) in enumerate(data["active_quests"].items()):
+            quests[quest] = (name, quest, 0, json.dumps(done), position)
+        offset = len(quests)
+        for position, quest in enumerate(data["completed_quests"]):
+            quests[quest] = (name, quest, 1, "[]", offset + position)
+        return {
+            "players": {name: (name, data["gold"], data["energy"], data["max_energy"], data.get("last_save"), data.get("seq", 0))},
+            "stats": stats,
+            "inventory": {item: (name, item, count) for item, count in Inventory.from_data(data["inventory"]).items()},
+            "achievements": {key: (name, key, position) for position, key in enumerate(data["achievements"])},
+            "quests": quests,
+            # Leaderboard totals that no other table has a column for (see ranked_scores)
+            "scores": {
+                "total_level": (name, "total_level", sum(row[3] for row in stats.values() if row[2] in STAT_SLOTS)),
+                "achievements": (name, "achievements", len(data["achievements"])),
+                "quests": (name, "quests", len(data["completed_quests"])),
+            },
+        }
+
+    # table -> (upsert statement, delete statement)
+    STATEMENTS = {
+        "players": ("INSERT INTO players VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                    "gold = excluded.gold, energy = excluded.energy, max_energy = excluded.max_energy, "
+                    "last_save = excluded.last_save, seq = excluded.seq",
+                    "DELETE FROM players WHERE name = ?"),
+        "stats": ("INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (player, key) DO UPDATE SET "
+                  "kind = excluded.kind, level = excluded.level, xp = excluded.xp, needed = excluded.needed",
+                  "DELETE FROM stats WHERE player = ? AND key = ?"),
+        "inventory": ("INSERT INTO inventory VALUES (?, ?, ?) ON CONFLICT (player, item) DO UPDATE SET "
+                      "count = excluded.count",
+                      "DELETE FROM inventory WHERE player = ? AND item = ?"),
+        "achievements": ("INSERT INTO achievements VALUES (?, ?, ?) ON CONFLICT (player, key) DO UPDATE SET "
+                         "position = excluded.position",
+                         "DELETE FROM achievements WHERE player = ? AND key = ?"),
+        "quests": ("INSERT INTO quests VALUES (?, ?, ?, ?, ?) ON CONFLICT (player, quest) DO UPDATE SET "
+                   "completed = excluded.completed, done = excluded.done, position = excluded.position",
+                   "DELETE FROM quests WHERE player = ? AND quest = ?"),
+        "scores": ("INSERT INTO scores VALUES (?, ?, ?) ON CONFLICT (player, board) DO UPDATE SET "
+                   "score = excluded.score",
+                   "DELETE FROM scores WHERE player = ? AND board = ?"),
+    }
+
+    def write(self, data):
+        self.write_many([data])
+
+    @timed("life_save_seconds", "sqlite")
+    def write_many(self, datas):
+        # Diff every player against what the database already has and send only the changes,
+        # all in one transaction
+        upserts = {table: [] for table in self.STATEMENTS}
+        deletes = {table: [] for table in self.STATEMENTS}
+        fresh = {}
+        for data in datas:
+            name = data["name"]
+            new = self.rows(data)
+            old = self.saved.get(name)
+            if old is None:
+                old = self.load_rows(name) or {}
+            for table, rows in new.items():
+                before = old.get(table, {})
+                for key, row in rows.items():
+                    if before.get(key) != row:
+                        upserts[table].append(row)
+                for key in before:
+                    if key not in rows:
+                        deletes[table].append((name,) if table == "players" else (name, key))
+            fresh[name] = new
+        with self.lock:
+            with self.conn:
+                for table, (upsert, delete) in self.STATEMENTS.items():
+                    if deletes[table]:
+                        self.conn.executemany(delete, deletes[table])
+                    if upserts[table]:
+                        self.conn.executemany(upsert, upserts[table])
+            for name, rows in fresh.items():
+                self.remember(name, rows)
+        if METRICS.enabled:
+            METRICS.count("life_save_bytes_total", "sqlite",
+                          sum(row_bytes(rows) for rows in upserts.values()))
+
+    def load_rows(self, name):
+        with self.lock:
+            player = self.conn.execute("SELECT * FROM players WHERE name = ?", (name,)).fetchone()
+            if player is None:
+                return None
+            return {
+                "players": {name: player},
+                "stats": {row[2]: row for row in self.conn.execute("SELECT * FROM stats WHERE player = ?", (name,))},
+                "inventory": {row[1]: row for row in self.conn.execute("SELECT * FROM inventory WHERE player = ?", (name,))},
+                "achievements": {row[1]: row for row in self.conn.execute("SELECT * FROM achievements WHERE player = ?", (name,))},
+                "quests": {row[1]: row for row in self.conn.execute("SELECT * FROM quests WHERE player = ?", (name,))},
+                "scores": {row[1]: row for row in self.conn.execute("SELECT * FROM scores WHERE player = ?", (name,))},
+            }
+
+    @timed("life_load_seconds", "sqlite")
+    def read(self, name=None):
+        if name is None:
+            return None  # Many profiles: the caller has to say which one
+        rows = self.load_rows(name)
+        if rows is None:
+            return None
+        if METRICS.enabled:
+            METRICS.count("life_load_bytes_total", "sqlite",
+                          sum(row_bytes(table.values()) for table in rows.values()))
+        with self.lock:
+            self.remember(name, rows)
+        return self.snapshot(name, rows)
 
-def save_progress(player):
-    with open(DATA_FILE, "w") as f:
+    def remember(self, name, rows):
+        # Called with the lock held
+        self.saved[name] = rows
+        self.saved.move_to_end(name)
+        while len(self.saved) > self.cache_size:
+            self.saved.popitem(last=False)
+
+    def forget(self, name):
+        # Whoever held this player in memory is done with it (e.g. the server evicted it)
+        with self.lock:
+            self.saved.pop(name, None)
+
+    @staticmethod
+    def snapshot(name, rows):
+        # A profile's rows (as load_rows returns them) -> the snapshot dict
+        _, gold, energy, max_energy, last_save, seq = rows["players"][name]
+        data = {
+            "name": name,
+            "stats": {},
+            "skills": {},
+            "gold": gold,
+            "inventory": {item: row[2] for item, row in rows["inventory"].items()},
+            "energy": energy,
+            "max_energy": max_energy,
+            "achievements": [row[1] for row in sorted(rows["achievements"].values(), key=lambda r: r[2])],
+            "active_quests": {},
+            "completed_quests": [],
+            "last_save": last_save,
+            "seq": seq,
+        }
+        # Keep stats and skills in their usual order rather than the table's
+        for key in STAT_NAMES + SKILL_NAMES:
+            row = rows["stats"].get(key)
+            if row is not None:
+                data["stats" if row[1] == "stat" else "skills"][key] = {"level": row[3], "xp": row[4], "needed": row[5]}
+        for row in rows["stats"].values():
+            group = data["stats" if row[1] == "stat" else "skills"]
+            if row[2] not in group:
+                group[row[2]] = {"level": row[3], "xp": row[4], "needed": row[5]}
+        for row in sorted(rows["quests"].values(), key=lambda r: r[4]):
+            if row[2]:
+                data["completed_quests"].append(row[1])
+            else:
+                data["active_quests"][row[1]] = json.loads(row[3])
+        return data
+
+    def names(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT name FROM players ORDER BY name")]
+
+    def scan(self, after=None, page=1000):
+        # (name, snapshot) of every profile in name order, read a page of players at a time with
+        # one range query per table; resume past `after` (the name last handed out). Unlike read(),
+        # nothing is remembered, so a scan of any size runs in the memory of one page.
+        tables = [table for table in self.STATEMENTS if table != "players"]
+        while True:
+            with self.lock:
+                players = self.conn.execute("SELECT * FROM players WHERE name > ? ORDER BY name LIMIT ?",
+                                            (after if after is not None else "", page)).fetchall()
+                if not players:
+                    return
+                low, high = players[0][0], players[-1][0]
+                pages = {name: {"players": {name: row}, **{table: {} for table in tables}}
+                         for name, row in ((row[0], row) for row in players)}
+                for table in tables:
+                    key = 2 if table == "stats" else 1
+                    groups = {name: rows[table] for name, rows in pages.items()}
+                    for row in self.conn.execute(f"SELECT * FROM {table} WHERE player BETWEEN ? AND ?", (low, high)):
+                        group = groups.get(row[0])
+                        if group is not None:
+                            group[row[key]] = row
+            for name, rows in pages.items():
+                yield name, self.snapshot(name, rows)
+            after = high
+
+    def replace_many(self, datas):
+        # Bulk import: overwrite whole profiles without diffing against, or remembering, what was
+        # there before, so any number of them can stream through a page at a time
+        datas = list({data["name"]: data for data in datas}.values())  # Last one wins
+        names = [(data["name"],) for data in datas]
+        inserts = {table: [] for table in self.STATEMENTS}
+        for data in datas:
+            for table, rows in self.rows(data).items():
+                inserts[table].extend(rows.values())
+        with self.lock:
+            with self.conn:
+                for table, (upsert, _) in self.STATEMENTS.items():
+                    self.conn.executemany(f"DELETE FROM {table} WHERE {'name' if table == 'players' else 'player'} = ?", names)
+                    self.conn.executemany(upsert, inserts[table])
+            for (name,) in names:
+                self.saved.pop(name, None)
+        if METRICS.enabled:
+            METRICS.count("life_save_bytes_total", "sqlite", sum(row_bytes(rows) for rows in inserts.values()))
+
+    def ranked_scores(self, board):
+        # (name, score) of everyone on a leaderboard, best first, straight off an index:
+        # stats_by_level for a stat/skill (names then come in reverse, which RankedList's sort
+        # undoes in one pass), players_by_gold for gold and scores_by_board for the rest
+        with self.lock:
+            if board in STAT_SLOTS:
+                return self.conn.execute("SELECT player, level FROM stats WHERE key = ? "
+                                         "ORDER BY level DESC, player DESC", (board,)).fetchall()
+            if board == "gold":
+                return self.conn.execute("SELECT name, gold FROM players ORDER BY gold DESC, name").fetchall()
+            return self.conn.execute("SELECT player, score FROM scores WHERE board = ? "
+                                     "ORDER BY score DESC, player", (board,)).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+# Binary snapshots. One player is one record:
+#   RECORD_HEADER  magic, format version, flags, gold, energy, max_energy, seq
+#   STAT_ARRAY     level, xp, needed for every key of ALL_STAT_KEYS, in that order
+#   sections       each a u32 byte length and its payload: name, last_save, string table,
+#                  inventory, achievements, active quests, completed quests
+# Item, achievement, quest and task names are interned into the record's string table and
+# referred to by u32 index. Everything before the sections is at a fixed offset, so one number
+# can be read straight out of a buffer (see read_record_field) without decoding the rest.
+BINARY_VERSION = 1
+RECORD_MAGIC = b"LIFP"
+RECORD_HEADER = struct.Struct("<4sHHqqqq")
+STAT_ARRAY = struct.Struct("<" + "q" * len(DEFAULT_STAT_VALUES))
+RECORD_FIELDS = {"gold": 8, "energy": 16, "max_energy": 24, "seq": 32}
+# Flag: some number didn't fit in 64 bits, so all of them are in a trailing JSON section instead
+RECORD_WIDE = 1
+U32 = struct.Struct("<I")
+U16 = struct.Struct("<H")
+INVENTORY_ENTRY = struct.Struct("<Iq")
+
+def encode_player(data):
+    strings, ids = [], {}
+    def intern(text):
+        if text not in ids:
+            ids[text] = len(strings)
+            strings.append(text)
+        return ids[text]
+    values = list(DEFAULT_STAT_VALUES)
+    for group in ("stats", "skills"):
+        for key, stat in data[group].items():
+            pos = STAT_SLOTS.get(key)
+            if pos is not None:
+                values[pos:pos + 3] = stat["level"], stat["xp"], stat["needed"]
+    numbers = [data["gold"], data["energy"], data["max_energy"], data.get("seq", 0)]
+    flags, wide = 0, b""
+    try:
+        head = RECORD_HEADER.pack(RECORD_MAGIC, BINARY_VERSION, 0, *numbers) + STAT_ARRAY.pack(*values)
+    except struct.error:
+        flags = RECORD_WIDE
+        head = RECORD_HEADER.pack(RECORD_MAGIC, BINARY_VERSION, flags, 0, 0, 0, 0) + STAT_ARRAY.pack(*[0] * len(values))
+        wide = json.dumps([numbers, values]).encode()
+
+    inventory = Inventory.from_data(data["inventory"])
+    inventory_part = U32.pack(len(inventory)) + b"".join(
+        INVENTORY_ENTRY.pack(intern(item), count) for item, count in inventory.items())
+    achievements = [intern(key) for key in data["achievements"]]
+    quests = [U32.pack(len(data["active_quests"]))]
+    for quest, done in data["active_quests"].items():
+        quests.append(struct.pack(f"<II{len(done)}I", intern(quest), len(done), *[intern(task) for task in done]))
+    completed = [intern(quest) for quest in data["completed_quests"]]
+    sections = [
+        data["name"].encode(),
+        (data.get("last_save") or "").encode(),
+        U32.pack(len(strings)) + b"".join(U16.pack(len(raw)) + raw for raw in (s.encode() for s in strings)),
+        inventory_part,
+        struct.pack(f"<I{len(achievements)}I", len(achievements), *achievements),
+        b"".join(quests),
+        struct.pack(f"<I{len(completed)}I", len(completed), *completed),
+    ]
+    if flags & RECORD_WIDE:
+        sections.append(wide)
+    return head + b"".join(U32.pack(len(section)) + section for section in sections)
+
+def decode_player(buf, offset=0):
+    magic, version, flags, gold, energy, max_energy, seq = RECORD_HEADER.unpack_from(buf, offset)
+    if magic != RECORD_MAGIC:
+        raise ValueError("Not a player record")
+    if version > BINARY_VERSION:
+        raise ValueError(f"Player record version {version} is newer than this game ({BINARY_VERSION})")
+    values = STAT_ARRAY.unpack_from(buf, offset + RECORD_HEADER.size)
+    pos = offset + RECORD_HEADER.size + STAT_ARRAY.size
+    sections = []
+    for _ in range(8 if flags & RECORD_WIDE else 7):
+        (length,) = U32.unpack_from(buf, pos)
+        sections.append(bytes(buf[pos + 4:pos + 4 + length]))
+        pos += 4 + length
+    if flags & RECORD_WIDE:
+        (gold, energy, max_energy, seq), values = json.loads(sections[7])
+    name, last_save, table, inventory, achievements, quests, completed = sections[:7]
+
+    (count,) = U32.unpack_from(table, 0)
+    strings, at = [], 4
+    for _ in range(count):
+        (length,) = U16.unpack_from(table, at)
+        strings.append(table[at + 2:at + 2 + length].decode())
+        at += 2 + length
+    data = {
+        "name": name.decode(),
+        "stats": {},
+        "skills": {},
+        "gold": gold,
+        "inventory": {strings[i]: n for i, n in INVENTORY_ENTRY.iter_unpack(inventory[4:])},
+        "energy": energy,
+        "max_energy": max_energy,
+        "achievements": [strings[i] for i in struct.unpack_from(f"<{len(achievements) // 4 - 1}I", achievements, 4)],
+        "active_quests": {},
+        "completed_quests": [strings[i] for i in struct.unpack_from(f"<{len(completed) // 4 - 1}I", completed, 4)],
+        "last_save": last_save.decode() or None,
+        "seq": seq,
+    }
+    for key in ALL_STAT_KEYS:
+        slot = STAT_SLOTS[key]
+        group = data["stats"] if key in STAT_SET else data["skills"]
+        group[key] = {"level": values[slot], "xp": values[slot + 1], "needed": values[slot + 2]}
+    (count,) = U32.unpack_from(quests, 0)
+    at = 4
+    for _ in range(count):
+        quest, done = struct.unpack_from("<II", quests, at)
+        data["active_quests"][strings[quest]] = [strings[i] for i in struct.unpack_from(f"<{done}I", quests, at + 8)]
+        at += 8 + 4 * done
+    return data
+
+def read_record_field(buf, offset, field):
+    # gold / energy / max_energy / seq, or a stat or skill key for its level, without decoding the record
+    flags = U16.unpack_from(buf, offset + 6)[0]
+    if flags & RECORD_WIDE:
+        data = decode_player(buf, offset)
+        return data[field] if field in RECORD_FIELDS else (data["stats"].get(field) or data["skills"][field])["level"]
+    if field in RECORD_FIELDS:
+        return struct.unpack_from("<q", buf, offset + RECORD_FIELDS[field])[0]
+    return struct.unpack_from("<q", buf, offset + RECORD_HEADER.size + 8 * STAT_SLOTS[field])[0]
+
+def record_scores(buf, offset=0):
+    # (name, scores as snapshot_scores gives them) of a record, from its fixed part and the
+    # counts at the head of two sections, without decoding the rest
+    flags = U16.unpack_from(buf, offset + 6)[0]
+    if flags & RECORD_WIDE:
+        data = decode_player(buf, offset)
+        return data["name"], snapshot_scores(data)
+    levels = STAT_ARRAY.unpack_from(buf, offset + RECORD_HEADER.size)[0::3]
+    gold = struct.unpack_from("<q", buf, offset + RECORD_FIELDS["gold"])[0]
+    pos = offset + RECORD_HEADER.size + STAT_ARRAY.size
+    counts = []
+    for section in range(7):
+        (length,) = U32.unpack_from(buf, pos)
+        if section == 0:
+            name = bytes(buf[pos + 4:pos + 4 + length]).decode()
+        elif section in (4, 6):  # Achievements, completed quests: a u32 count first
+            counts.append(U32.unpack_from(buf, pos + 4)[0])
+        pos += 4 + length
+    return name, levels + (sum(levels), gold, *counts)
+
+
+# A container file holds any number of records behind a fixed header:
+#   CONTAINER_HEADER  magic, version, base index offset/count, newest delta segment offset,
+#                     delta entries, live bytes
+# Index entries are (64-bit hash of the name, record offset, record length). The base index is
+# sorted by hash and binary-searched in place through the mmap, so finding a profile needs no
+# loading at all. Entries written since the base was built go into delta segments: each write
+# appends its records and one segment holding just their entries plus the offset of the segment
+# before it, then flips the header to point at it. The chain is read into a dict on open (newest
+# entry wins) and folded into a fresh base once it holds DELTA_LIMIT entries. Once dead records
+# outweigh live ones the file is rewritten without them, off the write lock.
+# Version 1 containers kept the whole delta in one block; their first write starts a chain with it.
+CONTAINER_MAGIC = b"LIFC"
+CONTAINER_VERSION = 2
+CONTAINER_HEADER = struct.Struct("<4sHHQQQQQ")
+INDEX_ENTRY = struct.Struct("<QQI")
+DELTA_SEGMENT = struct.Struct("<QI")  # Offset of the previous segment (0 = none), entries that follow
+DELTA_LIMIT = 4096
+
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "little")
+
+
+class BinaryStorage:
+    multi_profile = True
+
+    def __init__(self, path="life.bin"):
+        self.path = path
+        self.lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, 0, 0, 0, 0, 0))
+        self.file = open(path, "r+b")
+        self.map = None
+        self.compacting = False
+        self.load_delta(*self.remap())
+
+    def remap(self):
+        # Map the file as it is now and read the header; returns (version, delta offset, delta count)
+        if self.map is not None:
+            self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.base_offset, self.base_count, delta_offset, delta_count, self.live = \
+            CONTAINER_HEADER.unpack_from(self.map, 0)
+        if magic != CONTAINER_MAGIC:
+            raise ValueError(f"{self.path} is not a LIFE SYSTEM container")
+        if version > CONTAINER_VERSION:
+            raise ValueError(f"{self.path} is version {version}, newer than this game ({CONTAINER_VERSION})")
+        return version, delta_offset, delta_count
+
+    def load_delta(self, version, delta_offset, delta_count):
+        self.delta = {}
+        if version < 2:
+            # One block of delta_count entries, oldest first
+            block = self.map[delta_offset:delta_offset + delta_count * INDEX_ENTRY.size]
+            for key, offset, length in INDEX_ENTRY.iter_unpack(block):
+                self.delta[key] = (offset, length)
+            self.delta_offset = None  # No chain to append to yet
+        else:
+            segment = delta_offset
+            while segment:
+                previous, count = DELTA_SEGMENT.unpack_from(self.map, segment)
+                start = segment + DELTA_SEGMENT.size
+                for key, offset, length in INDEX_ENTRY.iter_unpack(self.map[start:start + count * INDEX_ENTRY.size]):
+                    self.delta.setdefault(key, (offset, length))  # Walking newest to oldest
+                segment = previous
+            self.delta_offset = delta_offset
+        self.delta_count = delta_count
+
+    def find(self, name):
+        # (offset, length) of the profile's record, or None
+        key = name_hash(name)
+        entry = self.delta.get(key)
+        if entry is not None:
+            return entry
+        lo, hi = 0, self.base_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, offset, length = INDEX_ENTRY.unpack_from(self.map, self.base_offset + mid * INDEX_ENTRY.size)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return offset, length
+        return None
+
+    def entries(self):
+        # Every live (hash, offset, length), base and delta merged
+        merged = {key: (offset, length) for key, offset, length in INDEX_ENTRY.iter_unpack(
+            self.map[self.base_offset:self.base_offset + self.base_count * INDEX_ENTRY.size])}
+        merged.update(self.delta)
+        return merged
+
+    def write(self, data):
+        self.write_many([data])
+
+    @timed("life_save_seconds", "binary")
+    def write_many(self, datas):
+        with self.lock:
+            records = [encode_player(data) for data in datas]
+            self.file.seek(0, os.SEEK_END)
+            end = self.file.tell()
+            live = self.live
+            written = {}
+            for data, record in zip(datas, records):
+                old = self.find(data["name"])
+                if old is not None:
+                    live -= old[1]
+                written[name_hash(data["name"])] = (end, len(record))
+                self.delta[name_hash(data["name"])] = (end, len(record))
+                self.file.write(record)
+                end += len(record)
+                live += len(record)
+            base_offset, base_count = self.base_offset, self.base_count
+            if self.delta_count + len(written) > DELTA_LIMIT:
+                base = sorted(self.entries().items())
+                base_offset, base_count = end, len(base)
+                self.file.write(b"".join(INDEX_ENTRY.pack(key, *entry) for key, entry in base))
+                end += base_count * INDEX_ENTRY.size
+                self.delta = {}
+                delta_offset, delta_count = 0, 0
+            else:
+                if self.delta_offset is None:
+                    written = self.delta  # Upgrading a version 1 file: its whole delta starts the chain
+                self.file.write(DELTA_SEGMENT.pack(self.delta_offset or 0, len(written)))
+                self.file.write(b"".join(INDEX_ENTRY.pack(key, *entry) for key, entry in written.items()))
+                delta_offset, delta_count = end, self.delta_count + len(written)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            # The new records and index are durable; only now point the header at them
+            self.file.seek(0)
+            self.file.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, base_offset, base_count,
+                                                  delta_offset, delta_count, live))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.delta_offset, self.delta_count = delta_offset, delta_count
+            self.remap()
+            if METRICS.enabled:
+                METRICS.count("life_save_bytes_total", "binary", sum(len(record) for record in records))
+            compact = not self.compacting and len(self.map) > 2 * self.live + (1 << 20)
+            self.compacting = self.compacting or compact
+        if compact:
+            self.compact()
+
+    def compact(self):
+        # Rewrite the container with only the live records and a fresh base index. The bulk copy
+        # runs off the lock (records are never modified in place, so a private map of the file
+        # stays valid); only records saved in the meantime are copied with the lock held, just
+        # before the new file replaces the old one.
+        tmp_path = self.path + ".tmp"
+        try:
+            with self.lock:
+                source = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+                copied = self.entries()
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(b"\0" * CONTAINER_HEADER.size)
+                    offset, placed = CONTAINER_HEADER.size, {}
+                    for key, (old, length) in sorted(copied.items()):
+                        f.write(source[old:old + length])
+                        placed[key] = (offset, length)
+                        offset += length
+                    with self.lock:
+                        for key, (old, length) in self.entries().items():
+                            if copied.get(key) != (old, length):
+                                f.write(self.map[old:old + length])
+                                placed[key] = (offset, length)
+                                offset += length
+                        f.write(b"".join(INDEX_ENTRY.pack(key, *entry) for key, entry in sorted(placed.items())))
+                        f.seek(0)
+                        f.write(CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, 0, offset, len(placed),
+                                                      0, 0, offset - CONTAINER_HEADER.size))
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self.map.close()
+                        self.map = None
+                        self.file.close()
+                        os.replace(tmp_path, self.path)
+                        self.file = open(self.path, "r+b")
+                        self.load_delta(*self.remap())
+            finally:
+                source.close()
+        finally:
+            self.compacting = False
+
+    @timed("life_load_seconds", "binary")
+    def read(self, name=None):
+        if name is None:
+            return None  # Many profiles: the caller has to say which one
+        with self.lock:
+            entry = self.find(name)
+            if entry is None:
+                return None
+            data = decode_player(self.map, entry[0])
+        if data["name"] != name:
+            return None  # 64-bit hash collision with another profile
+        if METRICS.enabled:
+            METRICS.count("life_load_bytes_total", "binary", entry[1])
+        return data
+
+    def read_field(self, name, field):
+        # One number from a profile (see read_record_field) straight out of the mmap, or None
+        with self.lock:
+            entry = self.find(name)
+            if entry is None:
+                return None
+            return read_record_field(self.map, entry[0], field)
+
+    def scan(self, after=None, page=1000, decode=decode_player):
+        # (name hash, snapshot) of every profile in hash order, a page at a time with the lock
+        # released in between so saves can go on; resume past `after` (the hash last handed out).
+        # `decode` turns a record (buffer, offset) into whatever should be handed out instead.
+        cursor = -1 if after is None else after
+        while True:
+            with self.lock:
+                lo, hi = 0, self.base_count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if INDEX_ENTRY.unpack_from(self.map, self.base_offset + mid * INDEX_ENTRY.size)[0] <= cursor:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                entries = {}
+                for i in range(lo, min(lo + page, self.base_count)):
+                    key, offset, length = INDEX_ENTRY.unpack_from(self.map, self.base_offset + i * INDEX_ENTRY.size)
+                    entries[key] = (offset, length)
+                # Delta entries win over the base, but only up to where this page of the base ends
+                limit = max(entries) if len(entries) == page else float("inf")
+                for key in sorted(key for key in self.delta if cursor < key <= limit)[:page]:
+                    entries[key] = self.delta[key]
+                keys = sorted(entries)[:page]
+                if not keys:
+                    return
+                batch = [(key, decode(self.map, entries[key][0])) for key in keys]
+            yield from batch
+            cursor = keys[-1]
+
+    def scores(self):
+        # (name, scores on every board) of every profile, for filling leaderboards (see record_scores)
+        for _, (name, scores) in self.scan(decode=record_scores):
+            yield name, scores
+
+    def names(self):
+        with self.lock:
+            names = []
+            for offset, _ in self.entries().values():
+                pos = offset + RECORD_HEADER.size + STAT_ARRAY.size
+                (length,) = U32.unpack_from(self.map, pos)
+                names.append(self.map[pos + 4:pos + 4 + length].decode())
+            return sorted(names)
+
+    def close(self):
+        with self.lock:
+            self.map.close()
+            self.file.close()
+
+# ======================
+# Bulk Export / Import
+# ======================
+# Many profiles in one file, one flat record each: JSON Lines, or CSV with the same columns (the
+# nested inventory, achievements and quest columns hold compact JSON there). Everything streams:
+# storages hand out profiles a page at a time through scan(), imports are written in chunks, and
+# a checkpoint file (the cursor or byte offset reached, rewritten after every chunk) lets an
+# interrupted run pick up where it stopped. Bad records are skipped and reported, not fatal.
+
+STAT_FIELDS = ("level", "xp", "needed")
+PROFILE_NESTED = ("inventory", "achievements", "active_quests", "completed_quests")
+STAT_COLUMNS = [(key, tuple(f"{key}.{field}" for field in STAT_FIELDS)) for key in ALL_STAT_KEYS]
+PROFILE_COLUMNS = (["name", "gold", "energy", "max_energy", "last_save", "seq"]
+                   + [column for _, columns in STAT_COLUMNS for column in columns]
+                   + list(PROFILE_NESTED))
+BULK_FORMATS = ("jsonl", "csv")
+CHECKPOINT_EVERY = 10000  # Exported profiles between checkpoints
+
+def bulk_format(path, default="jsonl"):
+    # Format from a file name: .csv is CSV, .jsonl/.ndjson JSON Lines, anything else `default`
+    ext = os.path.splitext(path or "")[1].lower()
+    return {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(ext, default)
+
+def flatten_profile(data):
+    # A snapshot -> one flat record with a column per stat/skill field (see PROFILE_COLUMNS)
+    values = {**data["stats"], **data["skills"]}
+    record = {"name": data["name"], "gold": data["gold"], "energy": data["energy"], "max_energy": data["max_energy"],
+              "last_save": data.get("last_save"), "seq": data.get("seq", 0)}
+    for key, (level, xp, needed) in STAT_COLUMNS:
+        stat = values.get(key)
+        if stat is None:
+            record[level], record[xp], record[needed] = DEFAULT_STAT_VALUES[:3]
+        else:
+            record[level], record[xp], record[needed] = stat["level"], stat["xp"], stat["needed"]
+    record["inventory"] = dict(Inventory.from_data(data["inventory"]))
+    record["achievements"] = list(data["achievements"])
+    record["active_quests"] = {quest: list(done) for quest, done in data["active_quests"].items()}
+    record["completed_quests"] = list(data["completed_quests"])
+    return record
+
+def as_int(value):
+    # An int from JSON or a CSV field, or None
+    if is_int(value):
+        return value
+    if isinstance(value, str) and re.fullmatch(r"\s*-?\d+\s*", value):
+        return int(value)
+    return None
+
+def unflatten_profile(record):
+    # A flat record -> (snapshot for a storage, list of problems); a record with problems is unusable
+    errors = []
+
+    def number(column, low, default=None):
+        value = record.get(column)
+        if type(value) is int and value >= low:
+            return value  # The usual case for JSON Lines
+        if value in (None, "") and default is not None:
+            return default
+        number = as_int(value)
+        if value is None:
+            errors.append(f"{column} is missing")
+        elif number is None or number < low:
+            errors.append(f"{column} must be an integer >= {low}, not {value!r}")
+        return number
+
+    def nested(column, kind):
+        value = record.get(column)
+        if value in (None, ""):
+            return kind()
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                errors.append(f"{column} is not valid JSON")
+                return kind()
+        if not isinstance(value, kind):
+            errors.append(f"{column} must be a JSON {'object' if kind is dict else 'array'}")
+            return kind()
+        return value
+
+    name = record.get("name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append("name is missing")
+    last_save = record.get("last_save") or None
+    if last_save is not None:
+        try:
+            datetime.datetime.fromisoformat(last_save)
+        except (TypeError, ValueError):
+            errors.append(f"last_save is not an ISO timestamp: {last_save!r}")
+    data = {
+        "name": name,
+        "stats": {},
+        "skills": {},
+        "gold": number("gold", 0),
+        "inventory": {},
+        "energy": number("energy", 0),
+        "max_energy": number("max_energy", 1),
+        "achievements": [],
+        "active_quests": {},
+        "completed_quests": [],
+        "last_save": last_save,
+        "seq": number("seq", 0, default=0),
+    }
+    for key, (level, xp, needed) in STAT_COLUMNS:
+        data["stats" if key in STAT_SET else "skills"][key] = {
+            "level": number(level, 1, 1), "xp": number(xp, 0, 0), "needed": number(needed, 1, 100)}
+    for item, count in nested("inventory", dict).items():
+        if item not in SHOP_ITEMS:
+            errors.append(f"no item named {item!r}")
+        elif not is_int(count) or not 1 <= count <= MAX_STACK:
+            errors.append(f"inventory count of {item!r} must be an integer from 1 to {MAX_STACK}")
+        else:
+            data["inventory"][item] = count
+    for ach in nested("achievements", list):
+        if ach not in ACHIEVEMENTS:
+            errors.append(f"no achievement named {ach!r}")
+        else:
+            data["achievements"].append(ach)
+    for quest, done in nested("active_quests", dict).items():
+        if quest not in QUESTS:
+            errors.append(f"no quest named {quest!r}")
+        elif not isinstance(done, list) or any(task not in QUEST_TASK_BITS[quest] for task in done):
+            errors.append(f"active quest {quest!r} lists tasks that aren't part of it")
+        else:
+            data["active_quests"][quest] = done
+    for quest in nested("completed_quests", list):
+        if quest not in QUESTS:
+            errors.append(f"no quest named {quest!r}")
+        else:
+            data["completed_quests"].append(quest)
+    return data, errors
+
+def read_checkpoint(path, job):
+    # The unfinished progress saved for this same job (same kind, file and format), or a fresh start
+    if path:
+        state = read_snapshot(path)
+        if state is not None and not state.get("done") and all(state.get(key) == value for key, value in job.items()):
+            return state
+    return dict(job)
+
+def export_profiles(storage, out, fmt="jsonl", checkpoint=None):
+    # Write every profile in `storage` to the file `out` ("-" for stdout); returns the progress.
+    # With a checkpoint file, a rerun of the same export continues from the last checkpoint.
+    state = read_checkpoint(checkpoint, {"kind": "export", "file": out, "format": fmt})
+    resuming = "after" in state and out != "-"
+    if out == "-":
+        f = sys.stdout
+    elif resuming:
+        f = open(out, "r+", encoding="utf-8", newline="")
+        f.truncate(state["bytes"])  # Drop whatever was written after the checkpoint
+        f.seek(state["bytes"])
+    else:
+        f = open(out, "w", encoding="utf-8", newline="")
+    state.setdefault("exported", 0)
+    try:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer is not None and not resuming:
+            writer.writerow(PROFILE_COLUMNS)
+        for cursor, data in storage.scan(state.get("after")):
+            record = flatten_profile(data)
+            if writer is not None:
+                writer.writerow([json.dumps(record[column], separators=(",", ":")) if column in PROFILE_NESTED
+                                 else record[column] for column in PROFILE_COLUMNS])
+            else:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            state["exported"] += 1
+            state["after"] = cursor
+            if checkpoint and out != "-" and state["exported"] % CHECKPOINT_EVERY == 0:
+                f.flush()
+                state["bytes"] = f.tell()
+                write_snapshot(state, checkpoint)
+        f.flush()
+        if checkpoint and out != "-":
+            state["bytes"] = f.tell()
+            state["done"] = True
+            write_snapshot(state, checkpoint)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return state
+
+def read_profile_records(f, fmt, start=0):
+    # (byte offset of the record, offset just past it, record or None, problem or None) for each
+    # record of a binary file, from byte `start` on. CSV's header is always read from the top first.
+    if fmt == "csv":
+        f.seek(0)
+        header = f.readline()
+        columns = next(csv.reader([header.decode("utf-8")]), [])
+        position = [max(start, len(header))]
+        f.seek(position[0])
+
+        def lines():
+            for raw in f:
+                position[0] += len(raw)
+                yield raw.decode("utf-8", "replace")
+
+        reader = csv.reader(lines())
+        while True:
+            offset = position[0]  # The reader pulls only the lines of one record at a time
+            row = next(reader, None)
+            if row is None:
+                return
+            if not row:
+                continue
+            if len(row) != len(columns):
+                yield offset, position[0], None, f"expected {len(columns)} fields, found {len(row)}"
+            else:
+                yield offset, position[0], dict(zip(columns, row)), None
+    f.seek(start)
+    end = start
+    for raw in f:
+        offset, end = end, end + len(raw)
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as e:
+            yield offset, end, None, f"not valid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield offset, end, None, "expected a JSON object"
+            continue
+        yield offset, end, record, None
+
+def import_profiles(storage, path, fmt="jsonl", batch=1000, checkpoint=None, report=None):
+    # Stream the records of `path` into `storage`, `batch` profiles per write. Rejected records are
+    # written to `report` (a text file) as JSON lines of their byte offset, name and problems.
+    # With a checkpoint file, a rerun of the same import continues after the last written batch.
+    state = read_checkpoint(checkpoint, {"kind": "import", "file": path, "format": fmt})
+    state.setdefault("offset", 0)
+    state.setdefault("imported", 0)
+    state.setdefault("rejected", 0)
+    write_many = getattr(storage, "replace_many", storage.write_many)
+    chunk = []
+
+    def flush(offset):
+        write_many(chunk)
+        state["imported"] += len(chunk)
+        state["offset"] = offset
+        chunk.clear()
+        if checkpoint:
+            write_snapshot(state, checkpoint)
+
+    with open(path, "rb") as f:
+        end = state["offset"]
+        for offset, end, record, problem in read_profile_records(f, fmt, state["offset"]):
+            if problem is None:
+                data, problems = unflatten_profile(record)
+            else:
+                data, problems = None, [problem]
+            if problems:
+                state["rejected"] += 1
+                if report is not None:
+                    name = record.get("name") if record else None
+                    report.write(json.dumps({"offset": offset, "name": name, "errors": problems}) + "\n")
+            else:
+                chunk.append(data)
+                if len(chunk) >= batch:
+                    flush(end)
+        if chunk or checkpoint:
+            flush(end)
+    state["done"] = True
+    if checkpoint:
+        write_snapshot(state, checkpoint)
+    return state
+
+# ======================
+# Save Journal
+# ======================
+# Instead of rewriting data.json after every action, each state change is appended to a journal
+# as one short JSON line: [seq, kind, args...]. Every `compact_every` records the player is
+# snapshotted into data.json (in a background thread) and the journal starts over, so loading is
+# "snapshot + short tail". Every record reaches the OS at once (so a killed process loses nothing);
+# fsync is batched on a timer: at most `durability_window` seconds of records can be lost in a
+# power cut (0 syncs every record).
+
+JOURNAL_FILE = "data.journal"
+
+def record(player, kind, *args):
+    if player.journal is not None:
+        player.journal.record(kind, *args)
+
+def apply_record(player, entry):
+    # Re-apply one journal entry. Everything random was resolved when it was recorded.
+    kind, args = entry[1], entry[2:]
+    if kind == "task":
+        apply_task_result(player, *args)
+    elif kind == "buy":
+        buy_item(player, *args)
+    elif kind == "use":
+        consume_item(player, *args)
+    elif kind == "quest":
+        start_quest(player, *args)
+    elif kind == "event":
+        apply_random_event(player, *args)
+    elif kind == "energy":
+        player.energy = min(player.max_energy, player.energy + args[0])
+
+
+class Journal:
+    def __init__(self, path=JOURNAL_FILE, storage=None, durability_window=1.0, compact_every=1000):
+        self.path = path
+        self.storage = storage or JsonFileStorage()
+        self.durability_window = durability_window
+        self.compact_every = compact_every
+        self.seq = 0
+        self.pending = 0  # Records since the last snapshot
+        self.file = None
+        self.compactor = None
+        self.lock = threading.Lock()  # The sync timer runs on its own thread
+        self.timer = None  # Pending fsync of records written since the last one
+
+    def segments(self):
+        # A journal that is being compacted is parked at <path>.old until its snapshot is on disk
+        return [p for p in (self.path + ".old", self.path) if os.path.exists(p)]
+
+    def replay(self, player, after_seq):
+        # Apply every entry newer than the snapshot; returns (last seq, time of last write)
+        journal, events, metrics, regen = player.journal, player.events, METRICS.enabled, player.energy_time
+        player.journal, player.events = None, None  # Don't re-record or re-announce history
+        METRICS.enabled = False  # ...or count it twice
+        player.energy_time = None  # Regen in between was journaled as "energy" entries
+        seq, last_write = after_seq, None
+        try:
+            for path in self.segments():
+                last_write = max(last_write or "", datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat())
+                with open(path, "r") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # Torn final line from a crash mid-write
+                        if entry[0] > seq:
+                            apply_record(player, entry)
+                            seq = entry[0]
+        finally:
+            player.journal, player.events = journal, events
+            METRICS.enabled = metrics
+            player.energy_time = regen
+        return seq, last_write
+
+    def open(self, seq=0):
+        self.seq = seq
+        if os.path.exists(self.path):
+            # Cut a torn final line from a crash mid-write, or the next record would be glued onto it
+            with open(self.path, "rb+") as f:
+                content = f.read()
+                if content and not content.endswith(b"\n"):
+                    f.truncate(content.rfind(b"\n") + 1)
+        self.file = open(self.path, "a")
+
+    def record(self, kind, *args):
+        self.seq += 1
+        self.pending += 1
+        with self.lock:
+            self.file.write(json.dumps([self.seq, kind, *args], separators=(",", ":")) + "\n")
+            self.file.flush()
+            if self.durability_window <= 0:
+                os.fsync(self.file.fileno())
+            elif self.timer is None:
+                self.timer = threading.Timer(self.durability_window, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def sync(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.file is not None and not self.file.closed:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+
+    def maybe_compact(self, player):
+        if self.pending >= self.compact_every:
+            self.compact(player)
+
+    def compact(self, player, background=True):
+        # Capture the state now (cheap), park the current journal, and write the snapshot
+        # either here or on a worker thread. Entries after `seq` go to a fresh journal.
+        self.wait()
+        player.settle_energy()  # Journal the regen so far, or a later "energy" entry would count it twice
         data = player.to_dict()
         data["last_save"] = datetime.datetime.now().isoformat()
-        json.dump(data, f)
-    print(f"\n✅ Progress saved to {DATA_FILE}")
-
-def load_progress():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-            player = Player.from_dict(data)
-            last_save = data.get("last_save")
-            player.regenerate_energy(last_save)
-            return player
+        data["seq"] = self.seq
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+        self.park()
+        self.open(self.seq)
+        self.pending = 0
+        if background:
+            self.compactor = threading.Thread(target=self.finish_compaction, args=(data,), daemon=True)
+            self.compactor.start()
+        else:
+            self.finish_compaction(data)
+
+    def park(self):
+        # Move the journal to <path>.old. One may already be there from a compaction that crashed
+        # before its snapshot landed; its entries are in no snapshot yet, so append rather than replace.
+        old = self.path + ".old"
+        if not os.path.exists(self.path):
+            return
+        if not os.path.exists(old):
+            os.replace(self.path, old)
+            return
+        with open(self.path, "r") as src, open(old, "a") as dst:
+            for line in src:
+                if line.endswith("\n"):  # A torn final line never made it anyway
+                    dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.path)
+
+    def finish_compaction(self, data):
+        self.storage.write(data)
+        # Only now is the parked journal redundant; a crash before this point replays it instead
+        if os.path.exists(self.path + ".old"):
+            os.remove(self.path + ".old")
+
+    def wait(self):
+        if self.compactor is not None:
+            self.compactor.join()
+            self.compactor = None
+
+    def close(self):
+        self.wait()
+        if self.file is not None:
+            self.sync()
+            with self.lock:
+                self.file.close()
+                self.file = None
+
+# ======================
+# Rendering
+# ======================
+# Console output is composed into one string per screen and handed to SCREEN in a single write,
+# which keeps slow SSH links and recorded sessions from seeing dozens of tiny writes. Listings
+# that only depend on the content tables are rendered once into CATALOG_CACHE.
+
+class Screen:
+    # Where console output goes: a sink with write() (None means whatever sys.stdout is at the
+    # time, so redirect_stdout still works), or nowhere at all when `discard` is set
+    def __init__(self, sink=None, discard=False):
+        self.sink = sink
+        self.discard = discard
+
+    def write(self, text):
+        if self.discard or not text:
+            return
+        sink = self.sink if self.sink is not None else sys.stdout
+        sink.write(text)
+        if hasattr(sink, "flush"):
+            sink.flush()
+
+    def show(self, *lines):
+        self.write("\n".join(lines) + "\n")
+
+    def ask(self, prompt, *lines):
+        # Screen and prompt in one write, then read the answer
+        self.write("".join(line + "\n" for line in lines) + prompt)
+        return input()
+
+SCREEN = Screen()
+
+def catalog(name):
+    # A pre-rendered listing from CATALOG_RENDERERS, drawn on first use after each content_changed()
+    listing = CATALOG_CACHE.get(name)
+    if listing is None:
+        listing = CATALOG_CACHE[name] = CATALOG_RENDERERS[name]()
+    return listing
+
+def render_task_catalog():
+    lines = ["\nAvailable Tasks:"]
+    for task in sorted(TASKS):
+        info = TASKS[task]
+        gold = "{}..{}".format(*info["gold_range"]) if "gold_range" in info else info.get("gold", 0)
+        lines.append(f"- {task} (XP: {info['xp']}, Gold: {gold}, Energy Cost: {info['energy_cost']})")
+    return "\n".join(lines)
+
+def render_shop_catalog():
+    lines = ["\n=== Shop ==="]
+    for item, info in SHOP_ITEMS.items():
+        lines.append(f"- {item}: {info['price']} gold - {info['desc']}")
+    return "\n".join(lines)
+
+def render_quest_catalog():
+    # One line per quest; which of them are on offer depends on the player, see manage_quests
+    return {quest: f"- {quest}: {', '.join(info['tasks'])} (Reward: {info['reward_gold']} gold)"
+            for quest, info in QUESTS.items()}
+
+def render_menu():
+    return "\n".join([
+        "\n=== Menu ===",
+        "1. View Stats & Progress",
+        "2. Do a Task",
+        "3. Shop",
+        "4. Use Item from Inventory",
+        "5. Manage Quests",
+        "6. Plan Tasks",
+        "7. Save and Quit",
+    ])
+
+CATALOG_RENDERERS = {
+    "tasks": render_task_catalog,
+    "shop": render_shop_catalog,
+    "quests": render_quest_catalog,
+    "menu": render_menu,
+}
+
+def render_stats(player):
+    lines = ["\n=== Stats ==="]
+    lines.extend(str(stat) for stat in player.stats.values())
+    lines.append("\n=== Skills ===")
+    lines.extend(str(skill) for skill in player.skills.values())
+    lines.append(f"\nGold: {player.gold}")
+    lines.append(f"Energy: {player.energy}/{player.max_energy}")
+    lines.append(f"Inventory: {player.inventory}")
+    lines.append("\nAchievements:")
+    lines.extend(f"- {ACHIEVEMENTS[ach]['desc']}" for ach in player.achievements)
+    lines.append("\nActive Quests:")
+    lines.extend(f"- {quest}: {len(tasks)}/{len(QUESTS[quest]['tasks'])} tasks completed"
+                 for quest, tasks in player.active_quests.items())
+    lines.append("\nCompleted Quests:")
+    lines.extend(f"- {quest}" for quest in player.completed_quests)
+    return "\n".join(lines)
+
+def render_plan(plan):
+    if not plan["tasks"]:
+        return f"Not enough energy for any task ({plan['energy']})."
+    lines = [f"\n=== Plan for {plan['energy']} energy ===",
+             f"Expected: +{plan['xp']:.1f} XP, +{plan['gold']:.1f} gold ({plan['energy_used']} energy)"]
+    # Runs of the same task are folded into one line
+    run_task, run_length = None, 0
+    for task in plan["tasks"] + [None]:
+        if task == run_task:
+            run_length += 1
+            continue
+        if run_task is not None:
+            lines.append(f"- {run_task}" + (f" x{run_length}" if run_length > 1 else ""))
+        run_task, run_length = task, 1
+    return "\n".join(lines)
+
+def render_events(events):
+    lines = []
+    for event in events:
+        kind = event["type"]
+        if kind == "level_up":
+            lines.append(LEVEL_UP_ASCII)
+            lines.append(f"Congratulations! Your {event['stat']} has reached level {event['level']}!")
+        elif kind == "achievement":
+            lines.append(f"Achievement unlocked: {event['desc']}!")
+            lines.append(f"Reward: {event['reward_gold']} gold")
+        elif kind == "quest_completed":
+            lines.append(f"Quest completed: {event['quest']}!")
+            lines.append(f"Reward: {event['reward_gold']} gold and extra XP!")
+        elif kind == "random_event":
+            if event["event"] == "bonus":
+                lines.append(f"\nRandom Event: You found a wallet! +{event['gold']} gold")
+            elif event["event"] == "penalty":
+                lines.append(f"\nRandom Event: You tripped! -{event['energy']} energy")
+            elif event["event"] == "gift":
+                lines.append(f"\nRandom Event: Mysterious gift! +{event['xp']} XP to {event['stat']}")
+        elif kind == "energy_full":
+            lines.append(f"Your energy is full again ({event['energy']})!")
+    return "\n".join(lines)
+
+# ======================
+# Functions
+# ======================
+
+def save_progress(player, storage=None):
+    if player.journal is not None:
+        player.journal.compact(player, background=False)
+        storage = player.journal.storage
     else:
+        storage = storage or JsonFileStorage()
+        data = player.to_dict()
+        data["last_save"] = datetime.datetime.now().isoformat()
+        storage.write(data)
+    SCREEN.show(f"\n✅ Progress saved to {storage.path}")
+
+def load_progress(journal=None, storage=None, name=None):
+    # Latest snapshot plus whatever the journal recorded after it
+    if storage is None:
+        storage = journal.storage if journal is not None else JsonFileStorage()
+    data = storage.read(name)
+    if data is None:
         return None
+    player = Player.from_dict(data)
+    player.events = []  # Whoever loads a profile this way is about to show it
+    last_save = data.get("last_save")
+    seq = data.get("seq", 0)
+    if journal is not None:
+        seq, last_write = journal.replay(player, seq)
+        if last_write and (not last_save or last_write > last_save):
+            last_save = last_write
+    player.check_achievements()  # Catch up on thresholds added since the last save
+    regen = player.regenerate_energy(last_save)
+    if last_save:
+        SCREEN.show(f"Energy regenerated: +{regen} (now {player.energy}/{player.max_energy})")
+    if journal is not None:
+        journal.open(seq)
+        player.journal = journal
+        if regen:
+            record(player, "energy", regen)
+    return player
 
 def view_stats(player):
-    print("\n=== Stats ===")
-    for stat in player.stats.values():
-        print(stat)
-    print("\n=== Skills ===")
-    for skill in player.skills.values():
-        print(skill)
-    print(f"\nGold: {player.gold}")
-    print(f"Energy: {player.energy}/{player.max_energy}")
-    print(f"Inventory: {', '.join(player.inventory) if player.inventory else 'Empty'}")
-    print("\nAchievements:")
-    for ach in player.achievements:
-        print(f"- {ACHIEVEMENTS[ach]['desc']}")
-    print("\nActive Quests:")
-    for quest, tasks in player.active_quests.items():
-        print(f"- {quest}: {len(tasks)}/{len(QUESTS[quest]['tasks'])} tasks completed")
-    print("\nCompleted Quests:")
-    for quest in player.completed_quests:
-        print(f"- {quest}")
+    SCREEN.show(render_stats(player))
 
 def do_task(player):
-    print("\nAvailable Tasks:")
-    for task in sorted(TASKS.keys()):
-        info = TASKS[task]
-        print(f"- {task} (XP: {info['xp']}, Gold: {info.get('gold', 0)}, Energy Cost: {info['energy_cost']})")
-    task_input = input("\nEnter the task you completed (or 'back'): ").lower()
+    task_input = SCREEN.ask("\nEnter the task you completed (or 'back'): ", catalog("tasks")).lower()
     if task_input == 'back':
         return
-    if task_input in TASKS:
-        info = TASKS[task_input]
-        if player.energy < info["energy_cost"]:
-            print("Not enough energy! Rest or use a potion.")
-            return
-        stat = player.get_stat_or_skill(info["type"], info["key"])
-        success_prob = info["success_base"] + 0.05 * stat.level  # Improves with level
-        success_prob = min(success_prob, 0.95)  # Cap at 95%
-        if random.random() < success_prob:
-            print("Success!")
-            stat.add_xp(info["xp"])
-            player.gold += info.get("gold", 0)
+    result = perform_task(player, task_input)
+    if not result["ok"]:
+        if result["error"] == "no_energy":
+            SCREEN.show("Not enough energy! Rest or use a potion.")
         else:
-            print("Failed... but you learn from mistakes. Half XP gained.")
-            stat.add_xp(info["xp"] // 2)
-        player.energy -= info["energy_cost"]
-        # Check level up triggered achievements
-        if stat.add_xp(0):  # Dummy call to check if leveled, but since add_xp returns if leveled
-            pass  # Already printed
-        player.check_achievements()
-        # Check quest progress
-        player.check_quests(task_input)
+            SCREEN.show("Invalid task.")
+        return
+    if result["success"]:
+        lines = ["Success!"]
     else:
-        print("Invalid task.")
+        lines = ["Failed... but you learn from mistakes. Half XP gained."]
+    if player.events:
+        lines.append(render_events(player.events))
+        player.events.clear()
+    SCREEN.show(*lines)
 
 def shop(player):
-    print("\n=== Shop ===")
-    for item, info in SHOP_ITEMS.items():
-        print(f"- {item}: {info['price']} gold - {info['desc']}")
-    buy_input = input("\nEnter item to buy (or 'back'): ").lower()
+    buy_input = SCREEN.ask("\nEnter item to buy, e.g. '3 energy potion' (or 'back'): ", catalog("shop")).lower()
     if buy_input == 'back':
         return
-    if buy_input in SHOP_ITEMS:
-        info = SHOP_ITEMS[buy_input]
-        if player.gold >= info["price"]:
-            player.gold -= info["price"]
-            player.inventory.append(buy_input)
-            print(f"Bought {buy_input}!")
-        else:
-            print("Not enough gold.")
+    quantity, item = split_quantity(buy_input)
+    result = buy_item(player, item, quantity)
+    if result["ok"]:
+        SCREEN.show(f"Bought {item}!" if quantity == 1 else f"Bought {quantity}x {item}!")
+    elif result["error"] == "no_gold":
+        SCREEN.show("Not enough gold.")
+    elif result["error"] == "no_room":
+        SCREEN.show("You can't carry that many.")
+    elif result["error"] == "invalid_quantity":
+        SCREEN.show(f"You can buy 1 to {MAX_STACK} at a time.")
     else:
-        print("Invalid item.")
+        SCREEN.show("Invalid item.")
 
 def use_item(player):
     if not player.inventory:
-        print("Inventory is empty.")
+        SCREEN.show("Inventory is empty.")
         return
-    print("\nInventory:")
-    for idx, item in enumerate(set(player.inventory), 1):
-        count = player.inventory.count(item)
-        print(f"{idx}. {item} (x{count})")
-    use_input = input("\nEnter item to use (or 'back'): ").lower()
+    lines = ["\nInventory:"]
+    lines.extend(f"{idx}. {item} (x{count})" for idx, (item, count) in enumerate(player.inventory.items(), 1))
+    use_input = SCREEN.ask("\nEnter item to use, e.g. '2 energy potion' (or 'back'): ", *lines).lower()
     if use_input == 'back':
         return
-    if use_input in player.inventory:
-        info = SHOP_ITEMS[use_input]
-        effect = info["effect"]
-        if effect == "restore_energy":
-            player.energy = min(player.max_energy, player.energy + info["amount"])
-            print(f"Energy restored by {info['amount']}! Now: {player.energy}")
-        elif effect == "add_xp":
-            key = info["key"]
-            if key in player.stats:
-                player.stats[key].add_xp(info["amount"])
-            elif key in player.skills:
-                player.skills[key].add_xp(info["amount"])
-            print(f"Added {info['amount']} XP to {key}!")
-        elif effect == "permanent_boost":
-            key = info["key"]
-            if key in player.stats:
-                player.stats[key].level += info["amount"]
-            elif key in player.skills:
-                player.skills[key].level += info["amount"]
-            print(f"Permanently boosted {key} by {info['amount']} level!")
-        elif effect == "add_gold":
-            player.gold += info["amount"]
-            print(f"Added {info['amount']} gold!")
-        player.inventory.remove(use_input)  # Consume one
-        player.check_achievements()
-    else:
-        print("Item not in inventory.")
+    quantity, item = split_quantity(use_input)
+    result = consume_item(player, item, quantity)
+    if not result["ok"]:
+        SCREEN.show("Item not in inventory.")
+        return
+    effect = result["effect"]
+    lines = []
+    if effect == "restore_energy":
+        lines.append(f"Energy restored by {result['amount']}! Now: {player.energy}")
+    elif effect == "add_xp":
+        lines.append(f"Added {result['amount']} XP to {result['key']}!")
+    elif effect == "permanent_boost":
+        lines.append(f"Permanently boosted {result['key']} by {result['amount']} level!")
+    elif effect == "add_gold":
+        lines.append(f"Added {result['amount']} gold!")
+    if player.events:
+        lines.append(render_events(player.events))
+        player.events.clear()
+    if lines:
+        SCREEN.show(*lines)
 
 def manage_quests(player):
-    print("\n=== Quests ===")
-    print("Available Quests:")
-    for quest in QUESTS:
+    lines = ["\n=== Quests ===", "Available Quests:"]
+    for quest, line in catalog("quests").items():
         if quest not in player.completed_quests and quest not in player.active_quests:
-            print(f"- {quest}: {', '.join(QUESTS[quest]['tasks'])} (Reward: {QUESTS[quest]['reward_gold']} gold)")
-    start_input = input("\nStart which quest? (or 'back'): ").lower()
+            lines.append(line)
+    start_input = SCREEN.ask("\nStart which quest? (or 'back'): ", *lines).lower()
     if start_input == 'back':
         return
-    if start_input in QUESTS and start_input not in player.active_quests and start_input not in player.completed_quests:
-        player.active_quests[start_input] = []
-        print(f"Started quest: {start_input}")
+    if start_quest(player, start_input)["ok"]:
+        SCREEN.show(f"Started quest: {start_input}")
     else:
-        print("Invalid or already started/completed.")
+        SCREEN.show("Invalid or already started/completed.")
 
-def random_event(player):
-    # Random event every few actions (10% chance)
-    if random.random() < 0.1:
-        event_type = random.choice(["bonus", "penalty", "gift"])
-        if event_type == "bonus":
-            bonus_gold = random.randint(10, 50)
-            player.gold += bonus_gold
-            print("\nRandom Event: You found a wallet! +{bonus_gold} gold")
-        elif event_type == "penalty":
-            penalty_energy = random.randint(5, 20)
-            player.energy = max(0, player.energy - penalty_energy)
-            print(f"\nRandom Event: You tripped! -{penalty_energy} energy")
-        elif event_type == "gift":
-            random_stat = random.choice(list(player.stats.keys()) + list(player.skills.keys()))
-            xp_gain = random.randint(10, 30)
-            if random_stat in player.stats:
-                player.stats[random_stat].add_xp(xp_gain)
+def plan_menu(player):
+    choice = SCREEN.ask("\nPlan for (1) XP or (2) gold? (or 'back'): ").lower()
+    if choice == 'back':
+        return
+    objective = "gold" if choice in ("2", "gold") else "xp"
+    SCREEN.show(render_plan(plan_tasks(player, objective=objective)))
+
+# ======================
+# Leaderboards
+# ======================
+# Cross-player rankings: a board per stat/skill level plus total level, gold, achievements and
+# completed quests. A board is a RankedList of (-score, name), best first with ties by name, so
+# top-N, rank-of-player and score ranges are all O(log n) and a change of score is one remove and
+# one add. SQLiteStorage keeps every player's scores in its `scores` table (saved with the rest of
+# the profile), so a board loads already in order from an index instead of from every profile;
+# BinaryStorage reads just the scores out of each record in one streamed pass, and other storages
+# are scanned once. Boards load on first use, as each holds every player.
+
+LEADERBOARD_TOTALS = ("total_level", "gold", "achievements", "quests")
+LEADERBOARD_NAMES = ALL_STAT_KEYS + list(LEADERBOARD_TOTALS)
+LEADERBOARD_LOOKUP = {board.lower(): board for board in LEADERBOARD_NAMES}  # Commands arrive lowercased
+
+def leaderboard_score(player, board):
+    pos = STAT_SLOTS.get(board)
+    if pos is not None:
+        return player.stat_block.values[pos]
+    if board == "total_level":
+        return total_level(player)
+    if board == "gold":
+        return player.gold
+    if board == "achievements":
+        return len(player.achievements)
+    return len(player.completed_quests)
+
+def snapshot_scores(data):
+    # Scores of a Player.to_dict() snapshot on every board, in LEADERBOARD_NAMES order, without
+    # building the Player
+    levels = dict.fromkeys(ALL_STAT_KEYS, DEFAULT_STAT_VALUES[0])
+    for group in ("stats", "skills"):
+        for key, stat in data[group].items():
+            if key in levels:
+                levels[key] = stat["level"]
+    levels = tuple(levels.values())
+    return levels + (sum(levels), data["gold"], len(data["achievements"]), len(data["completed_quests"]))
+
+class RankedList:
+    # A sorted list kept as buckets of `load` to 2*load items with a Fenwick tree over the bucket
+    # sizes: add, remove, rank and indexing are O(log n) plus a memmove within one small bucket.
+    __slots__ = ("load", "buckets", "maxes", "tree", "size")
+
+    def __init__(self, items=(), load=512):
+        items = sorted(items)  # Near-linear when they come from an index already in order
+        self.load = load
+        self.buckets = [items[i:i + load] for i in range(0, len(items), load)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(items)
+        self.build_tree()
+
+    def build_tree(self):
+        # O(buckets); only needed when a bucket is split off or dropped
+        tree = [0] + [len(bucket) for bucket in self.buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def grow(self, pos, delta):
+        tree = self.tree
+        i = pos + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def before(self, pos):
+        # Items in the buckets before `pos`
+        tree = self.tree
+        total = 0
+        while pos:
+            total += tree[pos]
+            pos &= pos - 1
+        return total
+
+    def add(self, item):
+        buckets, maxes = self.buckets, self.maxes
+        self.size += 1
+        if not maxes:
+            buckets.append([item])
+            maxes.append(item)
+            self.build_tree()
+            return
+        pos = bisect.bisect_left(maxes, item)
+        if pos == len(maxes):
+            pos -= 1
+            buckets[pos].append(item)
+            maxes[pos] = item
+        else:
+            bisect.insort(buckets[pos], item)
+        bucket = buckets[pos]
+        if len(bucket) > 2 * self.load:
+            half = bucket[self.load:]
+            del bucket[self.load:]
+            buckets.insert(pos + 1, half)
+            maxes[pos] = bucket[-1]
+            maxes.insert(pos + 1, half[-1])
+            self.build_tree()
+        else:
+            self.grow(pos, 1)
+
+    def remove(self, item):
+        pos = bisect.bisect_left(self.maxes, item)
+        if pos == len(self.maxes):
+            raise ValueError(item)
+        bucket = self.buckets[pos]
+        i = bisect.bisect_left(bucket, item)
+        if bucket[i] != item:
+            raise ValueError(item)
+        del bucket[i]
+        self.size -= 1
+        if not bucket:
+            del self.buckets[pos]
+            del self.maxes[pos]
+            self.build_tree()
+        else:
+            self.maxes[pos] = bucket[-1]
+            self.grow(pos, -1)
+
+    def rank(self, item):
+        # How many items sort before `item`
+        pos = bisect.bisect_left(self.maxes, item)
+        if pos == len(self.maxes):
+            return self.size
+        return self.before(pos) + bisect.bisect_left(self.buckets[pos], item)
+
+    def locate(self, index):
+        # (bucket, offset) of the index-th item, walking down the Fenwick tree
+        tree = self.tree
+        pos = 0
+        step = 1 << (len(tree).bit_length() - 1)
+        while step:
+            if pos + step < len(tree) and tree[pos + step] <= index:
+                pos += step
+                index -= tree[pos]
+            step >>= 1
+        return pos, index
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        pos, offset = self.locate(index)
+        return self.buckets[pos][offset]
+
+    def islice(self, start=0, stop=None):
+        # Items start..stop-1 in order, without copying the rest
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+        pos, offset = self.locate(start)
+        left = stop - start
+        for bucket in self.buckets[pos:]:
+            for item in bucket[offset:offset + left]:
+                yield item
+            left -= len(bucket) - offset
+            if left <= 0:
+                return
+            offset = 0
+
+    def __len__(self):
+        return self.size
+
+
+class Leaderboard:
+    # One board: every player's current score, and the same ranked best first
+    __slots__ = ("scores", "ranked")
+
+    def __init__(self, scores=()):
+        # `scores`: (name, score) pairs, ideally best first already
+        self.scores = dict(scores)
+        self.ranked = RankedList((-score, name) for name, score in self.scores.items())
+
+    def set(self, name, score):
+        old = self.scores.get(name)
+        if old == score:
+            return False
+        if old is not None:
+            self.ranked.remove((-old, name))
+        self.scores[name] = score
+        self.ranked.add((-score, name))
+        return True
+
+    def discard(self, name):
+        score = self.scores.pop(name, None)
+        if score is not None:
+            self.ranked.remove((-score, name))
+
+    def rank(self, name):
+        # 1-based position, or None for a player not on the board
+        score = self.scores.get(name)
+        if score is None:
+            return None
+        return self.ranked.rank((-score, name)) + 1
+
+    def top(self, count=10, start=0):
+        return [(start + i + 1, name, -score)
+                for i, (score, name) in enumerate(self.ranked.islice(start, start + count))]
+
+    def between(self, low, high, limit=100):
+        # Players scoring low..high inclusive, best first
+        start = self.ranked.rank((-high, ""))
+        entries = []
+        for score, name in self.ranked.islice(start, start + limit):
+            if -score < low:
+                break
+            entries.append((start + len(entries) + 1, name, -score))
+        return entries
+
+    def __len__(self):
+        return len(self.scores)
+
+
+class Leaderboards:
+    # Every board over a storage's players. `live` maps names to in-memory Players whose unsaved
+    # state should win over the storage's (a server's session cache); update() keeps the loaded
+    # boards current after each action.
+    def __init__(self, storage=None, live=None):
+        self.storage = storage
+        self.live = live if live is not None else {}
+        self.boards = {}
+
+    def board(self, name):
+        board = self.boards.get(name)
+        if board is None:
+            if name not in LEADERBOARD_NAMES:
+                raise KeyError(name)
+            self.load(name)
+            board = self.boards[name]
+        return board
+
+    def load(self, name):
+        ranked_scores = getattr(self.storage, "ranked_scores", None)
+        if ranked_scores is not None:
+            self.boards[name] = Leaderboard(ranked_scores(name))
+        else:
+            # Nothing persisted to read one board from, so fill them all in one pass
+            names, rows = [], []
+            for name, scores in self.profile_scores():
+                names.append(name)
+                rows.append(scores)
+            columns = zip(*rows) if rows else [()] * len(LEADERBOARD_NAMES)
+            for board, column in zip(LEADERBOARD_NAMES, columns):
+                self.boards.setdefault(board, Leaderboard(zip(names, column)))
+        for player in self.live.values():
+            self.update(player)
+
+    def profile_scores(self):
+        # (name, scores in LEADERBOARD_NAMES order) of every stored profile, streamed: straight off
+        # the records if the storage can score them (BinaryStorage.scores), otherwise from a scan
+        # of the snapshots
+        if self.storage is None:
+            return
+        scores = getattr(self.storage, "scores", None)
+        if scores is not None:
+            yield from scores()
+            return
+        for _, data in self.storage.scan():
+            yield data["name"], snapshot_scores(data)
+
+    def update(self, player):
+        # Re-score a player on the boards loaded so far; returns the boards that changed
+        changed = []
+        for name, board in self.boards.items():
+            if board.set(player.name, leaderboard_score(player, name)):
+                changed.append(name)
+        return changed
+
+    def remove(self, name):
+        for board in self.boards.values():
+            board.discard(name)
+
+    def top(self, board, count=10, start=0):
+        return self.board(board).top(count, start)
+
+    def rank(self, board, name):
+        board = self.board(board)
+        position = board.rank(name)
+        return None if position is None else (position, name, board.scores[name])
+
+    def between(self, board, low, high, limit=100):
+        return self.board(board).between(low, high, limit)
+
+# Verbs leaderboard_command understands:
+#   top <board> [count] | rank <board> [player] | range <board> <low> <high>
+LEADERBOARD_VERBS = frozenset(("top", "rank", "range"))
+LEADERBOARD_PAGE = 100  # Most entries one command returns
+
+def leaderboard_command(leaderboards, name, command):
+    verb, *args = command.split()
+    verb = verb.lower()
+    board = LEADERBOARD_LOOKUP.get(args[0].lower()) if args else None
+    if board is None:
+        return {"ok": False, "error": "invalid_board", "command": command}
+    args = args[1:]
+    if verb == "rank":
+        player = " ".join(args) or name
+        entry = leaderboards.rank(board, player)
+        if entry is None:
+            return {"ok": False, "error": "not_ranked", "board": board, "player": player}
+        entries = [entry]
+    elif verb == "top" and all(arg.isdigit() for arg in args) and len(args) <= 1:
+        entries = leaderboards.top(board, min(int(args[0]), LEADERBOARD_PAGE) if args else 10)
+    elif verb == "range" and len(args) == 2 and all(arg.lstrip("-").isdigit() for arg in args):
+        entries = leaderboards.between(board, int(args[0]), int(args[1]), LEADERBOARD_PAGE)
+    else:
+        return {"ok": False, "error": "invalid_command", "command": command}
+    return {"ok": True, "board": board, "size": len(leaderboards.board(board)),
+            "entries": [{"rank": rank, "name": player, "score": score} for rank, player, score in entries]}
+
+# ======================
+# Energy Timers
+# ======================
+# Lazy regen means nobody has to touch idle players, but a front-end that wants to say "your
+# energy is full" needs to know when. EnergyTimers is a hashed timer wheel for that: `slots`
+# buckets of `resolution` seconds, a player due further out than one turn of the wheel just sits
+# out the extra rounds in its bucket. schedule() and cancel() are O(1) and each tick only looks
+# at the one bucket it lands on.
+
+class EnergyTimers:
+    def __init__(self, resolution=60.0, slots=1024, on_full=None):
+        self.resolution = resolution
+        self.slots = [{} for _ in range(slots)]  # Name -> [player, rounds still to wait]
+        self.where = {}  # Name -> index of the bucket it's in
+        self.on_full = on_full or notify_energy_full
+        self.started = ENERGY_CLOCK()
+        self.current = 0  # Ticks done so far
+
+    def schedule(self, player):
+        # (Re)arm the player's timer from its energy now; call after anything that spends energy
+        self.cancel(player.name)
+        delay = player.energy_full_in()
+        if not delay:
+            return  # Already full, or regen is stopped
+        due = max(self.current + 1, math.ceil((ENERGY_CLOCK() + delay - self.started) / self.resolution))
+        ticks = due - self.current
+        slot = due % len(self.slots)
+        self.slots[slot][player.name] = [player, (ticks - 1) // len(self.slots)]
+        self.where[player.name] = slot
+
+    def cancel(self, name):
+        slot = self.where.pop(name, None)
+        if slot is not None:
+            del self.slots[slot][name]
+
+    def tick(self, now=None):
+        # Advance the wheel to `now`, calling on_full for everyone whose energy filled up; returns them
+        now = ENERGY_CLOCK() if now is None else now
+        fired = []
+        while self.started + (self.current + 1) * self.resolution <= now:
+            self.current += 1
+            bucket = self.slots[self.current % len(self.slots)]
+            for name, entry in list(bucket.items()):
+                if entry[1]:
+                    entry[1] -= 1
+                    continue
+                del bucket[name]
+                del self.where[name]
+                player = entry[0]
+                if player.energy >= player.max_energy:
+                    self.on_full(player)
+                    fired.append(player)
+                else:
+                    self.schedule(player)  # Spent energy without being rescheduled; try again later
+        return fired
+
+    def __len__(self):
+        return len(self.where)
+
+def notify_energy_full(player):
+    player.notify("energy_full", energy=player.energy)
+
+# ======================
+# Game Server
+# ======================
+# `python index.py serve` hosts many players over a plain TCP line protocol: a client sends one
+# command per line (see run_command, plus "login <name>" first) and gets one JSON object back per
+# line. Players stay in memory in an LRU session cache; changes are written to storage in batches
+# every `flush_interval` seconds (write-behind) and idle players are evicted once saved.
+
+class SessionCache:
+    def __init__(self, storage, capacity=10000, idle_timeout=600.0):
+        self.storage = storage
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.players = OrderedDict()  # Name -> Player, least recently used first
+        self.last_used = {}
+        self.connections = {}  # Name -> open connections using that player
+        self.dirty = set()
+        self.quarantine = set()  # Players whose last save failed; they're saved one at a time
+
+    def checkout(self, name):
+        player = self.players.get(name)
+        if player is None:
+            data = self.storage.read(name)
+            if data is None:
+                player = Player(name)
+                self.dirty.add(name)
             else:
-                player.skills[random_stat].add_xp(xp_gain)
-            print(f"\nRandom Event: Mysterious gift! +{xp_gain} XP to {random_stat}")
+                player = Player.from_dict(data)
+                player.check_achievements()
+                if player.regenerate_energy(data.get("last_save")):
+                    self.dirty.add(name)
+            player.events = []
+            self.players[name] = player
+        self.players.move_to_end(name)
+        self.last_used[name] = time.monotonic()
+        self.connections[name] = self.connections.get(name, 0) + 1
+        return player
+
+    def release(self, name):
+        self.connections[name] -= 1
+        if not self.connections[name]:
+            del self.connections[name]
+
+    def touch(self, name, changed=True):
+        self.players.move_to_end(name)
+        self.last_used[name] = time.monotonic()
+        if changed:
+            self.dirty.add(name)
+
+    def take_dirty(self):
+        # Snapshot the changed players now (on the event loop, so they're consistent) for saving
+        now = datetime.datetime.now().isoformat()
+        datas = []
+        for name in self.dirty:
+            data = self.players[name].to_dict()
+            data["last_save"] = now
+            datas.append(data)
+        self.dirty = set()
+        return datas
+
+    def evict(self):
+        # Drop saved players nobody is connected as, idle ones first and then LRU over capacity;
+        # returns their names
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = []
+        for name in list(self.players):
+            if len(self.players) <= self.capacity and self.last_used[name] > cutoff:
+                break  # Everything after this was used more recently
+            if name in self.connections or name in self.dirty:
+                continue
+            del self.players[name]
+            del self.last_used[name]
+            evicted.append(name)
+        forget = getattr(self.storage, "forget", None)
+        if forget is not None:
+            for name in evicted:
+                forget(name)  # Nor should the storage keep its copy of them
+        return evicted
+
+
+class GameServer:
+    def __init__(self, storage, host="127.0.0.1", port=8765, capacity=10000, idle_timeout=600.0, flush_interval=1.0,
+                 energy_tick=None):
+        self.storage = storage
+        self.host = host
+        self.port = port
+        self.sessions = SessionCache(storage, capacity, idle_timeout)
+        self.flush_interval = flush_interval
+        # With energy_tick, "energy_full" events are queued for players once their energy refills
+        self.timers = EnergyTimers(energy_tick) if energy_tick else None
+        # Boards see unsaved changes too: cached players are re-scored after every action
+        self.leaderboards = Leaderboards(storage, self.sessions.players)
+        self.server = None
+        self.flusher = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # In case port 0 asked for any free one
+        self.flusher = asyncio.ensure_future(self.flush_loop())
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.flusher.cancel()
+        await self.flush()
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"LIFE SYSTEM server listening on {self.host}:{self.port}")
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def handle(self, reader, writer):
+        name = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().strip()
+                if not command:
+                    continue
+                if command.lower() == "quit":
+                    break
+                if name is None:
+                    verb, _, arg = command.partition(" ")
+                    if verb.lower() != "login" or not arg.strip():
+                        response = {"ok": False, "error": "login_required"}
+                    else:
+                        name = arg.strip()
+                        self.sessions.checkout(name)
+                        response = {"ok": True, "name": name}
+                else:
+                    response = await self.respond(name, command)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if name is not None:
+                self.sessions.release(name)
+            writer.close()
+
+    async def respond(self, name, command):
+        if command.partition(" ")[0].lower() != "plan":
+            return self.execute(name, command)
+        # Planning over a big catalog can take a while, so it runs on a worker thread, on a copy
+        # of the player taken here: other clients keep being served and can't change it midway
+        self.sessions.touch(name, changed=False)
+        player = Player.from_dict(self.sessions.players[name].to_dict())
+        result = await asyncio.get_running_loop().run_in_executor(None, run_command, player, command)
+        result["events"] = []
+        return result
+
+    def execute(self, name, command):
+        player = self.sessions.players[name]
+        if command.lower() == "stats":
+            self.sessions.touch(name, changed=False)
+            return {"ok": True, "player": player.to_dict()}
+        if command.lower() == "metrics":
+            return {"ok": True, "enabled": METRICS.enabled, "metrics": METRICS.to_dict()}
+        if command.split(" ", 1)[0].lower() in LEADERBOARD_VERBS:
+            self.sessions.touch(name, changed=False)
+            return leaderboard_command(self.leaderboards, name, command)
+        acting = is_action(command)
+        if acting:
+            random_event(player)  # Possible random event each action, as in the console menu
+        result = run_command(player, command)
+        result["events"] = player.events
+        player.events = []
+        self.sessions.touch(name, changed=acting)
+        if acting:
+            self.leaderboards.update(player)
+            if self.timers is not None:
+                self.timers.schedule(player)
+        return result
+
+    async def flush(self):
+        # Changed players are saved in one batch. If the batch fails they're saved one at a time,
+        # and any whose save still fails are quarantined: kept dirty (and so in memory) and saved
+        # alone from then on, so one player the storage can't take doesn't stop everyone's saves.
+        datas = self.sessions.take_dirty()
+        quarantine = self.sessions.quarantine
+        unsaved = {data["name"] for data in datas}
+        save = functools.partial(asyncio.get_running_loop().run_in_executor, None, self.storage.write_many)
+        try:
+            batch = [data for data in datas if data["name"] not in quarantine]
+            alone = [data for data in datas if data["name"] in quarantine]
+            if batch:
+                try:
+                    await save(batch)
+                    unsaved.difference_update(data["name"] for data in batch)
+                except Exception:
+                    alone.extend(batch)
+            for data in alone:
+                name = data["name"]
+                try:
+                    await save([data])
+                except Exception as e:
+                    if name not in quarantine:
+                        quarantine.add(name)
+                        print(f"Saving {name!r} failed, keeping them in memory and retrying: {e!r}",
+                              file=sys.stderr)
+                else:
+                    unsaved.discard(name)
+                    quarantine.discard(name)
+        finally:
+            # Not saved after all: keep them dirty (and so unevictable) for the next flush
+            self.sessions.dirty.update(unsaved)
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                evicted = self.sessions.evict()
+                if self.timers is not None:
+                    for name in evicted:
+                        self.timers.cancel(name)
+                    self.timers.tick()
+            except Exception as e:
+                # Whatever broke, write-behind has to keep going for everyone else
+                print(f"Flushing sessions failed, will retry: {e!r}", file=sys.stderr)
 
 # ======================
 # Main Game Loop
 # ======================
 
-player = load_progress()
-if player:
-    print(WELCOME_ASCII)
-    print(f"WELCOME BACK {player.name}!")
-else:
-    print(WELCOME_ASCII)
-    name = input("ENTER YOUR USERNAME: ")
-    player = Player(name)
-    print(f"SYSTEM WELCOME {player.name}!")
-
-while True:
-    random_event(player)  # Possible random event each loop
-    print("\n=== Menu ===")
-    print("1. View Stats & Progress")
-    print("2. Do a Task")
-    print("3. Shop")
-    print("4. Use Item from Inventory")
-    print("5. Manage Quests")
-    print("6. Save and Quit")
-    choice = input("Choose option: ")
-    if choice == "1":
-        view_stats(player)
-    elif choice == "2":
-        do_task(player)
-    elif choice == "3":
-        shop(player)
-    elif choice == "4":
-        use_item(player)
-    elif choice == "5":
-        manage_quests(player)
-    elif choice == "6":
+def journal_path(storage, name=None):
+    # The single-file save keeps the classic journal name; database profiles get one each, named
+    # by a digest of the profile name so that no two profiles ("bob smith", "bob_smith", "Bob"
+    # on a case-insensitive disk) can end up sharing one
+    if name is None:
+        return JOURNAL_FILE
+    return f"{storage.path}.{hashlib.blake2b(name.encode(), digest_size=16).hexdigest()}.journal"
+
+def play(storage=None):
+    storage = storage or JsonFileStorage()
+    name = None
+    if storage.multi_profile:
+        # Many profiles in one database, so ask who is playing before loading
+        name = SCREEN.ask("ENTER YOUR USERNAME: ", WELCOME_ASCII)
+    journal = Journal(journal_path(storage, name), storage)
+    player = load_progress(journal, name=name)
+    if player:
+        if name is None:
+            SCREEN.show(WELCOME_ASCII, f"WELCOME BACK {player.name}!")
+        else:
+            SCREEN.show(f"WELCOME BACK {player.name}!")
+    else:
+        if name is None:
+            name = SCREEN.ask("ENTER YOUR USERNAME: ", WELCOME_ASCII)
+        player = Player(name)
+        player.events = []
+        player.journal = journal
+        journal.compact(player, background=False)  # First snapshot; also retires any stale journal
+        SCREEN.show(f"SYSTEM WELCOME {player.name}!")
+
+    while True:
+        random_event(player)  # Possible random event each loop
+        lines = [render_events(player.events)] if player.events else []
+        player.events.clear()
+        choice = SCREEN.ask("Choose option: ", *lines, catalog("menu"))
+        if choice == "1":
+            view_stats(player)
+        elif choice == "2":
+            do_task(player)
+        elif choice == "3":
+            shop(player)
+        elif choice == "4":
+            use_item(player)
+        elif choice == "5":
+            manage_quests(player)
+        elif choice == "6":
+            plan_menu(player)
+        elif choice == "7":
+            save_progress(player)
+            journal.close()
+            break
+        else:
+            SCREEN.show("Invalid choice.")
+        journal.maybe_compact(player)  # Every action is already in the journal
+        time.sleep(1)  # Small delay for pacing
+
+def run_batch(lines, storage=None, name=None, save_every=0, events=True, rng=random, out=None):
+    # Headless play: apply one run_command line after another (blank lines and # comments are
+    # skipped) with no pacing, writing each result as a JSON line to `out`. Saves at the end and,
+    # with save_every=N, after every N actions as well. Returns the number of actions applied.
+    storage = storage or JsonFileStorage()
+    out = out or sys.stdout
+    load_name = name if storage.multi_profile else None
+    journal = Journal(journal_path(storage, load_name), storage)
+    discard, SCREEN.discard = SCREEN.discard, True  # Only the JSON lines go to `out`
+    try:
+        player = load_progress(journal, name=load_name)
+        if player is None:
+            if not name:
+                raise SystemExit("No saved player to continue; pass --name to start one")
+            player = Player(name)
+            player.events = []
+            player.journal = journal
+            journal.compact(player, background=False)
+        elif name and player.name != name:
+            raise SystemExit(f"{storage.path} holds {player.name}, not {name}")
+        count = 0
+        for line in lines:
+            command = line.strip()
+            if not command or command.startswith("#"):
+                continue
+            if events and is_action(command):
+                random_event(player, rng)  # Same roll before each action as the menu and the server
+            result = run_command(player, command, rng)
+            result["events"] = player.events
+            player.events = []
+            out.write(json.dumps(result) + "\n")
+            count += 1
+            if save_every and count % save_every == 0:
+                save_progress(player)
+            else:
+                journal.maybe_compact(player)
         save_progress(player)
-        break
+        return count
+    finally:
+        journal.close()
+        SCREEN.discard = discard
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LIFE SYSTEM - RPG-like personal development game")
+    parser.add_argument("--db", help="keep profiles in this SQLite database instead of data.json")
+    parser.add_argument("--bin", help="keep profiles in this binary container file instead of data.json")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="collect counters and latency histograms and write them here on exit (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--pack", action="append", metavar="FILE",
+                        help=f"content pack to load over the built-in content; repeatable (default: {PACK_DIR}/*.json)")
+    commands = parser.add_subparsers(dest="command")
+    content = commands.add_parser("content", help="validate and compile the content packs, and print what they add up to")
+    content.add_argument("--no-cache", action="store_true", help="compile even if a cached catalog matches")
+    sim = commands.add_parser("simulate", help="run headless players and print aggregate statistics")
+    sim.add_argument("--players", type=int, default=100)
+    sim.add_argument("--turns", type=int, default=1000)
+    sim.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    sim.add_argument("--seed", type=int, default=None, help="master seed; the same seed gives the same results")
+    sim.add_argument("--workers", type=int, default=1, help="processes to spread player shards over (0 = all cores)")
+    sim.add_argument("--no-quests", action="store_true", help="don't start every quest up front")
+    sim.add_argument("--no-events", action="store_true", help="skip the random event roll each turn")
+    sim.add_argument("--vectorized", action="store_true", help="simulate the whole population with NumPy (random policy, no quests)")
+    sim.add_argument("--report-every", type=int, default=1, help="with --vectorized, record percentiles every N turns")
+    sim.add_argument("--check", action="store_true", help="with --vectorized, compare against the scalar simulator and fail on disagreement")
+    batch = commands.add_parser("batch", help="apply commands from a file or stdin and print one JSON result per line")
+    batch.add_argument("file", nargs="?", default="-", help="one command per line, e.g. 'task running' (default: stdin)")
+    batch.add_argument("--name", help="profile to play; needed with --db or to start a new player")
+    batch.add_argument("--save-every", type=int, default=0, help="also save after every N actions (default: only at the end)")
+    batch.add_argument("--seed", type=int, default=None, help="seed the dice for a reproducible run")
+    batch.add_argument("--no-events", action="store_true", help="skip the random event roll before each action")
+    export = commands.add_parser("export", help="write a saved profile out as JSON, or --all of them as JSON Lines/CSV")
+    export.add_argument("name", nargs="?", help="profile to export; needed with --db/--bin")
+    export.add_argument("--out", help="file to write (default: stdout)")
+    export.add_argument("--all", action="store_true", help="stream every profile, one flat record each")
+    export.add_argument("--format", choices=BULK_FORMATS, help="with --all (default: from --out's extension, else jsonl)")
+    export.add_argument("--checkpoint", help="with --all, progress file; rerunning with it resumes an interrupted export")
+    import_ = commands.add_parser("import", help="save a JSON profile (as written by export or data.json), or a JSON Lines/CSV bulk export, into the storage")
+    import_.add_argument("file")
+    import_.add_argument("--format", choices=("json",) + BULK_FORMATS, help="default: from the file's extension, else json")
+    import_.add_argument("--batch", type=int, default=1000, help="bulk profiles per storage write")
+    import_.add_argument("--checkpoint", help="bulk progress file; rerunning with it resumes an interrupted import")
+    import_.add_argument("--errors", help="write rejected bulk records here as JSON lines (default: stderr)")
+    board = commands.add_parser("leaderboard", help="rank saved profiles by a stat/skill level, total_level, gold, achievements or quests")
+    board.add_argument("board")
+    board.add_argument("--top", type=int, default=10, help="how many entries to list")
+    board.add_argument("--start", type=int, default=0, help="rank to list from (0 = the top)")
+    board.add_argument("--rank", metavar="NAME", help="show where this player stands instead")
+    board.add_argument("--range", nargs=2, type=int, metavar=("LOW", "HIGH"), help="list players scoring LOW..HIGH instead")
+    serve = commands.add_parser("serve", help="host many players over a TCP line protocol")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--cache-size", type=int, default=10000, help="players kept in memory")
+    serve.add_argument("--idle-timeout", type=float, default=600.0, help="seconds before an idle player is evicted")
+    serve.add_argument("--flush-interval", type=float, default=1.0, help="seconds between batched saves")
+    serve.add_argument("--energy-tick", type=float, default=0, help="tell players when their energy is full, checking every N seconds")
+    args = parser.parse_args(argv)
+    METRICS.enabled = bool(args.metrics)
+    packs = args.pack if args.pack is not None else default_packs()
+    try:
+        if packs or args.command == "content":
+            load_content(packs, None if getattr(args, "no_cache", False) else CONTENT_CACHE_DIR)
+    except (ContentError, OSError) as e:
+        raise SystemExit(str(e))
+    try:
+        dispatch(args)
+    finally:
+        if args.metrics:
+            METRICS.dump(args.metrics)
+
+def dispatch(args):
+    if args.command == "simulate" and args.vectorized and args.check:
+        ok, details = check_vectorized(args.players, args.turns, args.seed or 0)
+        print(json.dumps(details, indent=2))
+        if not ok:
+            raise SystemExit("Vectorized simulator disagrees with the scalar one")
+    elif args.command == "simulate" and args.vectorized:
+        stats = simulate_vectorized(args.players, args.turns, args.seed, events=not args.no_events,
+                                    report_every=args.report_every)
+        print(json.dumps(stats, indent=2))
+    elif args.command == "simulate":
+        stats = simulate(args.players, args.turns, args.policy, args.seed, quests=not args.no_quests,
+                         events=not args.no_events, workers=args.workers or os.cpu_count())
+        print(json.dumps(stats, indent=2))
+    elif args.command == "content":
+        counts = {table: len(entries) for table, entries in CONTENT_TABLES.items()}
+        print(json.dumps({"packs": CONTENT_PACKS, **counts}, indent=2))
+    elif args.command == "batch":
+        storage = open_storage(args)
+        rng = random.Random(args.seed) if args.seed is not None else random
+        if args.file == "-":
+            run_batch(sys.stdin, storage, args.name, args.save_every, not args.no_events, rng)
+        else:
+            with open(args.file) as f:
+                run_batch(f, storage, args.name, args.save_every, not args.no_events, rng)
+    elif args.command == "export" and args.all:
+        storage = open_storage(args) or JsonFileStorage()
+        out = args.out or "-"
+        state = export_profiles(storage, out, args.format or bulk_format(out), args.checkpoint)
+        storage.close()
+        if out != "-":
+            print(json.dumps({"exported": state["exported"], "file": out}))
+    elif args.command == "export":
+        storage = open_storage(args) or JsonFileStorage()
+        data = storage.read(args.name)
+        if data is None:
+            raise SystemExit(f"No profile {args.name or ''} in {storage.path}")
+        if args.out:
+            write_snapshot(data, args.out)
+        else:
+            print(json.dumps(data, indent=2))
+    elif args.command == "import" and (args.format or bulk_format(args.file, "json")) != "json":
+        storage = open_storage(args)
+        if storage is None:
+            raise SystemExit("A bulk import needs --db or --bin; data.json holds only one profile")
+        if not os.path.exists(args.file):
+            raise SystemExit(f"No such file: {args.file}")
+        report = open(args.errors, "a" if args.checkpoint else "w") if args.errors else sys.stderr
+        try:
+            state = import_profiles(storage, args.file, args.format or bulk_format(args.file), max(1, args.batch),
+                                    args.checkpoint, report)
+        finally:
+            storage.close()
+            if report is not sys.stderr:
+                report.close()
+        print(json.dumps({"imported": state["imported"], "rejected": state["rejected"], "file": args.file}))
+    elif args.command == "import":
+        storage = open_storage(args) or JsonFileStorage()
+        data = read_snapshot(args.file)
+        if data is None:
+            raise SystemExit(f"No such file: {args.file}")
+        storage.write(data)
+        storage.close()
+    elif args.command == "leaderboard":
+        board = LEADERBOARD_LOOKUP.get(args.board.lower())
+        if board is None:
+            raise SystemExit(f"No leaderboard {args.board}; choose from {', '.join(LEADERBOARD_NAMES)}")
+        leaderboards = Leaderboards(open_storage(args) or JsonFileStorage())
+        if args.rank:
+            entry = leaderboards.rank(board, args.rank)
+            entries = [entry] if entry else []
+        elif args.range:
+            entries = leaderboards.between(board, *args.range, limit=args.top)
+        else:
+            entries = leaderboards.top(board, args.top, args.start)
+        for rank, name, score in entries:
+            print(f"{rank:>8}. {name} ({score})")
+    elif args.command == "serve":
+        server = GameServer(open_storage(args) or SQLiteStorage("life.db"), args.host, args.port, args.cache_size,
+                            args.idle_timeout, args.flush_interval, args.energy_tick)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
     else:
-        print("Invalid choice.")
-    time.sleep(1)  # Small delay for pacing
+        play(open_storage(args))
+
+def open_storage(args):
+    # The storage picked on the command line, or None for the default data.json
+    if args.db:
+        return SQLiteStorage(args.db)
+    if args.bin:
+        return BinaryStorage(args.bin)
+    return None
+
+if __name__ == "__main__":
+    main()
 
 # End of code - Total lines: Approaching 1000 with comments, lists, and structure. Made it deep with systems interlinked.
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+import index
+
+
+def full_scan(player):
+    # What the original check_achievements found by walking every achievement
+    return {key for key, ach in index.ACHIEVEMENTS.items()
+            if player.get_stat_or_skill(ach["req"]["type"], ach["req"]["key"]).level >= ach["req"]["level"]}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_unlocked_achievements_match_a_full_scan(seed):
+    rng = random.Random(seed)
+    player = index.Player("hero")
+    player.gold = 10 ** 5
+    for _ in range(300):
+        if rng.random() < 0.1:
+            index.buy_item(player, "luck charm")  # Levels up without XP
+            index.consume_item(player, "luck charm")
+        else:
+            key = rng.choice(index.ALL_STAT_KEYS)
+            player.gain_xp(player.find_stat(key), rng.randint(1, 400))
+        assert set(player.achievements) == full_scan(player)
+
+
+def test_rewards_are_paid_once_in_unlock_order():
+    player = index.Player("hero")
+    player.events = []
+    player.gain_xp(player.find_stat("Strength"), 10 ** 4)
+    player.gain_xp(player.find_stat("Strength"), 10 ** 4)
+    assert list(player.achievements) == ["strength_master"]
+    assert player.gold == index.ACHIEVEMENTS["strength_master"]["reward_gold"]
+    assert [event["key"] for event in player.events if event["type"] == "achievement"] == ["strength_master"]
+
+
+def test_checking_everything_catches_up_a_loaded_player():
+    data = index.Player("hero").to_dict()
+    data["stats"]["Mind"]["level"] = 12
+    data["skills"]["Combat"]["level"] = 5
+    player = index.Player.from_dict(data)
+    assert not player.achievements
+    player.check_achievements()
+    assert set(player.achievements) == full_scan(player) == {"mind_guru", "combat_champ"}
+
+
+def test_index_lists_each_stats_achievements_by_level():
+    achievements = {
+        "late": {"req": {"type": "stat", "key": "Mind", "level": 9}},
+        "early": {"req": {"type": "stat", "key": "Mind", "level": 2}},
+        "other": {"req": {"type": "skill", "key": "Art", "level": 4}},
+    }
+    assert index.build_achievement_index(achievements) == {
+        ("stat", "Mind"): [(2, "early"), (9, "late")],
+        ("skill", "Art"): [(4, "other")],
+    }
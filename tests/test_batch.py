@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+import index
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The single-file save keeps its journal in the working directory
+
+
+class CountingStorage(index.JsonFileStorage):
+    def __init__(self, path):
+        super().__init__(path)
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        super().write(data)
+
+
+def replay(lines, storage, **kwargs):
+    out = io.StringIO()
+    count = index.run_batch(lines, storage, rng=index.random.Random(1), out=out, **kwargs)
+    return count, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_each_command_gets_a_json_line(tmp_path):
+    storage = CountingStorage(str(tmp_path / "data.json"))
+    lines = ["# warm up\n", "task running\n", "\n", "  buy energy potion  \n", "quest start artist arc\n", "task flying\n"]
+    count, results = replay(lines, storage, name="hero", events=False)
+    assert count == 4
+    assert [result.get("task") or result.get("item") or result.get("quest") for result in results] == \
+        ["running", "energy potion", "artist arc", "flying"]
+    assert results[3] == {"ok": False, "error": "invalid_task", "task": "flying", "events": []}
+    saved = storage.read()
+    assert saved["name"] == "hero" and saved["active_quests"] == {"artist arc": []}
+
+
+def test_saves_at_the_end_or_every_n_actions(tmp_path):
+    lines = ["task yoga"] * 7
+    once = CountingStorage(str(tmp_path / "once.json"))
+    replay(lines, once, name="hero")
+    often = CountingStorage(str(tmp_path / "often.json"))
+    replay(lines, often, name="hero", save_every=3)
+    assert often.writes - once.writes == 2
+
+
+def test_a_saved_player_carries_on(tmp_path, capsys):
+    storage = index.JsonFileStorage(str(tmp_path / "data.json"))
+    replay(["task yoga"], storage, name="hero", events=False)
+    energy = storage.read()["energy"]
+    replay(["task yoga"], storage, events=False)
+    assert storage.read()["energy"] < energy
+    with pytest.raises(SystemExit, match="not villain"):
+        replay(["task yoga"], storage, name="villain")
+    assert capsys.readouterr().out == ""  # Save notices are kept off stdout
+
+
+def test_a_new_player_needs_a_name(tmp_path):
+    with pytest.raises(SystemExit, match="--name"):
+        replay(["task yoga"], index.JsonFileStorage(str(tmp_path / "data.json")))
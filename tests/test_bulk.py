@@ -0,0 +1,89 @@
+import io
+import json
+
+import pytest
+
+import index
+from test_storage import played_player, snapshot
+
+
+@pytest.fixture
+def source(tmp_path):
+    storage = index.SQLiteStorage(str(tmp_path / "source.db"))
+    storage.write_many([snapshot(played_player(f"player-{i}", i)) for i in range(12)])
+    yield storage
+    storage.close()
+
+
+def profiles(storage):
+    return {data["name"]: data for _, data in storage.scan()}
+
+
+@pytest.mark.parametrize("fmt", index.BULK_FORMATS)
+@pytest.mark.parametrize("target", ["db", "bin"])
+def test_export_import_round_trip(source, tmp_path, fmt, target):
+    path = str(tmp_path / f"all.{fmt}")
+    assert index.export_profiles(source, path, fmt)["exported"] == 12
+    storage = (index.SQLiteStorage if target == "db" else index.BinaryStorage)(str(tmp_path / f"target.{target}"))
+    state = index.import_profiles(storage, path, fmt, batch=5)
+    assert (state["imported"], state["rejected"]) == (12, 0)
+    assert profiles(storage) == profiles(source)
+    storage.close()
+
+
+def test_interrupted_jobs_resume_from_their_checkpoints(source, tmp_path, monkeypatch):
+    monkeypatch.setattr(index, "CHECKPOINT_EVERY", 5)
+    path, checkpoint = str(tmp_path / "all.jsonl"), str(tmp_path / "export.ckpt")
+    scan = source.scan
+
+    def crashing_scan(after=None):
+        for count, item in enumerate(scan(after, page=3)):
+            if after is None and count == 7:
+                raise RuntimeError("killed")
+            yield item
+
+    monkeypatch.setattr(source, "scan", crashing_scan)
+    with pytest.raises(RuntimeError):
+        index.export_profiles(source, path, "jsonl", checkpoint)
+    assert index.read_snapshot(checkpoint)["exported"] == 5
+    assert index.export_profiles(source, path, "jsonl", checkpoint)["exported"] == 12
+    monkeypatch.setattr(source, "scan", scan)
+    full = str(tmp_path / "full.jsonl")
+    index.export_profiles(source, full)
+    assert open(path).read() == open(full).read()
+
+    target = index.SQLiteStorage(str(tmp_path / "target.db"))
+    write, calls = target.replace_many, []
+
+    def crashing_write(datas):
+        calls.append(len(datas))
+        if len(calls) == 2:
+            raise RuntimeError("killed")
+        write(datas)
+
+    monkeypatch.setattr(target, "replace_many", crashing_write)
+    checkpoint = str(tmp_path / "import.ckpt")
+    with pytest.raises(RuntimeError):
+        index.import_profiles(target, path, "jsonl", 4, checkpoint)
+    assert index.read_snapshot(checkpoint)["imported"] == 4
+    assert index.import_profiles(target, path, "jsonl", 4, checkpoint)["imported"] == 12
+    assert profiles(target) == profiles(source)
+    target.close()
+
+
+def test_invalid_records_are_reported_and_skipped(tmp_path):
+    good = index.flatten_profile(snapshot(index.Player("good")))
+    lines = [json.dumps(good), "not json", json.dumps(dict(good, name="bad", energy=-1, inventory={"nope": 1}))]
+    path = tmp_path / "mixed.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    storage = index.SQLiteStorage(str(tmp_path / "target.db"))
+    report = io.StringIO()
+    state = index.import_profiles(storage, str(path), "jsonl", report=report)
+    assert (state["imported"], state["rejected"]) == (1, 2)
+    rejected = [json.loads(line) for line in report.getvalue().splitlines()]
+    assert rejected[0]["offset"] == len(lines[0]) + 1
+    assert rejected[1]["name"] == "bad"
+    assert any("energy" in error for error in rejected[1]["errors"])
+    assert any("nope" in error for error in rejected[1]["errors"])
+    assert storage.names() == ["good"]
+    storage.close()
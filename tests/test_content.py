@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import index
+
+
+@pytest.fixture
+def pack(tmp_path):
+    # Writes a content pack and installs it; the built-in content is put back afterwards
+    def install(tables):
+        path = tmp_path / "pack.json"
+        path.write_text(json.dumps(tables))
+        index.load_content([str(path)], cache_dir=None)
+
+    yield install
+    index.load_content([], cache_dir=None)
+
+
+def test_saves_survive_removed_content(pack):
+    player = index.Player("hero")
+    player.gold = 1000
+    index.buy_item(player, "energy potion")
+    index.start_quest(player, "warrior path")
+    index.apply_task_result(player, "boxing practice", True, 10, 0)
+    index.start_quest(player, "beginner quest")
+    for task in index.QUESTS["beginner quest"]["tasks"]:
+        index.apply_task_result(player, task, True, 10, 0)
+    player.gain_xp(player.find_stat("Strength"), 10 ** 5)
+    data = player.to_dict()
+    assert data["completed_quests"] == ["beginner quest"] and data["achievements"]
+    removed = data["achievements"][0]
+    pack({"shop_items": {"energy potion": None}, "achievements": {removed: None},
+          "quests": {"warrior path": None, "beginner quest": None}})
+
+    loaded = index.Player.from_dict(data)
+    assert "energy potion" not in loaded.inventory
+    assert removed not in loaded.achievements
+    assert not loaded.active_quests and not loaded.completed_quests
+    index.render_stats(loaded)
+
+
+def test_using_a_removed_item_keeps_it(pack):
+    player = index.Player("hero")
+    player.inventory.add("energy potion")
+    pack({"shop_items": {"energy potion": None}})
+    result = index.consume_item(player, "energy potion")
+    assert result["error"] == "invalid_item"
+    assert player.inventory.count("energy potion") == 1
+
+
+def test_ranged_gold_is_rolled_on_every_success():
+    rng = index.random.Random(0)
+    low, high = index.TASKS["gambling"]["gold_range"]
+    paid = set()
+    for _ in range(200):
+        player = index.Player("hero")
+        result = index.perform_task(player, "gambling", rng)
+        if result["success"]:
+            assert low <= result["gold"] <= high
+            paid.add(result["gold"])
+    assert len(paid) > 5
+    assert index.TASKS["gambling"]["expected_gold"] == (low + high) / 2
+
+
+def test_names_commands_cannot_reach_are_rejected(pack):
+    task = dict(index.TASKS["meditation"])
+    item = dict(index.SHOP_ITEMS["writing pen"])
+    with pytest.raises(index.ContentError) as error:
+        pack({"tasks": {"Deep Work": task, " nap": task},
+              "shop_items": {"3 wishes": item, "Lucky Coin": item},
+              "quests": {"Big Day": {"tasks": ["meditation"], "reward_gold": 1}}})
+    problems = "\n".join(error.value.problems)
+    for name in ("Deep Work", " nap", "3 wishes", "Lucky Coin", "Big Day"):
+        assert repr(name) in problems
+    pack({"tasks": {"deep work": task}, "shop_items": {"lucky coin": item}})
+    assert index.run_command(index.Player("hero"), "task Deep Work")["ok"]
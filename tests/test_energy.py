@@ -0,0 +1,108 @@
+import datetime
+
+import pytest
+
+import index
+
+POINT = 1 / index.ENERGY_REGEN_PER_SECOND  # Seconds per point of energy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(index, "ENERGY_CLOCK", clock)
+    return clock
+
+
+def test_energy_comes_back_with_time(clock):
+    player = index.Player("hero")
+    player.energy = 0
+    clock.now += 3 * POINT
+    assert player.energy == 3 and player.energy_value == 0  # Nothing stored until it's settled
+    clock.now += 10 ** 6
+    assert player.energy == player.max_energy
+
+
+def test_settling_keeps_the_part_point(clock):
+    player = index.Player("hero")
+    player.energy = 0
+    clock.now += 1.5 * POINT
+    player.energy -= 0  # Any write settles
+    assert player.energy_value == 1
+    clock.now += 0.5 * POINT
+    assert player.energy == 2
+
+
+def test_nothing_accrues_while_full(clock):
+    player = index.Player("hero")
+    clock.now += 100 * POINT
+    player.energy -= 10
+    assert player.energy == 90
+    clock.now += 9 * POINT
+    assert player.energy == 99
+
+
+def test_stopped_regen_stays_put(clock):
+    player = index.Player("hero")
+    player.energy = 20
+    clock.now += 2 * POINT
+    player.stop_regen()
+    clock.now += 50 * POINT
+    assert player.energy == 22 and player.energy_full_in() is None
+    player.start_regen()
+    clock.now += POINT
+    assert player.energy == 23
+
+
+def test_a_restart_catches_up_by_the_wall_clock(clock):
+    player = index.Player("hero")
+    player.energy = 40
+    an_hour_ago = (datetime.datetime.now() - datetime.timedelta(hours=1)).isoformat()
+    assert player.regenerate_energy(an_hour_ago) == index.ENERGY_REGEN_PER_HOUR
+    assert player.energy_value == 40 + index.ENERGY_REGEN_PER_HOUR
+
+
+def test_a_wall_clock_set_back_takes_nothing(clock):
+    player = index.Player("hero")
+    player.energy = 40
+    tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).isoformat()
+    assert player.regenerate_energy(tomorrow) == 0
+    clock.now += POINT
+    assert player.energy == 41
+
+
+def test_timers_fire_once_energy_is_full(clock):
+    fired = []
+    timers = index.EnergyTimers(resolution=60.0, slots=8, on_full=fired.append)  # A turn is 8 minutes
+    hero, rested = index.Player("hero"), index.Player("rested")
+    hero.energy = 90  # Full in 10 points, more than one turn of the wheel
+    timers.schedule(hero)
+    timers.schedule(rested)
+    assert len(timers) == 1
+    clock.now += 10 * POINT - 60
+    assert timers.tick() == []
+    clock.now += 120
+    assert timers.tick() == [hero] and fired == [hero]
+    assert len(timers) == 0
+
+
+def test_spending_before_the_timer_pushes_it_back(clock):
+    fired = []
+    timers = index.EnergyTimers(resolution=60.0, slots=8, on_full=fired.append)
+    hero = index.Player("hero")
+    hero.energy = 99
+    timers.schedule(hero)
+    clock.now += POINT / 2
+    hero.energy -= 5  # Not rescheduled, so the tick finds it short and tries again
+    clock.now += POINT
+    assert timers.tick() == [] and len(timers) == 1
+    clock.now += 5 * POINT
+    assert timers.tick() == [hero]
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+import index
+
+
+@pytest.fixture
+def player():
+    player = index.Player("hero")
+    player.gold = 1000
+    return player
+
+
+def test_tasks_report_instead_of_printing(player, capsys):
+    result = index.perform_task(player, "running", random.Random(3))
+    assert set(result) == {"ok", "task", "success", "xp", "gold"}
+    assert result["ok"] and result["task"] == "running"
+    assert result["xp"] == (index.TASKS["running"]["xp"] if result["success"] else index.TASKS["running"]["xp"] // 2)
+    assert player.energy == 100 - index.TASKS["running"]["energy_cost"]
+    assert index.perform_task(player, "flying") == {"ok": False, "error": "invalid_task", "task": "flying"}
+    player.energy = 0
+    assert index.perform_task(player, "running") == {"ok": False, "error": "no_energy", "task": "running"}
+    assert capsys.readouterr() == ("", "")
+
+
+def test_shopping_reports_instead_of_printing(player, capsys):
+    assert index.buy_item(player, "energy potion") == {"ok": True, "item": "energy potion", "quantity": 1, "price": 50}
+    assert player.gold == 950
+    player.energy = 10
+    assert index.consume_item(player, "energy potion") == {
+        "ok": True, "item": "energy potion", "quantity": 1, "effect": "restore_energy", "key": None, "amount": 50}
+    assert player.energy == 60
+    assert index.consume_item(player, "energy potion") == {"ok": False, "error": "not_in_inventory", "item": "energy potion"}
+    player.gold = 0
+    assert index.buy_item(player, "xp boost book") == {"ok": False, "error": "no_gold", "item": "xp boost book"}
+    assert capsys.readouterr() == ("", "")
+
+
+def test_same_seed_same_game(player):
+    other = index.Player.from_dict(player.to_dict())
+    for each in (player, other):
+        rng = random.Random(11)
+        for _ in range(20):
+            index.perform_task(each, rng.choice(sorted(index.TASKS)), rng)
+    assert other.to_dict() == player.to_dict()
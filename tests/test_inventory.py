@@ -0,0 +1,71 @@
+import pytest
+
+import index
+
+
+def rich_player():
+    player = index.Player("hero")
+    player.gold = 10 ** 6
+    return player
+
+
+def test_buying_and_using_counts_units():
+    player = rich_player()
+    assert index.buy_item(player, "energy potion", 3)["price"] == 150
+    assert player.inventory == {"energy potion": 3}
+    player.energy = 0
+    result = index.consume_item(player, "energy potion", 2)
+    assert result["ok"] and result["amount"] == 100
+    assert player.energy == 100 and player.inventory == {"energy potion": 1}
+    assert index.consume_item(player, "energy potion")["ok"]
+    assert "energy potion" not in player.inventory  # Used up entries go away
+
+
+def test_failed_purchases_change_nothing():
+    player = index.Player("hero")
+    player.gold = 40
+    assert index.buy_item(player, "energy potion")["error"] == "no_gold"
+    assert index.buy_item(player, "no such thing")["error"] == "invalid_item"
+    assert player.gold == 40 and not player.inventory
+
+
+def test_using_more_than_held_keeps_the_stack():
+    player = rich_player()
+    index.buy_item(player, "writing pen", 2)
+    assert index.consume_item(player, "writing pen", 3)["error"] == "not_in_inventory"
+    assert index.consume_item(player, "energy potion")["error"] == "not_in_inventory"
+    assert player.inventory == {"writing pen": 2}
+
+
+@pytest.mark.parametrize("quantity", [0, -1, index.MAX_STACK + 1, 10 ** 20])
+def test_quantities_outside_the_stack_bound_are_rejected(quantity):
+    player = rich_player()
+    index.buy_item(player, "gold bag", 5)
+    for use in (index.buy_item, index.consume_item):
+        assert use(player, "gold bag", quantity)["error"] == "invalid_quantity"
+    assert player.inventory == {"gold bag": 5} and player.gold == 10 ** 6
+
+
+def test_stacks_stop_at_their_limit():
+    player = rich_player()
+    assert index.buy_item(player, "gold bag", index.MAX_STACK)["ok"]
+    assert index.buy_item(player, "gold bag")["error"] == "no_room"
+    limited = index.Inventory({"energy potion": 2}, limits={"energy potion": 3})
+    assert limited.add("energy potion", 5) == 1
+    assert limited == {"energy potion": 3}
+
+
+def test_commands_parse_counts():
+    assert index.split_quantity("3 energy potion") == (3, "energy potion")
+    assert index.split_quantity("energy potion") == (1, "energy potion")
+    assert index.split_quantity("9" * 5000 + " gold bag") == (index.MAX_STACK + 1, "gold bag")
+    player = index.Player("hero")
+    result = index.run_command(player, "buy 99999999999999999999 gold bag")
+    assert result["error"] == "invalid_quantity" and not player.inventory
+
+
+def test_old_list_inventories_load_as_counts():
+    data = index.Player("hero").to_dict()
+    data["inventory"] = ["energy potion", "writing pen", "energy potion"]
+    player = index.Player.from_dict(data)
+    assert player.inventory == {"energy potion": 2, "writing pen": 1}
@@ -0,0 +1,93 @@
+import os
+import random
+
+import pytest
+
+import index
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(index.SCREEN, "discard", True)
+    storage = index.JsonFileStorage(str(tmp_path / "data.json"))
+    return index.Journal(str(tmp_path / "data.journal"), storage)
+
+
+def new_player(journal):
+    player = index.Player("hero")
+    player.events = []
+    player.journal = journal
+    journal.compact(player, background=False)
+    return player
+
+
+def play(player, rng, actions):
+    for _ in range(actions):
+        index.run_command(player, "task running", rng)
+        index.run_command(player, "buy Energy Potion", rng)
+
+
+def reload(journal):
+    # What a fresh process would load: the last snapshot plus the journal tail
+    fresh = index.Journal(journal.path, index.JsonFileStorage(journal.storage.path))
+    player = index.load_progress(fresh)
+    fresh.close()
+    return player
+
+
+def state(player):
+    data = player.to_dict()
+    data.pop("energy")  # Regen depends on the clock
+    return data
+
+
+def test_records_survive_a_crash_without_close(journal):
+    player = new_player(journal)
+    play(player, random.Random(1), 5)
+    # No close() or sync(): a killed process leaves whatever reached the OS
+    assert open(journal.path).read().count("\n") == journal.seq
+    assert state(reload(journal)) == state(player)
+
+
+def test_crashed_compactions_keep_the_parked_journal(journal):
+    player = new_player(journal)
+    rng = random.Random(2)
+
+    def fail(data):
+        raise OSError("disk full")
+
+    write, journal.storage.write = journal.storage.write, fail
+    for _ in range(2):
+        play(player, rng, 3)
+        with pytest.raises(OSError):
+            journal.compact(player, background=False)
+    journal.storage.write = write
+    play(player, rng, 1)
+    assert state(reload(journal)) == state(player)
+
+
+def test_torn_final_line_is_dropped(journal):
+    player = new_player(journal)
+    play(player, random.Random(3), 2)
+    expected = state(player)
+    journal.close()
+    with open(journal.path, "a") as f:
+        f.write('[99,"task","Runn')  # Cut off mid-write
+    player = reload(journal)
+    assert state(player) == expected
+    # Reopening trims it, so later records aren't glued onto the torn one
+    resumed = index.Journal(journal.path, journal.storage)
+    player = index.load_progress(resumed)
+    play(player, random.Random(4), 1)
+    resumed.close()
+    assert state(reload(journal)) == state(player)
+
+
+def test_profiles_never_share_a_journal(tmp_path):
+    storage = index.SQLiteStorage(str(tmp_path / "life.db"))
+    names = ["bob smith", "bob_smith", "Bob_Smith", "bob/smith", "bob%20smith"]
+    paths = {index.journal_path(storage, name) for name in names}
+    assert len(paths) == len(names)
+    assert all(os.path.dirname(path) == str(tmp_path) for path in paths)
+    assert index.journal_path(storage, "bob smith") == index.journal_path(storage, "bob smith")
+    storage.close()
@@ -0,0 +1,47 @@
+import random
+
+import index
+from test_storage import played_player, snapshot
+
+
+def test_record_scores_match_snapshot_scores():
+    players = [played_player(f"player-{i}", i) for i in range(3)]
+    wide = index.Player("rich")
+    wide.gold = 10 ** 30  # Past 64 bits, so the record keeps its numbers as JSON
+    for player in players + [wide]:
+        data = snapshot(player)
+        assert index.record_scores(index.encode_player(data)) == (data["name"], index.snapshot_scores(data))
+
+
+def test_ranked_list_matches_sorted_list():
+    rng = random.Random(0)
+    ranked, reference = index.RankedList(), []
+    for _ in range(3000):
+        item = (rng.randrange(-50, 0), f"p{rng.randrange(500)}")
+        if item in reference:
+            ranked.remove(item)
+            reference.remove(item)
+        else:
+            ranked.add(item)
+            reference.append(item)
+        reference.sort()
+    assert list(ranked.islice(0, len(ranked))) == reference
+    assert all(ranked.rank(item) == i for i, item in enumerate(reference))
+
+
+def test_boards_agree_across_storages(tmp_path):
+    datas = [snapshot(played_player(f"player-{i}", i)) for i in range(8)]
+    sqlite = index.SQLiteStorage(str(tmp_path / "life.db"))
+    binary = index.BinaryStorage(str(tmp_path / "life.bin"))
+    for storage in (sqlite, binary):
+        storage.write_many(datas)
+    boards = [index.Leaderboards(storage) for storage in (sqlite, binary)]
+    for board in index.LEADERBOARD_NAMES:
+        assert boards[0].top(board, 10) == boards[1].top(board, 10)
+    # A live player's unsaved state wins over the stored one
+    player = index.Player.from_dict(datas[0])
+    player.gold = 10 ** 9
+    boards[1].update(player)
+    assert boards[1].rank("gold", player.name) == (1, player.name, 10 ** 9)
+    sqlite.close()
+    binary.close()
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import index
+
+
+@pytest.fixture
+def metrics():
+    index.METRICS.reset()
+    index.METRICS.enabled = True
+    yield index.METRICS
+    index.METRICS.enabled = False
+    index.METRICS.reset()
+
+
+class Dice:
+    # Every roll succeeds and pays the bottom of the range
+    def random(self):
+        return 0.0
+
+    def randint(self, low, high):
+        return low
+
+
+def test_engine_calls_are_counted(metrics):
+    player = index.Player("hero")
+    player.gold = 1000
+    index.perform_task(player, "running", Dice())
+    index.perform_task(player, "no such task")
+    player.energy = 0
+    index.perform_task(player, "running")
+    index.buy_item(player, "energy potion", 3)
+    index.consume_item(player, "energy potion", 2)
+    index.buy_item(player, "no such thing")
+    index.start_quest(player, "artist arc")
+    assert metrics.counter("life_task_attempts_total") == {"running": 1}
+    assert metrics.counter("life_task_successes_total") == {"running": 1}
+    assert metrics.counter("life_task_rejected_total") == {"invalid_task": 1, "no_energy": 1}
+    assert metrics.counter("life_items_bought_total") == {"energy potion": 3}
+    assert metrics.counter("life_items_used_total") == {"energy potion": 2}
+    assert metrics.counter("life_quests_started_total") == {"artist arc": 1}
+
+
+def test_nothing_is_counted_while_disabled():
+    index.METRICS.reset()
+    player = index.Player("hero")
+    index.perform_task(player, "running")
+    index.run_command(player, "buy energy potion")
+    assert index.METRICS.to_dict() == {"counters": {}, "histograms": {}}
+
+
+def test_commands_are_timed_by_verb(metrics):
+    player = index.Player("hero")
+    for command in ("task running", "task running", "plan", "dance wildly"):
+        index.run_command(player, command, Dice())
+    actions = metrics.to_dict()["histograms"]["life_action_seconds"]["values"]
+    assert {verb: series["count"] for verb, series in actions.items()} == {"task": 2, "plan": 1, "invalid": 1}
+    assert sum(actions["task"]["buckets"].values()) == 2
+
+
+def test_prometheus_buckets_are_cumulative(metrics):
+    metrics.observe("life_save_seconds", 0.00002, "json")
+    metrics.observe("life_save_seconds", 0.3, "json")
+    metrics.count("life_save_bytes_total", "json", 512)
+    lines = metrics.prometheus().splitlines()
+    assert "# TYPE life_save_seconds histogram" in lines
+    assert 'life_save_seconds_bucket{storage="json",le="1e-05"} 0' in lines
+    assert 'life_save_seconds_bucket{storage="json",le="2.5e-05"} 1' in lines
+    assert 'life_save_seconds_bucket{storage="json",le="0.5"} 2' in lines
+    assert 'life_save_seconds_bucket{storage="json",le="+Inf"} 2' in lines
+    assert 'life_save_seconds_count{storage="json"} 2' in lines
+    assert 'life_save_bytes_total{storage="json"} 512' in lines
+
+
+def test_merged_registries_add_up(metrics):
+    worker = index.Metrics(enabled=True)
+    worker.count("life_items_used_total", "gold bag", 2)
+    worker.observe("life_load_seconds", 0.001, "binary")
+    metrics.count("life_items_used_total", "gold bag")
+    metrics.merge(worker.take())
+    metrics.merge(worker.take())  # Already handed over; adds nothing
+    assert metrics.counter("life_items_used_total") == {"gold bag": 3}
+    assert metrics.to_dict()["histograms"]["life_load_seconds"]["values"]["binary"]["count"] == 1
+
+
+@pytest.mark.parametrize("suffix", [".json", ".prom"])
+def test_metrics_flag_writes_the_run_out(tmp_path, monkeypatch, capsys, suffix):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "moves.txt").write_text("task running\nbuy energy potion\n")
+    path = tmp_path / f"metrics{suffix}"
+    try:
+        index.main(["--metrics", str(path), "batch", "moves.txt", "--name", "hero", "--seed", "1", "--no-events"])
+    finally:
+        index.METRICS.enabled = False
+        index.METRICS.reset()
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    if suffix == ".json":
+        data = json.loads(path.read_text())
+        assert data["counters"]["life_task_attempts_total"] == {"label": "task", "values": {"running": 1}}
+        assert set(data["histograms"]["life_action_seconds"]["values"]) == {"task", "buy"}
+        assert "json" in data["counters"]["life_save_bytes_total"]["values"]
+    else:
+        text = path.read_text()
+        assert 'life_task_attempts_total{task="running"} 1' in text
+        assert 'life_action_seconds_count{action="buy"} 1' in text
@@ -0,0 +1,52 @@
+import time
+
+import index
+
+
+def test_plan_budget_is_capped_at_max_energy():
+    player = index.Player("hero")
+    started = time.perf_counter()
+    result = index.run_command(player, "plan xp 100000000")
+    assert time.perf_counter() - started < 1
+    assert result["ok"]
+    assert result["energy"] == player.max_energy
+    assert result["energy_used"] <= player.max_energy
+
+
+def test_plan_accepts_a_bare_budget():
+    player = index.Player("hero")
+    result = index.run_command(player, "plan 50")
+    assert result["ok"]
+    assert (result["objective"], result["energy"]) == ("xp", 50)
+    assert index.run_command(player, "plan gold 30")["energy"] == 30
+    assert index.run_command(player, "plan fame")["error"] == "invalid_objective"
+
+
+def fresh_plan(player, objective):
+    index.PLAN_CACHE.clear()
+    return index.plan_tasks(player, 100, objective)
+
+
+def test_plans_are_not_shared_between_different_players():
+    near = index.Player("near")  # Same levels as a new player, but every stat about to level up
+    for key in index.ALL_STAT_KEYS:
+        near.stat_block.set(index.STAT_SLOTS[key] + 1, 99)
+    first, second = list(index.ACHIEVEMENTS)[:2]
+    one, other = index.Player("one"), index.Player("other")  # Same number of achievements
+    one.achievements, other.achievements = {first: None}, {second: None}
+    for a, b in ((index.Player("new"), near), (one, other)):
+        for objective in index.PLAN_OBJECTIVES:
+            expected = fresh_plan(b, objective)
+            fresh_plan(a, objective)
+            assert index.plan_tasks(b, 100, objective) == expected
+
+
+def test_asking_again_reuses_the_plan():
+    player = index.Player("hero")
+    fresh_plan(player, "gold")
+    assert len(index.PLAN_CACHE) == 1
+    assert index.plan_tasks(player, 60, "gold")["energy"] == 60  # A smaller budget reads the same table
+    assert len(index.PLAN_CACHE) == 1
+    index.run_command(player, "task running")  # Some xp at least, even if it fails
+    index.plan_tasks(player, 100, "gold")
+    assert len(index.PLAN_CACHE) == 2
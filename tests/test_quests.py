@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+import index
+
+
+class ScanQuests:
+    # The original list-based quest tracking: every active quest is looked at for every task
+    def __init__(self):
+        self.active = {}
+        self.completed = []
+        self.gold = 0
+
+    def start(self, quest):
+        self.active[quest] = []
+
+    def task_done(self, task):
+        for quest, done in list(self.active.items()):
+            tasks = index.QUESTS[quest]["tasks"]
+            if task in tasks and task not in done:
+                done.append(task)
+            if set(done) == set(tasks):
+                self.gold += index.QUESTS[quest]["reward_gold"]
+                self.completed.append(quest)
+                del self.active[quest]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_indexed_progress_matches_a_full_scan(seed):
+    rng = random.Random(seed)
+    quest_tasks = sorted({task for quest in index.QUESTS.values() for task in quest["tasks"]})
+    other_tasks = sorted(set(index.TASKS) - set(quest_tasks))
+    player, scan = index.Player("hero"), ScanQuests()
+    for _ in range(200):
+        if rng.random() < 0.15:
+            quest = rng.choice(list(index.QUESTS))
+            if index.start_quest(player, quest)["ok"]:
+                scan.start(quest)
+        task = rng.choice(quest_tasks if rng.random() < 0.8 else other_tasks)
+        gold = player.gold
+        index.apply_task_result(player, task, rng.random() < 0.5, 0, 0)
+        scan.task_done(task)
+        assert player.active_quests == scan.active
+        assert sorted(player.completed_quests) == sorted(scan.completed)
+        for quest, done in player.active_quests.items():
+            missing = set(index.QUESTS[quest]["tasks"]) - set(done)
+            bits = index.QUEST_TASK_BITS[quest]
+            assert player.quest_progress[quest] == sum(bits[task] for task in missing)
+        assert set(player.quest_progress) == set(player.active_quests)
+    assert player.gold >= scan.gold  # Rewards plus any achievements their reward XP unlocked
+
+
+def test_quests_cannot_be_restarted():
+    player = index.Player("hero")
+    assert index.start_quest(player, "artist arc")["ok"]
+    assert index.start_quest(player, "artist arc")["error"] == "invalid_quest"
+    for task in index.QUESTS["artist arc"]["tasks"]:
+        index.apply_task_result(player, task, True, 0, 0)
+    assert player.completed_quests == ["artist arc"] and not player.quest_progress
+    assert index.start_quest(player, "artist arc")["error"] == "invalid_quest"
+
+
+def test_repeated_tasks_in_a_quest_count_once():
+    task_index, task_bits = index.build_quest_index({"loop": {"tasks": ["yoga", "drawing", "yoga"]}})
+    assert task_index == {"yoga": ["loop"], "drawing": ["loop"]}
+    assert task_bits == {"loop": {"yoga": 1, "drawing": 2}}
+
+
+def test_saved_progress_resumes():
+    player = index.Player("hero")
+    index.start_quest(player, "coder journey")
+    index.apply_task_result(player, "hacking puzzle", True, 0, 0)
+    loaded = index.Player.from_dict(player.to_dict())
+    assert loaded.active_quests == {"coder journey": ["hacking puzzle"]}
+    assert loaded.quest_progress == player.quest_progress
+    for task in ("app development", "research project"):
+        index.apply_task_result(loaded, task, True, 0, 0)
+    assert loaded.completed_quests == ["coder journey"]
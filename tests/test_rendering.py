@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import index
+
+
+class Sink:
+    # Records every write separately
+    def __init__(self):
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = Sink()
+    monkeypatch.setattr(index, "SCREEN", index.Screen(sink))
+    return sink
+
+
+def test_stats_screen_is_one_write(sink):
+    player = index.Player("hero")
+    player.gold = 500
+    index.buy_item(player, "energy potion", 2)
+    index.start_quest(player, "artist arc")
+    index.view_stats(player)
+    assert len(sink.writes) == 1
+    assert "energy potion x2" in sink.writes[0] and "artist arc: 0/3" in sink.writes[0]
+
+
+def test_a_menu_turn_is_one_write_each_way(sink, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda: "running")
+    index.do_task(index.Player("hero"))
+    prompt, outcome = sink.writes
+    assert index.catalog("tasks") in prompt and prompt.endswith("(or 'back'): ")
+    assert outcome.startswith(("Success!", "Failed..."))
+
+
+def test_discarded_output_goes_nowhere(sink):
+    index.SCREEN.discard = True
+    index.view_stats(index.Player("hero"))
+    assert sink.writes == []
+
+
+def test_listings_are_rendered_once():
+    index.content_changed()
+    assert index.catalog("shop") is index.catalog("shop")
+    assert set(index.CATALOG_CACHE) == {"shop"}
+
+
+def test_new_content_redraws_the_listings(tmp_path):
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps({"tasks": {"juggling": dict(index.TASKS["running"], xp=7)}}))
+    before = index.catalog("tasks")
+    index.load_content([str(path)], cache_dir=None)
+    try:
+        assert "- juggling (XP: 7," in index.catalog("tasks")
+    finally:
+        index.load_content([], cache_dir=None)
+    assert index.catalog("tasks") == before
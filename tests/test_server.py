@@ -0,0 +1,141 @@
+import asyncio
+import io
+import json
+import random
+import time
+
+import index
+
+
+class FlakyStorage:
+    # Keeps snapshots in a dict; the first `failures` saves raise
+    multi_profile = True
+    path = "memory"
+
+    def __init__(self, failures=1):
+        self.failures = failures
+        self.profiles = {}
+
+    def read(self, name=None):
+        return self.profiles.get(name)
+
+    def write_many(self, datas):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        for data in datas:
+            self.profiles[data["name"]] = data
+
+
+def test_failed_flush_keeps_players_dirty():
+    storage = FlakyStorage()
+    server = index.GameServer(storage, flush_interval=0.01, idle_timeout=0)
+
+    async def scenario():
+        player = server.sessions.checkout("hero")
+        server.sessions.release("hero")
+        player.gold = 123
+        server.sessions.touch("hero")
+        server.flusher = asyncio.ensure_future(server.flush_loop())
+        await asyncio.sleep(0.1)  # A failed flush, then a retry
+        assert not server.flusher.done()
+        server.flusher.cancel()
+
+    asyncio.run(scenario())
+    assert storage.profiles["hero"]["gold"] == 123
+    assert not server.sessions.dirty
+
+
+def test_rest_is_not_a_command():
+    player = index.Player("hero")
+    player.energy = 0
+    result = index.run_command(player, "rest 10")
+    assert result["error"] == "invalid_command"
+    assert player.energy == 0
+
+
+class PickyStorage(FlakyStorage):
+    # Refuses to save one player, whatever is in the batch with them
+    def __init__(self, refuse):
+        super().__init__(failures=0)
+        self.refuse = refuse
+
+    def write_many(self, datas):
+        if any(data["name"] == self.refuse for data in datas):
+            raise OverflowError("Python int too large to convert to SQLite INTEGER")
+        super().write_many(datas)
+
+
+def test_unsavable_player_is_quarantined():
+    storage = PickyStorage("broken")
+    server = index.GameServer(storage, flush_interval=0.01, idle_timeout=0)
+
+    async def scenario():
+        for name in ("broken", "alice", "bob"):
+            server.sessions.checkout(name)
+            server.execute(name, "buy 2 gold bag")
+        server.sessions.release("broken")
+        server.sessions.release("bob")
+        server.flusher = asyncio.ensure_future(server.flush_loop())
+        await asyncio.sleep(0.05)
+        server.execute("alice", "use gold bag")  # Later changes still get saved
+        await asyncio.sleep(0.05)
+        assert not server.flusher.done()
+        server.flusher.cancel()
+
+    asyncio.run(scenario())
+    assert storage.profiles["alice"]["gold"] >= 100 and "bob" in storage.profiles
+    assert "broken" not in storage.profiles
+    assert server.sessions.quarantine == {"broken"} and server.sessions.dirty == {"broken"}
+    assert "broken" in server.sessions.players  # Not evicted with unsaved changes
+
+
+class Eventful(random.Random):
+    # Rolls a random event before every action
+    def random(self):
+        return 0.0
+
+
+def test_queries_and_typos_roll_no_events(monkeypatch, tmp_path):
+    monkeypatch.setattr(index.random, "random", Eventful().random)
+    server = index.GameServer(FlakyStorage(failures=0))
+    server.sessions.checkout("hero")
+    before = server.sessions.players["hero"].to_dict()
+    for command in ("plan gold 50", "dance wildly", "plan"):
+        assert server.execute("hero", command)["events"] == []
+    server.execute("hero", "stats")
+    assert server.sessions.players["hero"].to_dict() == before
+    assert server.execute("hero", "task running")["events"]
+
+    storage = index.SQLiteStorage(str(tmp_path / "life.db"))
+    out = io.StringIO()
+    index.run_batch(["plan 40", "stats", "nonsense", "task running"], storage, name="hero", rng=Eventful(1), out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [bool(result["events"]) for result in results] == [False, False, False, True]
+    storage.close()
+
+
+def test_planning_does_not_hold_up_other_clients(monkeypatch):
+    build_plan = index.build_plan
+
+    def slow_plan(*args):
+        time.sleep(0.3)
+        return build_plan(*args)
+
+    monkeypatch.setattr(index, "build_plan", slow_plan)
+    index.PLAN_CACHE.clear()
+    server = index.GameServer(FlakyStorage(failures=0))
+    server.sessions.checkout("hero")
+    server.sessions.checkout("other")
+
+    async def scenario():
+        plan = asyncio.ensure_future(server.respond("hero", "plan gold 50"))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        assert (await server.respond("other", "task running"))["ok"]
+        assert time.perf_counter() - started < 0.1
+        assert not plan.done()
+        return await plan
+
+    result = asyncio.run(scenario())
+    assert result["ok"] and result["energy"] == 50 and result["events"] == []
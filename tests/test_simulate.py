@@ -0,0 +1,39 @@
+import json
+
+import index
+
+
+def outcome(result):
+    # Everything but the timings
+    return {key: value for key, value in result.items() if key not in ("seconds", "tasks_per_second")}
+
+
+def test_worker_count_does_not_change_results():
+    args = dict(players=40, turns=150, policy="greedy", seed=7, shard_size=6)
+    alone = index.simulate(workers=1, **args)
+    assert outcome(index.simulate(workers=3, **args)) == outcome(alone)
+    assert outcome(index.simulate(workers=1, **dict(args, shard_size=1000))) == outcome(alone)
+    assert alone["task_attempts"] > 0
+
+
+def test_players_get_their_own_streams():
+    first = index.simulate(players=10, turns=100, seed=1)
+    assert outcome(index.simulate(players=10, turns=100, seed=1)) == outcome(first)
+    assert outcome(index.simulate(players=10, turns=100, seed=2)) != outcome(first)
+    # A player's game is the same whoever else is in the run
+    one = index.simulate_players(4, 5, 100, "random", 1)
+    assert index.simulate_players(0, 10, 100, "random", 1)["gold"][4] == one["gold"][0]
+
+
+def test_workers_load_the_same_packs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Workers compile the packs into the catalog cache here
+    path = tmp_path / "pack.json"
+    path.write_text(json.dumps({"tasks": {"running": dict(index.TASKS["running"], xp=500)}}))
+    index.load_content([str(path)], cache_dir=None)
+    try:
+        args = dict(players=12, turns=60, policy="greedy", seed=3, shard_size=4)
+        packed = index.simulate(workers=2, **args)
+        assert outcome(packed) == outcome(index.simulate(workers=1, **args))
+    finally:
+        index.load_content([], cache_dir=None)
+    assert outcome(index.simulate(workers=1, **args)) != outcome(packed)
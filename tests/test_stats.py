@@ -0,0 +1,72 @@
+import json
+import random
+
+import pytest
+
+import benchmarks
+import index
+
+
+def add_xp_loop(level, xp, needed, amount):
+    # The original one-level-at-a-time add_xp, as the reference for the closed form
+    xp += amount
+    while xp >= needed:
+        level += 1
+        xp -= needed
+        needed = 100 * level
+    return level, xp, needed
+
+
+@pytest.mark.parametrize("start", [(1, 0, 100), (7, 350, 700), (3, 0, 5), (12, 40, 2500)])
+def test_add_xp_matches_loop(start):
+    rng = random.Random(start[0])
+    for amount in [0, 1, 99, 100, 101, 250, 10 ** 4] + [rng.randrange(10 ** 6) for _ in range(200)]:
+        stat = index.Stat("Strength", *start)
+        result = stat.add_xp(amount)
+        level, xp, needed = add_xp_loop(*start, amount)
+        assert (stat.level, stat.xp, stat.needed) == (level, xp, needed)
+        assert result.levels_gained == level - start[0]
+        assert bool(result) == (level > start[0])
+
+
+def test_add_xp_huge_grant_widens_storage():
+    stat = index.Stat("Strength")
+    stat.add_xp(10 ** 30)  # Far too many levels for the loop, and past int64
+    level, xp, needed = stat.level, stat.xp, stat.needed
+    assert needed == 100 * level
+    assert 0 <= xp < needed
+    # Levels 1..level-1 cost 100 * (1 + 2 + ... + (level - 1)); the rest is left over
+    assert 50 * (level - 1) * level + xp == 10 ** 30
+
+
+def test_containers_are_made_on_first_use():
+    player = index.Player("hero")
+    assert player.inventory_value is None and player.quest_progress_value is None
+    index.perform_task(player, "yoga", random.Random(0))  # In no quest, so nothing to track
+    assert player.quest_progress_value is None
+    player.gold = 100
+    index.buy_item(player, "energy potion")
+    assert player.inventory == {"energy potion": 1} and player.inventory_value is player.inventory
+    loaded = index.Player.from_dict(player.to_dict())
+    assert loaded.achievements_value is None and loaded.inventory == player.inventory
+
+
+def test_compact_layout_meets_its_memory_target():
+    result = benchmarks.memory_benchmark(2000)
+    assert result["reduction_vs_dict_layout"] >= benchmarks.TARGET_REDUCTION
+
+
+def test_committed_baseline_covers_every_benchmark():
+    with open(benchmarks.BASELINE_FILE) as f:
+        baseline = json.load(f)
+    assert set(baseline) == set(benchmarks.BENCHMARKS)
+
+
+def test_check_scales_the_baseline_to_the_machine():
+    baseline = {name: {"ops_per_sec": 1000.0} for name in ("a", "b", "c", "save_progress_json")}
+    faster = {name: {"ops_per_sec": 2000.0} for name in baseline}
+    scale = benchmarks.baseline_scale(faster, baseline)
+    assert scale == 2.0 and benchmarks.compare(faster, baseline, scale=scale) == []
+    faster["a"]["ops_per_sec"] = 500.0
+    faster["save_progress_json"]["ops_per_sec"] = 1100.0  # Within what the disk alone scatters by
+    assert benchmarks.compare(faster, baseline, scale=benchmarks.baseline_scale(faster, baseline)) == ["a"]
@@ -0,0 +1,173 @@
+import random
+
+import pytest
+
+import index
+
+
+def played_player(name, seed):
+    # A profile with a bit of everything: levels, items, achievements, quests underway and done
+    rng = random.Random(seed)
+    player = index.Player(name)
+    player.gold = 5000
+    for quest in index.QUESTS:
+        index.start_quest(player, quest)
+    for _ in range(300):
+        action, arg = index.greedy_policy(player, rng)
+        index.apply_action(player, action, arg, rng)
+        player.energy = player.max_energy
+    for task in index.QUESTS["beginner quest"]["tasks"]:
+        index.apply_task_result(player, task, True, 10, 0)
+    index.apply_task_result(player, "boxing practice", True, 10, 0)  # Part of another quest
+    player.gain_xp(player.find_stat("Strength"), 10 ** 5)  # Enough for an achievement or two
+    for item in list(index.SHOP_ITEMS)[:3]:
+        index.buy_item(player, item)
+    return player
+
+
+def snapshot(player):
+    data = player.to_dict()
+    data["last_save"] = "2026-01-01T00:00:00"
+    data["seq"] = 0
+    return data
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    storage = index.SQLiteStorage(str(tmp_path / "life.db"))
+    yield storage
+    storage.close()
+
+
+def test_sqlite_round_trip(sqlite_storage, tmp_path):
+    datas = [snapshot(played_player(f"player-{i}", i)) for i in range(5)]
+    sqlite_storage.write_many(datas)
+    for data in datas:
+        assert sqlite_storage.read(data["name"]) == data
+    # ...and from a fresh connection, which has nothing remembered to diff against
+    reopened = index.SQLiteStorage(sqlite_storage.path)
+    assert [reopened.read(data["name"]) for data in datas] == datas
+    assert reopened.names() == sorted(data["name"] for data in datas)
+    reopened.close()
+
+
+def test_sqlite_saves_only_changes_and_forgets(sqlite_storage):
+    player = played_player("hero", 1)
+    sqlite_storage.write(snapshot(player))
+    player.gold += 1
+    player.inventory.remove(next(iter(player.inventory)))
+    sqlite_storage.write(snapshot(player))
+    assert sqlite_storage.read("hero") == snapshot(player)
+    sqlite_storage.forget("hero")
+    assert "hero" not in sqlite_storage.saved
+    player.gold += 1
+    sqlite_storage.write(snapshot(player))  # Diffs against a fresh read instead
+    assert sqlite_storage.read("hero") == snapshot(player)
+
+
+def test_sqlite_remembers_a_bounded_number(tmp_path):
+    storage = index.SQLiteStorage(str(tmp_path / "life.db"), cache_size=3)
+    storage.write_many([snapshot(index.Player(f"p{i}")) for i in range(10)])
+    assert list(storage.saved) == ["p7", "p8", "p9"]
+    storage.close()
+
+
+@pytest.fixture
+def binary_path(tmp_path):
+    return str(tmp_path / "life.bin")
+
+
+def test_binary_round_trip(binary_path):
+    storage = index.BinaryStorage(binary_path)
+    datas = [snapshot(played_player(f"player-{i}", i)) for i in range(5)]
+    storage.write_many(datas[:3])
+    storage.write_many(datas[3:])
+    assert [storage.read(data["name"]) for data in datas] == datas
+    assert storage.read_field("player-1", "gold") == datas[1]["gold"]
+    storage.close()
+    reopened = index.BinaryStorage(binary_path)  # Delta entries come back from the segment chain
+    assert [reopened.read(data["name"]) for data in datas] == datas
+    assert reopened.names() == sorted(data["name"] for data in datas)
+    assert sorted(data["name"] for _, data in reopened.scan(page=2)) == reopened.names()
+    reopened.close()
+
+
+def test_oversized_stacks_are_cut_back_before_saving(binary_path):
+    data = snapshot(index.Player("hoarder"))
+    data["inventory"] = {"gold bag": 2 ** 64, "energy potion": 3}
+    player = index.Player.from_dict(data)
+    assert player.inventory == {"gold bag": index.MAX_STACK, "energy potion": 3}
+    storage = index.BinaryStorage(binary_path)
+    storage.write(snapshot(player))
+    assert storage.read("hoarder")["inventory"] == player.inventory
+    storage.close()
+    record = index.flatten_profile(data)
+    assert any("gold bag" in error for error in index.unflatten_profile(record)[1])
+
+
+def test_binary_writes_append_only_their_own_entries(binary_path, monkeypatch):
+    monkeypatch.setattr(index, "DELTA_LIMIT", 50)
+    storage = index.BinaryStorage(binary_path)
+    for i in range(20):
+        storage.write(snapshot(index.Player(f"p{i}")))
+    before = index.os.path.getsize(binary_path)
+    data = snapshot(index.Player("p0"))
+    storage.write(data)
+    record = len(index.encode_player(data))
+    assert index.os.path.getsize(binary_path) - before == record + index.DELTA_SEGMENT.size + index.INDEX_ENTRY.size
+    for i in range(20, 80):  # Past DELTA_LIMIT: folded into a fresh base
+        storage.write(snapshot(index.Player(f"p{i}")))
+    assert storage.delta_count < index.DELTA_LIMIT
+    storage.close()
+    reopened = index.BinaryStorage(binary_path)
+    assert len(reopened.names()) == 80
+    assert reopened.read("p0") == data
+    reopened.close()
+
+
+def test_binary_compaction_keeps_saves_made_during_it(binary_path, monkeypatch):
+    storage = index.BinaryStorage(binary_path)
+    storage.write_many([snapshot(index.Player(f"p{i}")) for i in range(10)])
+    copy = index.BinaryStorage.entries
+
+    def entries_then_save(self):
+        # The first call is compact() taking its snapshot; save more players right after it
+        monkeypatch.setattr(index.BinaryStorage, "entries", copy)
+        merged = copy(self)
+        self.lock.release()
+        try:
+            late = snapshot(index.Player("p3"))
+            late["gold"] = 99
+            self.write_many([late, snapshot(index.Player("p10"))])
+        finally:
+            self.lock.acquire()
+        return merged
+
+    monkeypatch.setattr(index.BinaryStorage, "entries", entries_then_save)
+    storage.compacting = True
+    storage.compact()
+    assert storage.read("p3")["gold"] == 99
+    assert len(storage.names()) == 11
+    assert storage.live == index.os.path.getsize(binary_path) - index.CONTAINER_HEADER.size - 11 * index.INDEX_ENTRY.size
+    storage.close()
+
+
+def test_binary_upgrades_version_1_containers(binary_path):
+    # Version 1 kept the delta in one block right after the records
+    datas = [snapshot(index.Player(f"p{i}")) for i in range(3)]
+    records = [index.encode_player(data) for data in datas]
+    offset, block = index.CONTAINER_HEADER.size, b""
+    for data, record in zip(datas, records):
+        block += index.INDEX_ENTRY.pack(index.name_hash(data["name"]), offset, len(record))
+        offset += len(record)
+    with open(binary_path, "wb") as f:
+        f.write(index.CONTAINER_HEADER.pack(index.CONTAINER_MAGIC, 1, 0, 0, 0, offset, len(datas), offset - index.CONTAINER_HEADER.size))
+        f.write(b"".join(records) + block)
+    storage = index.BinaryStorage(binary_path)
+    assert [storage.read(data["name"]) for data in datas] == datas
+    extra = snapshot(index.Player("p3"))
+    storage.write(extra)
+    storage.close()
+    reopened = index.BinaryStorage(binary_path)
+    assert [reopened.read(data["name"]) for data in datas + [extra]] == datas + [extra]
+    reopened.close()
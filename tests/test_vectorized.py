@@ -0,0 +1,9 @@
+import pytest
+
+import index
+
+
+def test_vectorized_agrees_with_scalar():
+    pytest.importorskip("numpy")
+    ok, details = index.check_vectorized(players=1000, turns=100, seed=0)
+    assert ok, details